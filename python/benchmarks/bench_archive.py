@@ -0,0 +1,40 @@
+import io
+import os
+import sys
+import time
+import tarfile
+import tempfile
+from pseudocodejson import batch, archive
+from .generate import generate_program
+
+def main(argv):
+  count = int(argv[0]) if len(argv) > 0 else 500
+  workers = int(argv[1]) if len(argv) > 1 else 1
+  with tempfile.TemporaryDirectory() as tmp:
+    path = os.path.join(tmp, 'submissions.tar.gz')
+    with tarfile.open(path, 'w:gz') as tf:
+      for i in range(count):
+        data = generate_program(5, 4, seed=i).encode()
+        info = tarfile.TarInfo('student{:d}/solution.py'.format(i))
+        info.size = len(data)
+        tf.addfile(info, io.BytesIO(data))
+
+    # Extracting first, as before, writes and reads every source once more.
+    start = time.perf_counter()
+    target = os.path.join(tmp, 'extracted')
+    with tarfile.open(path) as tf:
+      tf.extractall(target)
+    files = batch.collect_files([target])
+    batch.write_jsonl(io.StringIO(), files, None, False, workers, id_strategy='sequential')
+    extracted = time.perf_counter() - start
+
+    start = time.perf_counter()
+    archive.write_jsonl(io.StringIO(), archive.iter_sources([path]), None, False, workers,
+      id_strategy='sequential')
+    streamed = time.perf_counter() - start
+
+  print('members={:d} workers={:d} extract_then_convert={:.1f}ms streamed={:.1f}ms'.format(
+    count, workers, extracted * 1e3, streamed * 1e3))
+
+if __name__ == '__main__':
+  main(sys.argv[1:])
@@ -0,0 +1,35 @@
+import sys
+import json
+import time
+import zlib
+from pseudocodejson import src2pseudo, binary
+from .generate import generate_program
+
+def best_of(func, repeat=5):
+  best = None
+  for _ in range(repeat):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    best = elapsed if best is None else min(best, elapsed)
+  return best
+
+def main(argv):
+  functions = int(argv[0]) if len(argv) > 0 else 200
+  src = generate_program(functions, 8)
+  for ids in ('uuid', 'sequential', 'hash'):
+    document = src2pseudo(src, id_strategy=ids)
+    text = json.dumps(document, separators=(',', ':')).encode()
+    data = binary.dumps(document)
+    print('ids={} json={:d}B json.zlib={:d}B binary={:d}B binary.zlib={:d}B ratio={:.2f}'.format(
+      ids, len(text), len(zlib.compress(text)), len(data), len(zlib.compress(data)), len(data) / len(text)))
+    print('ids={} encode json={:.2f}ms binary={:.2f}ms decode json={:.2f}ms binary={:.2f}ms'.format(
+      ids,
+      best_of(lambda: json.dumps(document, separators=(',', ':'))) * 1e3,
+      best_of(lambda: binary.dumps(document)) * 1e3,
+      best_of(lambda: json.loads(text)) * 1e3,
+      best_of(lambda: binary.loads(data)) * 1e3,
+    ))
+
+if __name__ == '__main__':
+  main(sys.argv[1:])
@@ -0,0 +1,33 @@
+import sys
+import time
+from pseudocodejson import src2pseudo
+
+def chain_source(length):
+  lines = []
+  for i in range(length - 1, -1, -1):
+    lines.append('def f{:d}(a):'.format(i))
+    if i + 1 < length:
+      lines.append('  return f{:d}(a) + 1'.format(i + 1))
+    else:
+      lines.append('  return a')
+  return '\n'.join(lines) + '\n'
+
+def bench_chain(length, repeat=3):
+  src = chain_source(length)
+  signatures = { 'f0': { 'arguments': ['int'], 'return': 'int' } }
+  best = None
+  for _ in range(repeat):
+    start = time.perf_counter()
+    src2pseudo(src, dict(signatures), True, id_strategy='sequential')
+    elapsed = time.perf_counter() - start
+    best = elapsed if best is None else min(best, elapsed)
+  return best
+
+def main(argv):
+  for length in (int(a) for a in argv) if argv else (100, 200, 400, 800):
+    seconds = bench_chain(length)
+    print('chain length={:d} total={:.3f}ms per_function={:.1f}us'.format(
+      length, seconds * 1e3, seconds / length * 1e6))
+
+if __name__ == '__main__':
+  main(sys.argv[1:])
@@ -0,0 +1,26 @@
+import ast
+import sys
+import time
+import tracemalloc
+from pseudocodejson import parse_module
+from .generate import generate_program
+
+def measure(root, emission):
+  tracemalloc.start()
+  start = time.perf_counter()
+  parse_module(root, None, False, 'sequential', emission)
+  elapsed = time.perf_counter() - start
+  _, peak = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  return elapsed, peak
+
+def main(argv):
+  functions = int(argv[0]) if len(argv) > 0 else 1000
+  root = ast.parse(generate_program(functions, 8))
+  for emission in ('finalize', 'direct'):
+    elapsed, peak = measure(root, emission)
+    print('emission={} functions={:d} time={:.3f}s peak={:.1f}MB'.format(
+      emission, functions, elapsed, peak / 1024 / 1024))
+
+if __name__ == '__main__':
+  main(sys.argv[1:])
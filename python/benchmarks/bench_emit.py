@@ -0,0 +1,44 @@
+import io
+import sys
+import json
+import time
+from pseudocodejson import src2pseudo
+from pseudocodejson.emit import LANGUAGES, write_source, write_sources
+from .generate import generate_program
+
+def documents(count, functions):
+  return [src2pseudo(generate_program(functions, 8, seed), id_strategy='sequential') for seed in range(count)]
+
+def bench_language(docs, language, repeat=3):
+  best = None
+  for _ in range(repeat):
+    out = io.StringIO()
+    start = time.perf_counter()
+    for d in docs:
+      write_source(d, out, language)
+    elapsed = time.perf_counter() - start
+    best = elapsed if best is None else min(best, elapsed)
+  return best, out.tell()
+
+def bench_batch(docs, language, workers):
+  lines = [json.dumps({ 'file': str(i), 'result': d }) for i, d in enumerate(docs)]
+  out = io.StringIO()
+  start = time.perf_counter()
+  write_sources(out, lines, language, workers)
+  return time.perf_counter() - start
+
+def main(argv):
+  count = int(argv[0]) if len(argv) > 0 else 200
+  functions = int(argv[1]) if len(argv) > 1 else 20
+  docs = documents(count, functions)
+  for language in LANGUAGES:
+    elapsed, size = bench_language(docs, language)
+    print('language={} documents={:d} time={:.3f}s docs_per_s={:.0f} MB_per_s={:.2f}'.format(
+      language, count, elapsed, count / elapsed, size / elapsed / 1024 / 1024))
+    for workers in (1, None):
+      elapsed = bench_batch(docs, language, workers)
+      print('language={} batch workers={} time={:.3f}s docs_per_s={:.0f}'.format(
+        language, workers or 'cpu', elapsed, count / elapsed))
+
+if __name__ == '__main__':
+  main(sys.argv[1:])
@@ -0,0 +1,58 @@
+import sys
+import time
+from pseudocodejson import src2pseudo
+from pseudocodejson.execute import compile_module
+from .generate import generate_program
+
+SORT = """
+def bubblesort(a):
+  changes = True
+  while changes:
+    changes = False
+    for i in range(1, len(a)):
+      if a[i] < a[i - 1]:
+        t = a[i]
+        a[i] = a[i - 1]
+        a[i - 1] = t
+        changes = True
+  return a
+
+def fib(n):
+  if n < 2:
+    return n
+  return fib(n - 1) + fib(n - 2)
+"""
+
+def best_of(func, repeat=5):
+  best = None
+  for _ in range(repeat):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    best = elapsed if best is None else min(best, elapsed)
+  return best
+
+def report(name, compiled, native):
+  print('{} compiled={:.3f}ms native={:.3f}ms ratio={:.1f}'.format(
+    name, compiled * 1e3, native * 1e3, compiled / native))
+
+def main(argv):
+  functions = int(argv[0]) if len(argv) > 0 else 200
+  src = generate_program(functions, 8, 0, 2, 2)
+  document = src2pseudo(src)
+  start = time.perf_counter()
+  module = compile_module(document)
+  print('compile functions={:d} time={:.3f}ms'.format(functions, (time.perf_counter() - start) * 1e3))
+  code = compile(src, '<generated>', 'exec')
+  report('generated', best_of(module.run), best_of(lambda: exec(code, {})))
+
+  module = compile_module(src2pseudo(SORT))
+  native = {}
+  exec(SORT, native)
+  report('fib(20)', best_of(lambda: module.call('fib', 20)), best_of(lambda: native['fib'](20)))
+  data = list(range(300, 0, -1))
+  report('bubblesort(300)', best_of(lambda: module.call('bubblesort', list(data))),
+    best_of(lambda: native['bubblesort'](list(data))))
+
+if __name__ == '__main__':
+  main(sys.argv[1:])
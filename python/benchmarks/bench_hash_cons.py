@@ -0,0 +1,28 @@
+import ast
+import sys
+import time
+import tracemalloc
+from pseudocodejson import parse_module
+from .generate import generate_program
+
+def measure(root, emission, hash_cons):
+  tracemalloc.start()
+  start = time.perf_counter()
+  document = parse_module(root, None, False, 'sequential', emission, False, None, hash_cons)
+  elapsed = time.perf_counter() - start
+  retained, peak = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  del document
+  return elapsed, retained, peak
+
+def main(argv):
+  functions = int(argv[0]) if len(argv) > 0 else 1000
+  root = ast.parse(generate_program(functions, 8))
+  # hash_cons emits directly whatever the emission asked for.
+  for emission, hash_cons in (('finalize', False), ('direct', False), ('direct', True)):
+    elapsed, retained, peak = measure(root, emission, hash_cons)
+    print('emission={} hash_cons={} functions={:d} time={:.3f}s retained={:.1f}MB peak={:.1f}MB'.format(
+      emission, hash_cons, functions, elapsed, retained / 1024 / 1024, peak / 1024 / 1024))
+
+if __name__ == '__main__':
+  main(sys.argv[1:])
@@ -0,0 +1,16 @@
+import sys
+import time
+from pseudocodejson import src2pseudo, metrics
+from .generate import generate_program
+
+def main(argv):
+  count = int(argv[0]) if len(argv) > 0 else 500
+  documents = [src2pseudo(generate_program(5, 2 + i % 5, seed=i, depth=1 + i % 3)) for i in range(count)]
+  start = time.perf_counter()
+  matrix = metrics.metrics_matrix(documents)
+  elapsed = time.perf_counter() - start
+  print('documents={:d} columns={:d} numpy={} time={:.3f}s per_document={:.3f}ms'.format(
+    count, len(metrics.COLUMNS), metrics.numpy is not None, elapsed, elapsed / count * 1e3))
+
+if __name__ == '__main__':
+  main(sys.argv[1:])
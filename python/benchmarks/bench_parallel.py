@@ -0,0 +1,39 @@
+import os
+import ast
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pseudocodejson import parse_module
+from pseudocodejson.parallel import ParallelParseState
+from pseudocodejson.parse_module import parse_into_state, module_document
+from .generate import generate_program
+
+def best_of(func, repeat=3):
+  best = None
+  for _ in range(repeat):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    best = elapsed if best is None else min(best, elapsed)
+  return best
+
+def main(argv):
+  functions = int(argv[0]) if len(argv) > 0 else 500
+  workers = int(argv[1]) if len(argv) > 1 else os.cpu_count()
+  src = generate_program(functions, 8, depth=2, loops=2)
+  sequential = best_of(lambda: parse_module(ast.parse(src), None, False, 'sequential', 'direct'))
+  with ProcessPoolExecutor(workers) as executor:
+    # The pool is started outside the measurement, as a server or batch would keep it.
+    executor.submit(int).result()
+    states = []
+    def convert():
+      state = ParallelParseState(src, executor, workers, None, False, 'sequential', 'direct')
+      module_document(parse_into_state(state, ast.parse(src)))
+      states.append(state)
+    parallel = best_of(convert)
+  state = states[-1]
+  print('functions={:d} workers={:d} sequential={:.1f}ms parallel={:.1f}ms speculated={:d} taken={:d}'.format(
+    functions, workers, sequential * 1e3, parallel * 1e3, state.speculated, state.taken))
+
+if __name__ == '__main__':
+  main(sys.argv[1:])
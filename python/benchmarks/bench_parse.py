@@ -0,0 +1,73 @@
+import ast
+import gc
+import sys
+import time
+from pseudocodejson.ParseState import ParseState
+from pseudocodejson.parse_expression import EXPRESSION_HANDLERS
+from pseudocodejson.parse_statements import parse_statements, STATEMENT_HANDLERS
+from .generate import generate_program
+
+# The elif chains the handler tables replaced, in their order.
+EXPRESSION_CHAIN = (
+  'Name', 'Call', 'Constant', 'NameConstant', 'Num', 'Str', 'BinOp', 'UnaryOp', 'BoolOp', 'Compare',
+  'Subscript', 'List', 'Tuple',
+)
+STATEMENT_CHAIN = ('Return', 'Assign', 'AugAssign', 'If', 'While', 'For', 'Break', 'Continue', 'Expr')
+
+class ChainHandlers:
+
+  # Finds a handler as the chain did, comparing the class name in turn.
+  def __init__(self, handlers, order):
+    names = { cls.__name__: handler for cls, handler in handlers.items() }
+    self.chain = [(name, names.get(name)) for name in order]
+
+  def get(self, cls):
+    name = cls.__name__
+    for other, handler in self.chain:
+      if name == other:
+        return handler
+    return None
+
+class ChainParseState(ParseState):
+
+  def __init__(self, *args):
+    super().__init__(*args)
+    self.expression_handlers = ChainHandlers(EXPRESSION_HANDLERS, EXPRESSION_CHAIN)
+    self.statement_handlers = ChainHandlers(STATEMENT_HANDLERS, STATEMENT_CHAIN)
+
+def count_nodes(root):
+  return sum(1 for _ in ast.walk(root))
+
+def parse_only(root, state_class=ParseState):
+  # parse_module without presentation.finalize
+  state = state_class(None, 'sequential')
+  parse_statements(state, root.body, False, True)
+  return state
+
+def bench(functions, width, repeat=10, state_class=ParseState):
+  root = ast.parse(generate_program(functions, width))
+  nodes = count_nodes(root)
+  best = None
+  gc.disable()
+  try:
+    for _ in range(repeat):
+      start = time.perf_counter()
+      parse_only(root, state_class)
+      elapsed = time.perf_counter() - start
+      best = elapsed if best is None else min(best, elapsed)
+      gc.collect()
+  finally:
+    gc.enable()
+  return nodes, best
+
+def main(argv):
+  functions = int(argv[0]) if len(argv) > 0 else 1000
+  for width in (2, 8, 32):
+    nodes, elapsed = bench(functions, width)
+    _, chained = bench(functions, width, state_class=ChainParseState)
+    print('functions={:d} width={:d} nodes={:d} total={:.3f}s per_node={:.3f}us chain_per_node={:.3f}us '
+      'speedup={:.2f}x'.format(functions, width, nodes, elapsed, elapsed / nodes * 1e6, chained / nodes * 1e6,
+      chained / elapsed))
+
+if __name__ == '__main__':
+  main(sys.argv[1:])
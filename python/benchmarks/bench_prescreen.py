@@ -0,0 +1,33 @@
+import ast
+import sys
+import time
+from pseudocodejson import parse_module, ParseUnsupportedError
+from pseudocodejson.prescreen import screen_module
+from .generate import generate_program
+
+def best_of(func, repeat=5):
+  best = None
+  for _ in range(repeat):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    best = elapsed if best is None else min(best, elapsed)
+  return best
+
+def convert(root):
+  try:
+    parse_module(root, None, False, 'sequential')
+  except ParseUnsupportedError:
+    pass
+
+def main(argv):
+  functions = int(argv[0]) if len(argv) > 0 else 500
+  # The unsupported construct sits in the last function, as a late failure.
+  root = ast.parse(generate_program(functions, 8) + 'def late(a):\n  return a.pop()\n')
+  screen = best_of(lambda: screen_module(root))
+  conversion = best_of(lambda: convert(root))
+  print('functions={:d} prescreen={:.2f}ms conversion_to_failure={:.2f}ms'.format(
+    functions, screen * 1e3, conversion * 1e3))
+
+if __name__ == '__main__':
+  main(sys.argv[1:])
@@ -0,0 +1,35 @@
+import sys
+import time
+from pseudocodejson.ParseState import ParseState
+
+def bench_depth(depth, lookups=20000):
+  state = ParseState(None, 'sequential')
+  state.add_variable('g', 'int')
+  for i in range(depth):
+    state.push_names('f{:d}'.format(i))
+    state.add_variable('v{:d}'.format(i), 'int')
+  start = time.perf_counter()
+  for _ in range(lookups):
+    state.find_id('g', True)
+  return (time.perf_counter() - start) / lookups
+
+def bench_helpers(helpers, rounds=200):
+  state = ParseState(None, 'sequential')
+  procedures = [state.add_procedure(True, 'h{:d}'.format(i)) for i in range(helpers)]
+  state.push_names('main')
+  start = time.perf_counter()
+  for r in range(rounds):
+    state.find_function_id(None, 'h{:d}'.format(r % helpers), [])
+    state.pop_names()
+    state.get_required_to_parse()
+    state.push_names('main')
+  return (time.perf_counter() - start) / rounds
+
+def main(argv):
+  for depth in (1, 10, 100, 500):
+    print('find_id depth={:d} per_lookup={:.3f}us'.format(depth, bench_depth(depth) * 1e6))
+  for helpers in (10, 100, 1000, 5000):
+    print('required helpers={:d} per_round={:.3f}us'.format(helpers, bench_helpers(helpers) * 1e6))
+
+if __name__ == '__main__':
+  main(sys.argv[1:])
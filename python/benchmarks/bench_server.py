@@ -0,0 +1,38 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import subprocess
+from .generate import generate_program
+
+def main(argv):
+  count = int(argv[0]) if len(argv) > 0 else 50
+  sources = [generate_program(5, 4, seed=i) for i in range(count)]
+  env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+  with tempfile.TemporaryDirectory() as tmp:
+    files = []
+    for i, src in enumerate(sources):
+      name = os.path.join(tmp, 'sub{:d}.py'.format(i))
+      with open(name, 'w') as f:
+        f.write(src)
+      files.append(name)
+    start = time.perf_counter()
+    for name in files:
+      subprocess.run([sys.executable, '-m', 'pseudocodejson', '--compact', name],
+        capture_output=True, check=True, env=env)
+    per_process = time.perf_counter() - start
+
+  lines = ''.join(json.dumps({ 'jsonrpc': '2.0', 'id': i, 'method': 'convert', 'params': { 'source': s } }) + '\n'
+    for i, s in enumerate(sources))
+  start = time.perf_counter()
+  out = subprocess.run([sys.executable, '-m', 'pseudocodejson', 'serve'],
+    input=lines, capture_output=True, text=True, check=True, env=env)
+  served = time.perf_counter() - start
+  assert len(out.stdout.splitlines()) == count
+  print('files={:d} process_per_file={:.1f}ms/file server={:.1f}ms/file (including server start)'.format(
+    count, per_process / count * 1e3, served / count * 1e3))
+
+if __name__ == '__main__':
+  main(sys.argv[1:])
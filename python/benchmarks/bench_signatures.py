@@ -0,0 +1,49 @@
+import sys
+import copy
+import json
+import time
+import pickle
+from pseudocodejson import src2pseudo, SignatureCatalog
+from pseudocodejson import signatures as s
+from .generate import generate_program
+
+TYPES = ('int', 'double', 'boolean', 'string', 'int[]', 'double[]', 'unknown')
+
+def best_of(func, repeat=5):
+  best = None
+  for _ in range(repeat):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    best = elapsed if best is None else min(best, elapsed)
+  return best
+
+def make_signatures(count):
+  return {
+    'proc{:d}'.format(i): {
+      'return': TYPES[i % len(TYPES)],
+      'arguments': [('a{:d}'.format(j), TYPES[(i + j) % len(TYPES)]) for j in range(i % 4)],
+    }
+    for i in range(count)
+  }
+
+def main(argv):
+  count = int(argv[0]) if len(argv) > 0 else 50000
+  signatures = make_signatures(count)
+  catalog = SignatureCatalog(signatures)
+  text = json.dumps(signatures)
+  data = s.dumps(catalog)
+  print('signatures={:d} json={:d}B binary={:d}B pickle={:d}B'.format(
+    count, len(text), len(data), len(pickle.dumps(catalog))))
+  print('load json={:.2f}ms json_catalog={:.2f}ms binary_catalog={:.2f}ms'.format(
+    best_of(lambda: json.loads(text)) * 1e3,
+    best_of(lambda: s.loads(text)) * 1e3,
+    best_of(lambda: s.loads(data)) * 1e3))
+  # Before catalogs, callers copied the signatures for every conversion.
+  src = generate_program(20, 4)
+  copied = best_of(lambda: src2pseudo(src, copy.deepcopy(signatures), False, None, 'sequential'))
+  shared = best_of(lambda: src2pseudo(src, catalog, False, None, 'sequential'))
+  print('conversion deepcopy={:.2f}ms catalog={:.2f}ms'.format(copied * 1e3, shared * 1e3))
+
+if __name__ == '__main__':
+  main(sys.argv[1:])
@@ -0,0 +1,39 @@
+import sys
+import time
+from pseudocodejson import src2pseudo
+from pseudocodejson.similarity import SimilarityIndex, document_features, jaccard
+from .generate import generate_program
+
+def main(argv):
+  corpus = int(argv[0]) if len(argv) > 0 else 5000
+  queries = int(argv[1]) if len(argv) > 1 else 100
+  index = SimilarityIndex()
+  documents = [src2pseudo(generate_program(2, 2 + i % 5, seed=i), id_strategy='sequential') for i in range(corpus)]
+  start = time.perf_counter()
+  for i, document in enumerate(documents):
+    index.add(i, document)
+  elapsed = time.perf_counter() - start
+  print('corpus={:d} insert={:.3f}ms/doc'.format(corpus, elapsed / corpus * 1e3))
+
+  start = time.perf_counter()
+  found = 0
+  recall = 0
+  for i in range(queries):
+    top = index.query(documents[i * corpus // queries], k=10)
+    found += len(top)
+    recall += any(key == i * corpus // queries for key, _ in top)
+  elapsed = time.perf_counter() - start
+  print('queries={:d} query={:.3f}ms avg_results={:.1f} self_recall={:.2f}'.format(
+    queries, elapsed / queries * 1e3, found / queries, recall / queries))
+
+  sample = documents[:200]
+  features = [document_features(d) for d in sample]
+  start = time.perf_counter()
+  for f in features[1:]:
+    jaccard(features[0], f)
+  elapsed = time.perf_counter() - start
+  print('pairwise exact jaccard={:.3f}ms/pair, all pairs over corpus ~{:.1f}s'.format(
+    elapsed / (len(sample) - 1) * 1e3, elapsed / (len(sample) - 1) * corpus * (corpus - 1) / 2))
+
+if __name__ == '__main__':
+  main(sys.argv[1:])
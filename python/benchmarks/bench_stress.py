@@ -0,0 +1,46 @@
+import sys
+import time
+from pseudocodejson import src2pseudo
+
+# Chains longer than the recursion limit and nesting at the limits that the
+# python parser itself accepts: 100 levels of indentation, 200 of parentheses.
+
+def chain(op, terms):
+  return 'x = 1\ny = ' + ' {} '.format(op).join(['x'] * terms) + '\n'
+
+def unary(terms):
+  return 'x = 1\ny = ' + '-' * terms + 'x\n'
+
+def nested_if(depth):
+  lines = ['x = 1']
+  for level in range(depth):
+    lines.append('  ' * level + 'if x < {:d}:'.format(level))
+  lines.append('  ' * depth + 'x = x + 1')
+  return '\n'.join(lines) + '\n'
+
+def parentheses(depth):
+  return 'x = 1\ny = ' + '(x + ' * depth + 'x' + ')' * depth + '\n'
+
+CASES = (
+  ('and', lambda n: chain('and', n), (2500, 10000)),
+  ('compare', lambda n: chain('<', n), (2500, 10000)),
+  ('add', lambda n: chain('+', n), (600, 2400)),
+  ('minus', unary, (600, 2400)),
+  ('if', nested_if, (25, 98)),
+  ('parentheses', parentheses, (45, 180)),
+)
+
+def measure(src, emission):
+  start = time.perf_counter()
+  src2pseudo(src, id_strategy='sequential', emission=emission)
+  return time.perf_counter() - start
+
+def main(argv):
+  for name, make, sizes in CASES:
+    for emission in ('finalize', 'direct'):
+      small, large = (measure(make(n), emission) for n in sizes)
+      print('{:<12} emission={:<8} n={:d} {:.1f}ms n={:d} {:.1f}ms growth={:.1f}x for {:.0f}x terms'.format(
+        name, emission, sizes[0], small * 1e3, sizes[1], large * 1e3, large / small, sizes[1] / sizes[0]))
+
+if __name__ == '__main__':
+  main(sys.argv[1:])
@@ -0,0 +1,54 @@
+import sys
+import json
+import argparse
+
+METRICS = ('seconds', 'peak_bytes')
+
+def load_report(filename):
+  with open(filename) as f:
+    return json.load(f)
+
+def compare_reports(base, head, threshold=0.1):
+  rows = []
+  for name, case in head['cases'].items():
+    base_case = base['cases'].get(name)
+    if base_case is None or base_case['params'] != case['params']:
+      continue
+    for phase, values in case['phases'].items():
+      base_values = base_case['phases'].get(phase)
+      if base_values is None:
+        continue
+      for metric in METRICS:
+        before, after = base_values[metric], values[metric]
+        ratio = after / before if before else None
+        rows.append({
+          'case': name,
+          'phase': phase,
+          'metric': metric,
+          'base': before,
+          'head': after,
+          'ratio': ratio,
+          'regression': ratio is not None and ratio > 1 + threshold,
+        })
+  return rows
+
+def main(argv):
+  parser = argparse.ArgumentParser(prog='python -m benchmarks.compare')
+  parser.add_argument('base', help='report of the reference commit')
+  parser.add_argument('head', help='report of the commit under test')
+  parser.add_argument('--threshold', type=float, default=0.1, help='allowed relative slowdown')
+  args = parser.parse_args(argv)
+
+  base, head = load_report(args.base), load_report(args.head)
+  rows = compare_reports(base, head, args.threshold)
+  print('base {} head {}'.format(base['meta'].get('commit'), head['meta'].get('commit')))
+  for r in rows:
+    print('{:<8} {:<14} {:<11} {:>14.6g} {:>14.6g} {:>8} {}'.format(
+      r['case'], r['phase'], r['metric'], r['base'], r['head'],
+      '{:.3f}'.format(r['ratio']) if r['ratio'] is not None else '-',
+      'REGRESSION' if r['regression'] else ''
+    ))
+  return 1 if any(r['regression'] for r in rows) else 0
+
+if __name__ == '__main__':
+  sys.exit(main(sys.argv[1:]))
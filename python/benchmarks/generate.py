@@ -0,0 +1,56 @@
+import random
+
+def expression(rnd, names, width):
+  terms = []
+  for i in range(width):
+    if rnd.random() < 0.5:
+      terms.append(rnd.choice(names))
+    else:
+      terms.append(str(rnd.randint(1, 9)))
+  ops = [rnd.choice(['+', '-', '*']) for _ in range(width - 1)]
+  out = terms[0]
+  for op, term in zip(ops, terms[1:]):
+    out += ' {} {}'.format(op, term)
+  return out
+
+def loop(rnd, i, width, depth):
+  lines = ['  for i in range(a):']
+  for level in range(depth):
+    lines.append('  ' * (level + 2) + 'if i % {:d} == 0 and i < b:'.format(level + 2))
+  pad = '  ' * (depth + 2)
+  lines.append(pad + 's = s + {}'.format(expression(rnd, ['i', 'a', 'b', 's'], width)))
+  lines.append(pad[2:] + 'else:')
+  if i > 0:
+    lines.append(pad + 's += f{:d}(i, b)'.format(rnd.randrange(i)))
+  else:
+    lines.append(pad + 's -= 1')
+  for level in range(depth - 2, -1, -1):
+    lines.append('  ' * (level + 2) + 'else:')
+    lines.append('  ' * (level + 3) + 's -= {:d}'.format(level + 1))
+  return lines
+
+def function(rnd, i, width, depth=1, loops=1):
+  lines = [
+    'def f{:d}(a, b):'.format(i),
+    '  s = 0',
+  ]
+  for _ in range(loops):
+    lines.extend(loop(rnd, i, width, depth))
+  lines.extend([
+    '  while s > {:d}:'.format(rnd.randint(10, 100)),
+    '    s = s // 2',
+    '  return s',
+    '',
+  ])
+  return lines
+
+def generate_program(functions=100, width=4, seed=0, depth=1, loops=1):
+  # Programs stay within the supported subset: functions call earlier ones,
+  # each with loops for-loops nesting depth selections around an expression
+  # of width terms.
+  rnd = random.Random(seed)
+  lines = []
+  for i in range(functions):
+    lines.extend(function(rnd, i, width, depth, loops))
+  lines.append('x = f{:d}(10, 5)'.format(functions - 1))
+  return '\n'.join(lines) + '\n'
@@ -0,0 +1,131 @@
+import ast
+import gc
+import sys
+import json
+import time
+import platform
+import argparse
+import subprocess
+import tracemalloc
+from pseudocodejson import VERSION_STRING
+from pseudocodejson.parse_module import parse_module_state
+from .generate import generate_program
+
+PHASES = ('ast_parse', 'parse_module', 'finalize', 'json')
+
+CASES = {
+  'small': { 'functions': 20, 'depth': 1, 'width': 4, 'loops': 1 },
+  'wide': { 'functions': 100, 'depth': 1, 'width': 32, 'loops': 1 },
+  'deep': { 'functions': 100, 'depth': 6, 'width': 4, 'loops': 1 },
+  'loops': { 'functions': 100, 'depth': 2, 'width': 8, 'loops': 6 },
+  'large': { 'functions': 1000, 'depth': 2, 'width': 8, 'loops': 2 },
+}
+
+def run_phases(src, emission):
+  # Runs the conversion split into phases, yielding after each one so that
+  # the caller can take a measurement.
+  root = ast.parse(src)
+  yield 'ast_parse'
+  state = parse_module_state(root, None, False, 'sequential', emission)
+  yield 'parse_module'
+  result = {
+    'format': 'pseudocodejson',
+    'version': VERSION_STRING,
+    'type': 'Module',
+    'id': None,
+    'constants': state.nodes.finalize(state.constants),
+    'procedures': state.nodes.finalize(state.procedures),
+  }
+  yield 'finalize'
+  json.dumps(result, indent=2)
+  yield 'json'
+
+def time_phases(src, emission):
+  times = {}
+  gc.disable()
+  try:
+    start = time.perf_counter()
+    for phase in run_phases(src, emission):
+      now = time.perf_counter()
+      times[phase] = now - start
+      start = time.perf_counter()
+  finally:
+    gc.enable()
+    gc.collect()
+  return times
+
+def memory_phases(src, emission):
+  peaks = {}
+  tracemalloc.start()
+  try:
+    for phase in run_phases(src, emission):
+      _, peak = tracemalloc.get_traced_memory()
+      peaks[phase] = peak
+      tracemalloc.reset_peak()
+  finally:
+    tracemalloc.stop()
+  return peaks
+
+def bench_case(params, repeat, emission):
+  src = generate_program(params['functions'], params['width'], 0, params['depth'], params['loops'])
+  best = {}
+  for _ in range(repeat):
+    for phase, seconds in time_phases(src, emission).items():
+      best[phase] = min(best.get(phase, seconds), seconds)
+  peaks = memory_phases(src, emission)
+  return {
+    'params': params,
+    'source_bytes': len(src),
+    'ast_nodes': sum(1 for _ in ast.walk(ast.parse(src))),
+    'phases': { phase: { 'seconds': best[phase], 'peak_bytes': peaks[phase] } for phase in PHASES },
+  }
+
+def git_commit():
+  try:
+    out = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True)
+  except (OSError, subprocess.CalledProcessError):
+    return None
+  return out.stdout.strip()
+
+def run_suite(cases, repeat=5, emission='finalize'):
+  return {
+    'meta': {
+      'commit': git_commit(),
+      'python': platform.python_version(),
+      'implementation': platform.python_implementation(),
+      'machine': platform.machine(),
+      'emission': emission,
+      'repeat': repeat,
+      'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    },
+    'cases': { name: bench_case(CASES[name], repeat, emission) for name in cases },
+  }
+
+def main(argv):
+  parser = argparse.ArgumentParser(prog='python -m benchmarks.suite')
+  parser.add_argument('-o', '--output', help='write the JSON report to a file')
+  parser.add_argument('--cases', default=','.join(CASES), help='comma separated case names')
+  parser.add_argument('--repeat', type=int, default=5, help='timing runs per case, best is reported')
+  parser.add_argument('--emission', default='finalize', choices=('finalize', 'direct'))
+  args = parser.parse_args(argv)
+
+  cases = [c for c in args.cases.split(',') if c]
+  for name in cases:
+    if not name in CASES:
+      parser.error("unknown case '{}'".format(name))
+  report = run_suite(cases, args.repeat, args.emission)
+
+  for name, case in report['cases'].items():
+    print('{} nodes={:d} {}'.format(name, case['ast_nodes'], ' '.join(
+      '{}={:.2f}ms/{:.1f}MB'.format(p, v['seconds'] * 1e3, v['peak_bytes'] / 1024 / 1024)
+      for p, v in case['phases'].items()
+    )), file=sys.stderr)
+  if args.output:
+    with open(args.output, 'w') as f:
+      json.dump(report, f, indent=2)
+  else:
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+if __name__ == '__main__':
+  main(sys.argv[1:])
@@ -1,14 +1,44 @@
 from . import parse_utils as u
 from . import presentation as p
+from .parse_expression import EXPRESSION_HANDLERS
+from .parse_statements import STATEMENT_HANDLERS
+from .limits import Budget
+from .signatures import SignatureOverlay
+
+def node_factory(emission, hash_cons=False):
+  # hash_cons always emits directly, finalize would copy the shared nodes
+  # apart again after paying for sharing them.
+  if emission == 'finalize' and not hash_cons:
+    nodes = p
+  elif emission in ('finalize', 'direct'):
+    nodes = p.DirectNodes()
+  else:
+    raise ValueError("Unknown emission '{}'".format(emission))
+  return p.SharedNodes(nodes) if hash_cons else nodes
 
 class ParseState:
 
-  def __init__(self, typed_signatures=None):
+  def __init__(self, typed_signatures=None, id_strategy='uuid', emission='finalize', call_graph=False,
+      hash_cons=False, limits=None):
     self.constants = []
     self.procedures = []
     self.namestack = [{}]
+    self.bindings = {}
+    self.pending = [{}]
+    self.procedure_levels = {}
+    self.scope = []
+    self.callers = [None]
+    self.module_uuid = None
+    self.call_graph = {} if call_graph else None
+    self.ids = u.id_generator(id_strategy)
+    self.nodes = node_factory(emission, hash_cons)
     self.variable_typing = {}
-    self.typed_signatures = typed_signatures or {}
+    self.typed_signatures = SignatureOverlay(typed_signatures)
+    self.expression_handlers = EXPRESSION_HANDLERS
+    self.statement_handlers = STATEMENT_HANDLERS
+    self.budget = Budget(limits) if limits is not None else None
+    # The budget the dispatch of ast nodes counts in, when any limit needs it.
+    self.node_budget = self.budget if self.budget is not None and self.budget.counts_handled else None
 
   def add_procedure(self, module_root, id, typ=None):
     if module_root and id in self.typed_signatures:
@@ -17,16 +47,52 @@ class ParseState:
     else:
       styp = 'unknown'
       called = False
-    procedure = p.procedure_declaration(u.uuid(), id, typ or styp, called)
+    # The procedure of module level statements has no id and is not counted.
+    if self.budget is not None and id is not None:
+      self.budget.add_procedure()
+    procedure = self.nodes.procedure_declaration(self.make_id('procedure', id), id, typ or styp, called)
     self.procedures.append(procedure)
-    self.namestack[-1][id] = procedure
+    self.bind(id, procedure)
+    self.procedure_levels[procedure['uuid']] = len(self.namestack) - 1
+    if called:
+      self.pending[-1][procedure['uuid']] = procedure
     return procedure
 
-  def push_names(self):
+  def make_id(self, kind, id):
+    return self.ids.make(self.scope, kind, id)
+
+  def push_names(self, scope_id=None):
     self.namestack.append({})
+    self.pending.append({})
+    self.scope.append(scope_id or '')
   
   def pop_names(self):
-    self.namestack.pop()
+    for id in self.namestack.pop():
+      stack = self.bindings[id]
+      stack.pop()
+      if not stack:
+        del self.bindings[id]
+    self.pending.pop()
+    self.scope.pop()
+
+  def enter_procedure(self, procedure):
+    self.push_names(procedure['id'])
+    self.callers.append(procedure['uuid'])
+
+  def exit_procedure(self):
+    self.callers.pop()
+    self.pop_names()
+
+  def bind(self, id, declaration):
+    # Each name keeps a stack of its visible declarations, the nearest one last.
+    names = self.namestack[-1]
+    if id in names:
+      self.bindings[id][-1] = declaration
+    elif id in self.bindings:
+      self.bindings[id].append(declaration)
+    else:
+      self.bindings[id] = [declaration]
+    names[id] = declaration
 
   def add_variable(self, id, typ=None, func_id=None, func_arg_i=0):
     if typ is None:
@@ -38,18 +104,20 @@ class ParseState:
           typ = 'unknown'
       else:
         typ = 'unknown'
-    variable = p.variable_statement(u.uuid(), id, typ)
-    self.namestack[-1][id] = variable
+    variable = self.nodes.variable_statement(self.make_id('variable', id), id, typ)
+    self.bind(id, variable)
     self.variable_typing[variable['uuid']] = typ
     return variable
   
   def find_id(self, id, up=False, level=None):
     if level is None:
-      level = len(self.namestack) - 1
-    if id in self.namestack[level]:
-      return self.namestack[level][id]
-    if up and level > 0:
-      return self.find_id(id, True, level - 1)
+      if up:
+        stack = self.bindings.get(id)
+        return stack[-1] if stack else None
+      return self.namestack[-1].get(id)
+    for names in reversed(self.namestack[:level + 1] if up else self.namestack[level:level + 1]):
+      if id in names:
+        return names[id]
     return None
   
   def find_variable_id(self, node, id, up=False):
@@ -64,6 +132,10 @@ class ParseState:
       declaration['_called'] = True
       if not 'body' in declaration:
         u.parse_error(node, "Expected function id, got variable id '{}".format(id))
+      if declaration['body'] is None:
+        self.pending[self.procedure_levels[declaration['uuid']]][declaration['uuid']] = declaration
+      if self.call_graph is not None:
+        self.call_graph.setdefault(self.callers[-1], {})[declaration['uuid']] = None
       if not id in self.typed_signatures:
         self.typed_signatures[id] = {
           'return': 'unknown',
@@ -77,11 +149,36 @@ class ParseState:
         u.unsupported_error(node, "multiple types for a variable")
       self.variable_typing[uuid] = typ
   
+  def get_call_graph(self, module_uuid=None):
+    # Calls from module level statements are attributed to the default procedure.
+    return {
+      module_uuid if caller is None else caller: list(callees)
+      for caller, callees in self.call_graph.items()
+    }
+
   def get_variable_type(self, uuid):
     return self.variable_typing.get(uuid, 'unknown')
 
+  def reuse_procedure(self, procedure, node):
+    return False
+
+  def start_round(self, uuids, module_root=False):
+    pass
+
+  def add_chain_nodes(self, cls, count):
+    # The nodes of a chain past its first are converted in the same dispatch.
+    budget = self.node_budget
+    if budget is not None:
+      budget.handled += count
+      budget.check()
+
   def get_required_to_parse(self):
-    return [
-      f['uuid'] for f in self.namestack[-1].values()
-      if 'body' in f and f['body'] is None and f['_called']
+    # Only procedures still bound to their name are required, redefined ones are dropped.
+    pending = self.pending[-1]
+    names = self.namestack[-1]
+    required = [
+      uuid for uuid, f in pending.items()
+      if f['body'] is None and names.get(f['id']) is f
     ]
+    self.pending[-1] = { uuid: pending[uuid] for uuid in required }
+    return required
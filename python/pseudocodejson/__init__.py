@@ -1,21 +1,92 @@
 import ast
 import json
-from .parse_module import parse_module
+from .parse_module import parse_module, parse_module_state
 from .parse_statements import parse_statements
 from .parse_expression import parse_expression
-from .parse_utils import ParseError, ParseUnsupportedError, MissingNameError
+from .parse_utils import ParseError, ParseUnsupportedError, UnsupportedConstructsError, MissingNameError, \
+  ResourceLimitError
+from .cache import ResultCache, cache_key
+from .node_classes import from_json, to_json
+from .json_stream import write_document
+from . import binary
+from .instrumentation import Collector, timed
+from .prescreen import prescreen, check_module
+from .limits import Limits
+from .signatures import SignatureCatalog
 
 VERSION_STRING = "1.0.0"
 
-def src2pseudo(src, typed_signatures=None, exclude_others=False):
-  root = ast.parse(src)
+FORMS = ('json', 'nodes')
+
+def src2pseudo(src, typed_signatures=None, exclude_others=False, cache=None, id_strategy='uuid',
+    emission='finalize', form='json', call_graph=False, collector=None, hash_cons=False, screen=False,
+    limits=None):
+  if form != 'json':
+    if form != 'nodes':
+      raise ValueError("Unknown form '{}'".format(form))
+    pseudo = src2pseudo(src, typed_signatures, exclude_others, cache, id_strategy, emission, 'json',
+      call_graph, collector, hash_cons, screen, limits)
+    return timed(collector, 'nodes', from_json, pseudo)
+  if cache is not None:
+    return cache.cached(
+      cache_key(src, typed_signatures, exclude_others, VERSION_STRING, id_strategy, call_graph, screen),
+      lambda: src2pseudo(src, typed_signatures, exclude_others, None, id_strategy, emission, 'json',
+        call_graph, collector, hash_cons, screen, limits)
+    )
+  root = timed(collector, 'ast_parse', ast.parse, src)
+  if screen:
+    timed(collector, 'prescreen', check_module, root, exclude_others, typed_signatures)
   return {
     "format": "pseudocodejson",
     "version": VERSION_STRING,
-    **parse_module(root, typed_signatures, exclude_others)
+    **parse_module(root, typed_signatures, exclude_others, id_strategy, emission, call_graph, collector,
+      hash_cons, limits)
   }
 
-def srcfile2pseudo(filename, typed_signatures=None, exclude_others=False):
+def srcfile2pseudo(filename, typed_signatures=None, exclude_others=False, cache=None, id_strategy='uuid',
+    emission='finalize', form='json', call_graph=False, collector=None, hash_cons=False, screen=False,
+    limits=None):
+  with open(filename) as f:
+    src = f.read()
+  return src2pseudo(src, typed_signatures, exclude_others, cache, id_strategy, emission, form, call_graph,
+    collector, hash_cons, screen, limits)
+
+def src2pseudo_stream(src, fp, typed_signatures=None, exclude_others=False, id_strategy='uuid',
+    emission='finalize', indent=2, collector=None, hash_cons=False, limits=None):
+  root = timed(collector, 'ast_parse', ast.parse, src)
+  state = parse_module_state(root, typed_signatures, exclude_others, id_strategy, emission, False, collector,
+    hash_cons, limits)
+  timed(collector, 'write', write_document, fp, [
+      ('format', 'pseudocodejson'),
+      ('version', VERSION_STRING),
+      ('type', 'Module'),
+      ('id', None),
+      ('constants', state.nodes.finalize(state.constants)),
+    ],
+    'procedures',
+    state.nodes.iter_finalized(state.procedures),
+    indent
+  )
+
+def srcfile2pseudo_stream(filename, fp, typed_signatures=None, exclude_others=False, id_strategy='uuid',
+    emission='finalize', indent=2, collector=None, hash_cons=False, limits=None):
   with open(filename) as f:
     src = f.read()
-  return src2pseudo(src, typed_signatures, exclude_others)
+  src2pseudo_stream(src, fp, typed_signatures, exclude_others, id_strategy, emission, indent, collector,
+    hash_cons, limits)
+
+def src2pseudo_binary(src, fp, typed_signatures=None, exclude_others=False, id_strategy='uuid',
+    emission='finalize', hash_cons=False, limits=None):
+  root = ast.parse(src)
+  state = parse_module_state(root, typed_signatures, exclude_others, id_strategy, emission, False, None,
+    hash_cons, limits)
+  binary.write_document(fp, [
+      ('format', 'pseudocodejson'),
+      ('version', VERSION_STRING),
+      ('type', 'Module'),
+      ('id', None),
+      ('constants', state.nodes.finalize(state.constants)),
+    ],
+    'procedures',
+    state.nodes.iter_finalized(state.procedures)
+  )
@@ -1,15 +1,194 @@
 import sys
-import json
-from . import srcfile2pseudo
-
-if not len(sys.argv) in (2, 3):
-  print("Transposes simple python programs into pseudocodejson")
-  print("Usage: pseudocodejson python_source_file [procedure_id]")
-else:
-  if len(sys.argv) == 3:
-    signatures = { sys.argv[2]: { 'return': 'unknown', 'arguments': [] } }
-    exclude = True
+import argparse
+from . import srcfile2pseudo_stream
+from . import batch
+from . import archive
+from . import emit
+from . import server
+from .prescreen import prescreen
+from .limits import Limits
+from .signatures import SignatureCatalog, load as load_catalog
+from .parallel import src2pseudo_parallel
+from .cache import ResultCache
+from .json_stream import dumps, COMPACT_SEPARATORS
+from .parse_utils import ID_STRATEGIES
+
+def procedure_signatures(procedure_id):
+  if procedure_id is None:
+    return None, False
+  return { procedure_id: { 'return': 'unknown', 'arguments': [] } }, True
+
+def batch_main(argv):
+  parser = argparse.ArgumentParser(
+    prog='pseudocodejson batch',
+    description='Transposes a set of python programs into pseudocodejson lines (JSONL)'
+  )
+  parser.add_argument('inputs', nargs='*', help='source files, zip or tar archives, directories or glob patterns')
+  parser.add_argument('--files-from', metavar='FILE', help="read input paths from a file, '-' for stdin")
+  parser.add_argument('--pattern', default=batch.DEFAULT_PATTERN,
+    help='file name pattern inside directories and archives')
+  parser.add_argument('--max-member-bytes', type=int, default=archive.DEFAULT_MAX_MEMBER_BYTES,
+    help='largest source read from an archive')
+  parser.add_argument('--procedure', metavar='ID', help='only include the given procedure and its callees')
+  parser.add_argument('--signatures', metavar='FILE', help='typed signatures as a JSON or binary catalog file')
+  parser.add_argument('-o', '--output', metavar='FILE',
+    help='output file or a zip or tar archive of one document per source, defaults to stdout')
+  parser.add_argument('-j', '--workers', type=int, help='number of worker processes, defaults to cpu count')
+  parser.add_argument('--chunksize', type=int, default=batch.DEFAULT_CHUNKSIZE, help='files per worker task')
+  parser.add_argument('--ids', choices=list(ID_STRATEGIES), default='uuid', help='identifier strategy')
+  parser.add_argument('--cache-dir', metavar='DIR', help='reuse results from an on-disk cache')
+  parser.add_argument('--cache-size', type=int, metavar='MB', default=256, help='on-disk cache size bound')
+  args = parser.parse_args(argv)
+
+  inputs = list(args.inputs)
+  if args.files_from == '-':
+    inputs.extend(batch.read_file_list(sys.stdin))
+  elif args.files_from:
+    with open(args.files_from) as f:
+      inputs.extend(batch.read_file_list(f))
+  files = batch.collect_files(inputs, args.pattern)
+  signatures, exclude = procedure_signatures(args.procedure)
+  if args.signatures:
+    # The catalog is built before the worker pool so that forked workers share it.
+    # The --procedure placeholder only stands in for a procedure it does not type.
+    catalog = load_catalog(args.signatures)
+    signatures = catalog if signatures is None or args.procedure in catalog \
+      else SignatureCatalog({ **signatures, **catalog })
+  cache = ResultCache(directory=args.cache_dir, max_bytes=args.cache_size * 1024 * 1024) if args.cache_dir else None
+
+  # Archive members are streamed to the workers instead of extracted.
+  sources = archive.iter_sources(files, args.pattern, args.max_member_bytes)
+  if args.output and archive.archive_kind(args.output):
+    archive.write_archive(args.output, sources, signatures, exclude, args.workers, args.chunksize, cache, args.ids)
+    return
+  out = open(args.output, 'w') if args.output else sys.stdout
+  try:
+    if any(archive.archive_kind(f) for f in files):
+      archive.write_jsonl(out, sources, signatures, exclude, args.workers, args.chunksize, cache, args.ids)
+    else:
+      batch.write_jsonl(out, files, signatures, exclude, args.workers, args.chunksize, cache, args.ids)
+  finally:
+    if args.output:
+      out.close()
+
+def emit_main(argv):
+  parser = argparse.ArgumentParser(
+    prog='pseudocodejson emit',
+    description='Writes pseudocodejson lines (JSONL) back out as source code lines'
+  )
+  parser.add_argument('inputs', nargs='*', help="JSONL files from batch or one document per line, defaults to stdin")
+  parser.add_argument('-l', '--language', choices=list(emit.LANGUAGES), default='python', help='target language')
+  parser.add_argument('--class-name', default='Main', help='class wrapping the Java output')
+  parser.add_argument('-o', '--output', metavar='FILE', help='output file, defaults to stdout')
+  parser.add_argument('-j', '--workers', type=int, help='number of worker processes, defaults to cpu count')
+  parser.add_argument('--chunksize', type=int, default=batch.DEFAULT_CHUNKSIZE, help='records per worker task')
+  args = parser.parse_args(argv)
+
+  options = { 'class_name': args.class_name } if args.language == 'java' else {}
+  out = open(args.output, 'w') if args.output else sys.stdout
+  try:
+    for lines in input_lines(args.inputs):
+      emit.write_sources(out, lines, args.language, args.workers, args.chunksize, **options)
+  finally:
+    if args.output:
+      out.close()
+
+def serve_main(argv):
+  parser = argparse.ArgumentParser(
+    prog='pseudocodejson serve',
+    description='Serves conversions as line delimited JSON-RPC on stdio or a unix socket'
+  )
+  parser.add_argument('--socket', metavar='PATH', help='listen on a unix socket instead of stdio')
+  parser.add_argument('-j', '--workers', type=int, help='number of worker processes, defaults to cpu count')
+  parser.add_argument('--max-pending', type=int, default=server.DEFAULT_MAX_PENDING,
+    help='requests in flight before input is no longer read')
+  parser.add_argument('--max-batch', type=int, default=server.DEFAULT_MAX_BATCH, help='sources per convert_batch')
+  parser.add_argument('--max-seconds', type=float, help='wall clock budget of one conversion')
+  parser.add_argument('--max-ast-nodes', type=int, help='python ast nodes accepted in one source')
+  parser.add_argument('--max-output-nodes', type=int, help='pseudocodejson nodes created for one source')
+  parser.add_argument('--max-depth', type=int, help='nesting depth of statements and expressions')
+  parser.add_argument('--max-procedures', type=int, help='procedures defined in one source')
+  args = parser.parse_args(argv)
+
+  budget = (args.max_ast_nodes, args.max_output_nodes, args.max_depth, args.max_procedures, args.max_seconds)
+  limits = Limits(*budget) if any(v is not None for v in budget) else None
+  server.serve(args.socket, args.workers, args.max_pending, args.max_batch, limits)
+
+def check_main(argv):
+  parser = argparse.ArgumentParser(
+    prog='pseudocodejson check',
+    description='Lists the unsupported constructs of python programs without converting them'
+  )
+  parser.add_argument('inputs', nargs='+', help='source files, directories or glob patterns')
+  parser.add_argument('--pattern', default=batch.DEFAULT_PATTERN, help='file name pattern inside directories')
+  parser.add_argument('--procedure', metavar='ID', help='only check the given procedure and its callees as conversion would')
+  args = parser.parse_args(argv)
+
+  signatures, exclude = procedure_signatures(args.procedure)
+  status = 0
+  for name in batch.collect_files(args.inputs, args.pattern):
+    with open(name) as f:
+      src = f.read()
+    try:
+      issues = prescreen(src, exclude, signatures)
+    except SyntaxError as error:
+      print('{}:{:d}: SyntaxError: {}'.format(name, error.lineno or 0, error.msg))
+      status = 1
+      continue
+    for issue in issues:
+      print('{}:{:d}: Unsupported {}'.format(name, issue['line'], issue['feature']))
+    if issues:
+      status = 1
+  return status
+
+def input_lines(inputs):
+  if not inputs:
+    yield sys.stdin
+  for name in inputs:
+    with open(name) as f:
+      yield f
+
+def file_main(argv):
+  parser = argparse.ArgumentParser(
+    prog='pseudocodejson',
+    description='Transposes simple python programs into pseudocodejson'
+  )
+  parser.add_argument('source', help='python source file')
+  parser.add_argument('procedure', nargs='?', help='only include the given procedure and its callees')
+  parser.add_argument('--compact', action='store_true', help='write without indentation')
+  parser.add_argument('--ids', choices=list(ID_STRATEGIES), default='uuid', help='identifier strategy')
+  parser.add_argument('-j', '--workers', type=int, help='convert function bodies in worker processes')
+  args = parser.parse_args(argv)
+
+  signatures, exclude = procedure_signatures(args.procedure)
+  if args.workers:
+    with open(args.source) as f:
+      src = f.read()
+    pseudo = src2pseudo_parallel(src, signatures, exclude, args.ids, 'direct', workers=args.workers)
+    sys.stdout.write(dumps(pseudo, None, COMPACT_SEPARATORS) if args.compact else dumps(pseudo, 2))
+  else:
+    srcfile2pseudo_stream(args.source, sys.stdout, signatures, exclude, args.ids, 'direct',
+      None if args.compact else 2)
+  sys.stdout.write('\n')
+
+def main(argv):
+  if len(argv) > 0 and argv[0] == 'batch':
+    batch_main(argv[1:])
+  elif len(argv) > 0 and argv[0] == 'emit':
+    emit_main(argv[1:])
+  elif len(argv) > 0 and argv[0] == 'serve':
+    serve_main(argv[1:])
+  elif len(argv) > 0 and argv[0] == 'check':
+    sys.exit(check_main(argv[1:]))
+  elif len(argv) == 0:
+    print("Transposes simple python programs into pseudocodejson")
+    print("Usage: pseudocodejson [--compact] [--ids STRATEGY] python_source_file [procedure_id]")
+    print("       pseudocodejson batch [options] inputs...")
+    print("       pseudocodejson emit [--language LANGUAGE] [options] [inputs...]")
+    print("       pseudocodejson serve [--socket PATH] [options]")
+    print("       pseudocodejson check [options] inputs...")
   else:
-    signatures = None
-    exclude = False
-  print(json.dumps(srcfile2pseudo(sys.argv[1], signatures, exclude), indent=2))
+    file_main(argv)
+
+if __name__ == '__main__':
+  main(sys.argv[1:])
@@ -0,0 +1,199 @@
+import io
+import os
+import time
+import zlib
+import tarfile
+import zipfile
+import tokenize
+from collections import deque
+from fnmatch import fnmatch
+from functools import partial
+from itertools import islice
+from multiprocessing import Pool
+from . import src2pseudo
+from .batch import DEFAULT_PATTERN, DEFAULT_CHUNKSIZE, error_text
+from .parse_utils import ResourceLimitError
+from .json_stream import dumps
+
+# Reads python sources straight out of zip and tar submission archives
+# without extracting them. Tar archives are read as a stream, so compressed
+# ones are decompressed once front to back. Sources are decoded as python
+# itself would, from a BOM or coding cookie and otherwise as utf-8.
+#
+# A source is (archive, name, data): the archive path or None for a plain
+# file, the member or file name and the bytes, or the error that stopped
+# reading them. An archive that cannot be read on is a source of its own
+# after the members read before it broke off.
+
+ZIP_SUFFIXES = ('.zip',)
+TAR_MODES = (
+  ('.tar.gz', 'gz'), ('.tgz', 'gz'), ('.tar.bz2', 'bz2'), ('.tbz2', 'bz2'),
+  ('.tar.xz', 'xz'), ('.txz', 'xz'), ('.tar', ''),
+)
+DEFAULT_MAX_MEMBER_BYTES = 16 * 1024 * 1024
+TASKS_AHEAD = 4
+ARCHIVE_ERRORS = (OSError, EOFError, zipfile.BadZipFile, tarfile.TarError)
+MEMBER_ERRORS = (OSError, EOFError, zipfile.BadZipFile, zlib.error)
+
+def archive_kind(path):
+  name = path.lower()
+  if name.endswith(ZIP_SUFFIXES):
+    return 'zip'
+  for suffix, compression in TAR_MODES:
+    if name.endswith(suffix):
+      return 'tar:' + compression
+  return None
+
+def member_matches(name, pattern=DEFAULT_PATTERN):
+  # Resource forks that macOS adds to zip files carry the same names.
+  if name.startswith('__MACOSX/') or name.rsplit('/', 1)[-1].startswith('._'):
+    return False
+  return fnmatch(name if '/' in pattern else name.rsplit('/', 1)[-1], pattern)
+
+def oversized(size, max_bytes):
+  return ResourceLimitError('max_member_bytes', max_bytes, { 'bytes': size })
+
+def read_bounded(f, size, max_bytes):
+  if max_bytes is not None and size > max_bytes:
+    return oversized(size, max_bytes)
+  data = f.read() if max_bytes is None else f.read(max_bytes + 1)
+  if max_bytes is not None and len(data) > max_bytes:
+    return oversized(len(data), max_bytes)
+  return data
+
+def read_members(archive, pattern=DEFAULT_PATTERN, max_bytes=DEFAULT_MAX_MEMBER_BYTES, kind=None):
+  # The archive is a path or a binary file, a tar file need not be seekable.
+  kind = kind or archive_kind(archive if isinstance(archive, str) else getattr(archive, 'name', ''))
+  if kind == 'zip':
+    with zipfile.ZipFile(archive) as zf:
+      for info in zf.infolist():
+        if not info.is_dir() and member_matches(info.filename, pattern):
+          # Zip members are read independently, a corrupt one spoils only itself.
+          try:
+            with zf.open(info) as f:
+              data = read_bounded(f, info.file_size, max_bytes)
+          except MEMBER_ERRORS as error:
+            data = error
+          yield info.filename, data
+  elif kind is not None and kind.startswith('tar:'):
+    source = { 'name': archive } if isinstance(archive, str) else { 'fileobj': archive }
+    with tarfile.open(mode='r|*', **source) as tf:
+      for info in tf:
+        if info.isfile() and member_matches(info.name, pattern):
+          yield info.name, read_bounded(tf.extractfile(info), info.size, max_bytes)
+  else:
+    raise ValueError("Unknown archive type of '{}'".format(archive))
+
+def read_file(filename, max_bytes=DEFAULT_MAX_MEMBER_BYTES):
+  with open(filename, 'rb') as f:
+    return read_bounded(f, os.fstat(f.fileno()).st_size, max_bytes)
+
+def iter_sources(paths, pattern=DEFAULT_PATTERN, max_bytes=DEFAULT_MAX_MEMBER_BYTES):
+  for path in paths:
+    if archive_kind(path) is None:
+      try:
+        yield None, path, read_file(path, max_bytes)
+      except OSError as error:
+        yield None, path, error
+    else:
+      try:
+        for name, data in read_members(path, pattern, max_bytes):
+          yield path, name, data
+      except ARCHIVE_ERRORS as error:
+        yield None, path, error
+
+def decode_source(data):
+  encoding, _ = tokenize.detect_encoding(io.BytesIO(data).readline)
+  return data.decode(encoding)
+
+def source_record(archive, name):
+  return { 'archive': archive, 'file': name } if archive is not None else { 'file': name }
+
+def convert_source(source, typed_signatures=None, exclude_others=False, cache=None, id_strategy='uuid'):
+  archive, name, data = source
+  record = source_record(archive, name)
+  try:
+    if isinstance(data, Exception):
+      raise data
+    record['result'] = src2pseudo(decode_source(data), typed_signatures, exclude_others, cache, id_strategy,
+      'direct')
+  except Exception as error:
+    record['error'] = error_text(error)
+  return record
+
+def convert_source_line(source, typed_signatures=None, exclude_others=False, cache=None, id_strategy='uuid'):
+  return dumps(convert_source(source, typed_signatures, exclude_others, cache, id_strategy))
+
+def convert_source_entry(source, typed_signatures=None, exclude_others=False, cache=None, id_strategy='uuid'):
+  # An output archive member per source, the document or the error text.
+  record = convert_source(source, typed_signatures, exclude_others, cache, id_strategy)
+  name = entry_name(source[0], source[1])
+  if 'error' in record:
+    return name + '.error', record['error']
+  return name + '.json', dumps(record['result'])
+
+def entry_name(archive, name):
+  # Members go under the archive name, never outside of the output root.
+  parts = [os.path.basename(archive)] if archive is not None else []
+  parts.extend(p for p in name.replace('\\', '/').split('/') if p not in ('', '.', '..'))
+  return '/'.join(parts)
+
+def map_chunk(func, chunk):
+  return [func(item) for item in chunk]
+
+def imap_streamed(func, items, workers=None, chunksize=DEFAULT_CHUNKSIZE):
+  # Unlike Pool.imap, reads ahead only a few chunks per worker so that the
+  # sources of a large archive are not all held in memory at once.
+  if workers == 1:
+    yield from map(func, items)
+    return
+  items = iter(items)
+  with Pool(workers) as pool:
+    ahead = (workers or os.cpu_count() or 1) * TASKS_AHEAD
+    pending = deque()
+    while True:
+      chunk = list(islice(items, chunksize))
+      if chunk:
+        pending.append(pool.apply_async(map_chunk, (func, chunk)))
+      if pending and (not chunk or len(pending) >= ahead):
+        yield from pending.popleft().get()
+      elif not chunk:
+        break
+
+def write_jsonl(out, sources, typed_signatures=None, exclude_others=False,
+    workers=None, chunksize=DEFAULT_CHUNKSIZE, cache=None, id_strategy='uuid'):
+  func = partial(convert_source_line, typed_signatures=typed_signatures,
+    exclude_others=exclude_others, cache=cache, id_strategy=id_strategy)
+  count = 0
+  for line in imap_streamed(func, sources, workers, chunksize):
+    out.write(line)
+    out.write('\n')
+    count += 1
+  return count
+
+def write_archive(output, sources, typed_signatures=None, exclude_others=False,
+    workers=None, chunksize=DEFAULT_CHUNKSIZE, cache=None, id_strategy='uuid', kind=None):
+  # The output is a path or a binary file, neither needs to be seekable.
+  kind = kind or archive_kind(output if isinstance(output, str) else getattr(output, 'name', ''))
+  if kind is None:
+    raise ValueError("Unknown archive type of '{}'".format(output))
+  func = partial(convert_source_entry, typed_signatures=typed_signatures,
+    exclude_others=exclude_others, cache=cache, id_strategy=id_strategy)
+  entries = imap_streamed(func, sources, workers, chunksize)
+  count = 0
+  if kind == 'zip':
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as zf:
+      for name, text in entries:
+        zf.writestr(name, text)
+        count += 1
+  else:
+    target = { 'name': output } if isinstance(output, str) else { 'fileobj': output }
+    with tarfile.open(mode='w|' + kind[4:], **target) as tf:
+      for name, text in entries:
+        data = text.encode('utf-8')
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        tf.addfile(info, io.BytesIO(data))
+        count += 1
+  return count
@@ -0,0 +1,64 @@
+import os
+import glob
+from fnmatch import fnmatch
+from functools import partial
+from multiprocessing import Pool
+from . import srcfile2pseudo
+from .json_stream import dumps
+
+DEFAULT_PATTERN = '*.py'
+DEFAULT_CHUNKSIZE = 16
+
+def collect_files(inputs, pattern=DEFAULT_PATTERN):
+  files = []
+  for path in inputs:
+    if os.path.isdir(path):
+      for root, dirs, names in os.walk(path):
+        dirs.sort()
+        files.extend(os.path.join(root, n) for n in sorted(names) if fnmatch(n, pattern))
+    elif glob.has_magic(path):
+      files.extend(sorted(glob.glob(path, recursive=True)))
+    else:
+      files.append(path)
+  return files
+
+def read_file_list(f):
+  return [line.strip() for line in f if line.strip()]
+
+def error_text(error):
+  return "{}: {}".format(error.__class__.__name__, error)
+
+def convert_file(filename, typed_signatures=None, exclude_others=False, cache=None, id_strategy='uuid'):
+  try:
+    result = srcfile2pseudo(filename, typed_signatures, exclude_others, cache, id_strategy)
+    return { 'file': filename, 'result': result }
+  except Exception as error:
+    return { 'file': filename, 'error': error_text(error) }
+
+def convert_file_line(filename, typed_signatures=None, exclude_others=False, cache=None, id_strategy='uuid'):
+  return dumps(convert_file(filename, typed_signatures, exclude_others, cache, id_strategy))
+
+def imap_ordered(func, items, workers=None, chunksize=DEFAULT_CHUNKSIZE):
+  if workers == 1:
+    yield from map(func, items)
+  else:
+    with Pool(workers) as pool:
+      yield from pool.imap(func, items, chunksize)
+
+def convert_files(files, typed_signatures=None, exclude_others=False,
+    workers=None, chunksize=DEFAULT_CHUNKSIZE, cache=None, id_strategy='uuid'):
+  func = partial(convert_file, typed_signatures=typed_signatures,
+    exclude_others=exclude_others, cache=cache, id_strategy=id_strategy)
+  return imap_ordered(func, files, workers, chunksize)
+
+def write_jsonl(out, files, typed_signatures=None, exclude_others=False,
+    workers=None, chunksize=DEFAULT_CHUNKSIZE, cache=None, id_strategy='uuid'):
+  # Records are serialized inside the workers to keep the parent process light.
+  func = partial(convert_file_line, typed_signatures=typed_signatures,
+    exclude_others=exclude_others, cache=cache, id_strategy=id_strategy)
+  count = 0
+  for line in imap_ordered(func, files, workers, chunksize):
+    out.write(line)
+    out.write('\n')
+    count += 1
+  return count
@@ -0,0 +1,448 @@
+import io
+import re
+import struct
+import uuid as uuidlib
+
+# Compact binary form of pseudocodejson documents. Values are tagged, every
+# string is interned into a table shared by the whole document: a new string
+# is written once and later occurrences refer to its index. The table starts
+# from the schema vocabulary so keys, node names, types and ops cost a single
+# byte even on first use. Canonical uuid strings are stored as 16 bytes.
+#
+# File layout: MAGIC, head chunk, item chunks, empty chunk, tail chunk. Each
+# chunk is a varint byte length and the tagged value. The head holds the
+# fields before the item list and the key of the list, items are streamed one
+# chunk each and the tail holds the fields after the list.
+
+MAGIC = b'PCJB\x01'
+ITEMS_KEY = 'procedures'
+
+SEED_STRINGS = (
+  'format', 'version', 'type', 'id', 'constants', 'procedures', 'call_graph', 'pseudocodejson',
+  'Module', 'Statement', 'Expression', 'uuid', 'parameters', 'body', 'array', 'procedure',
+  'arguments', 'variable', 'expression', 'target', 'indexes', 'guard', 'alternative', 'call',
+  'builtin', 'value', 'op', 'left', 'right',
+  'Procedure', 'Variable', 'Call', 'Return', 'Assignment', 'Array Assignment', 'Selection',
+  'Loop', 'Break', 'Continue', 'Array Length', 'Array Element', 'Literal', 'Binary Op',
+  'Unary Op',
+  'int', 'double', 'boolean', 'string', 'unknown', 'void',
+  'and', 'or', 'add', 'sub', 'mul', 'div', 'idiv', 'mod', 'equal', 'different', 'greater',
+  'greater_eq', 'smaller', 'smaller_eq', 'minus', 'not',
+  'builtin:bnAbs', 'builtin:bnInt', 'builtin:bnRound', 'print', 'range', '__name__',
+)
+
+T_NONE, T_FALSE, T_TRUE, T_INT, T_FLOAT = 0x00, 0x01, 0x02, 0x03, 0x04
+T_STR, T_UUID, T_REF, T_LIST, T_MAP = 0x05, 0x06, 0x07, 0x08, 0x09
+T_SMALL_INT = 0x20 # 0x20-0x3f hold the ints 0-31
+T_SMALL_REF = 0x80 # 0x80-0xff refer to the first 128 table strings
+DOUBLE = struct.Struct('>d')
+MISSING = object()
+UUID_RE = re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\Z')
+
+class BinaryFormatError(ValueError):
+  pass
+
+def write_varint(out, n):
+  while n > 0x7f:
+    out.append((n & 0x7f) | 0x80)
+    n >>= 7
+  out.append(n)
+
+def read_varint(data, pos):
+  n = shift = 0
+  while True:
+    try:
+      b = data[pos]
+    except IndexError:
+      raise BinaryFormatError('Truncated varint') from None
+    pos += 1
+    n |= (b & 0x7f) << shift
+    if b < 0x80:
+      return n, pos
+    shift += 7
+
+class Encoder:
+
+  def __init__(self):
+    self.table = { s: i for i, s in enumerate(SEED_STRINGS) }
+
+  def string(self, out, s):
+    i = self.table.get(s)
+    if i is not None:
+      if i < 0x80:
+        out.append(T_SMALL_REF | i)
+      else:
+        out.append(T_REF)
+        write_varint(out, i)
+      return
+    self.table[s] = len(self.table)
+    if len(s) == 36 and UUID_RE.match(s):
+      out.append(T_UUID)
+      out += uuidlib.UUID(s).bytes
+    else:
+      data = s.encode('utf-8', 'surrogatepass')
+      out.append(T_STR)
+      write_varint(out, len(data))
+      out += data
+
+  def value(self, out, v):
+    # Recursion is faster, expression chains that nest deeper than the
+    # recursion limit start over without it.
+    start = len(out)
+    size = len(self.table)
+    try:
+      self.value_recursive(out, v)
+    except RecursionError:
+      del out[start:]
+      for s in list(self.table)[size:]:
+        del self.table[s]
+      self.value_iterative(out, v)
+
+  def value_recursive(self, out, v):
+    t = type(v)
+    if t is str:
+      self.string(out, v)
+    elif t is dict:
+      out.append(T_MAP)
+      write_varint(out, len(v))
+      for key, item in v.items():
+        self.string(out, key)
+        self.value_recursive(out, item)
+    elif t is list:
+      out.append(T_LIST)
+      write_varint(out, len(v))
+      for item in v:
+        self.value_recursive(out, item)
+    elif v is None:
+      out.append(T_NONE)
+    elif t is bool:
+      out.append(T_TRUE if v else T_FALSE)
+    elif t is int:
+      if 0 <= v < 32:
+        out.append(T_SMALL_INT | v)
+      else:
+        out.append(T_INT)
+        write_varint(out, v << 1 if v >= 0 else ((-v) << 1) - 1)
+    elif t is float:
+      out.append(T_FLOAT)
+      out += DOUBLE.pack(v)
+    else:
+      raise TypeError('Cannot encode {!r}'.format(v))
+
+  def value_iterative(self, out, v):
+    # Containers are walked with an explicit stack of their item iterators.
+    string = self.string
+    stack = []
+    while True:
+      t = type(v)
+      if t is str:
+        string(out, v)
+      elif t is dict:
+        out.append(T_MAP)
+        write_varint(out, len(v))
+        if v:
+          stack.append((True, iter(v.items())))
+      elif t is list:
+        out.append(T_LIST)
+        write_varint(out, len(v))
+        if v:
+          stack.append((False, iter(v)))
+      elif v is None:
+        out.append(T_NONE)
+      elif t is bool:
+        out.append(T_TRUE if v else T_FALSE)
+      elif t is int:
+        if 0 <= v < 32:
+          out.append(T_SMALL_INT | v)
+        else:
+          out.append(T_INT)
+          write_varint(out, v << 1 if v >= 0 else ((-v) << 1) - 1)
+      elif t is float:
+        out.append(T_FLOAT)
+        out += DOUBLE.pack(v)
+      else:
+        raise TypeError('Cannot encode {!r}'.format(v))
+      while stack:
+        is_map, items = stack[-1]
+        item = next(items, MISSING)
+        if item is MISSING:
+          stack.pop()
+        elif is_map:
+          string(out, item[0])
+          v = item[1]
+          break
+        else:
+          v = item
+          break
+      else:
+        return
+
+  def chunk(self, v):
+    payload = bytearray()
+    self.value(payload, v)
+    out = bytearray()
+    write_varint(out, len(payload))
+    out += payload
+    return out
+
+class Decoder:
+
+  def __init__(self):
+    self.table = list(SEED_STRINGS)
+
+  def value(self, data, pos):
+    size = len(self.table)
+    try:
+      return self.value_recursive(data, pos)
+    except RecursionError:
+      del self.table[size:]
+      return self.value_iterative(data, pos)
+
+  def value_recursive(self, data, pos):
+    try:
+      tag = data[pos]
+    except IndexError:
+      raise BinaryFormatError('Truncated value') from None
+    pos += 1
+    if tag >= T_SMALL_REF:
+      return self.table[tag & 0x7f], pos
+    if tag == T_MAP:
+      n, pos = read_varint(data, pos)
+      d = {}
+      table = self.table
+      value = self.value_recursive
+      # Keys and most leaves are single byte table references, read them inline.
+      for _ in range(n):
+        tag = data[pos]
+        if tag >= T_SMALL_REF:
+          key = table[tag & 0x7f]
+          pos += 1
+        else:
+          key, pos = value(data, pos)
+        tag = data[pos]
+        if tag >= T_SMALL_REF:
+          d[key] = table[tag & 0x7f]
+          pos += 1
+        else:
+          d[key], pos = value(data, pos)
+      return d, pos
+    if tag == T_LIST:
+      n, pos = read_varint(data, pos)
+      items = []
+      for _ in range(n):
+        item, pos = self.value_recursive(data, pos)
+        items.append(item)
+      return items, pos
+    if T_SMALL_INT <= tag < T_SMALL_INT + 32:
+      return tag - T_SMALL_INT, pos
+    if tag == T_REF:
+      i, pos = read_varint(data, pos)
+      return self.table[i], pos
+    if tag == T_STR:
+      n, pos = read_varint(data, pos)
+      s = str(data[pos:pos + n], 'utf-8', 'surrogatepass')
+      self.table.append(s)
+      return s, pos + n
+    if tag == T_UUID:
+      s = str(uuidlib.UUID(bytes=bytes(data[pos:pos + 16])))
+      self.table.append(s)
+      return s, pos + 16
+    if tag == T_NONE:
+      return None, pos
+    if tag == T_FALSE:
+      return False, pos
+    if tag == T_TRUE:
+      return True, pos
+    if tag == T_INT:
+      n, pos = read_varint(data, pos)
+      return (n >> 1) if not n & 1 else -((n + 1) >> 1), pos
+    if tag == T_FLOAT:
+      return DOUBLE.unpack_from(data, pos)[0], pos + 8
+    raise BinaryFormatError('Unknown tag 0x{:02x}'.format(tag))
+
+  def value_iterative(self, data, pos):
+    # Containers are attached to their parent when opened and filled from an
+    # explicit stack of [container, items left, is map] frames.
+    table = self.table
+    stack = []
+    result = None
+    while True:
+      if stack and stack[-1][2]:
+        tag = data[pos]
+        if tag >= T_SMALL_REF:
+          key = table[tag & 0x7f]
+          pos += 1
+        else:
+          key, pos = self.scalar(data, pos + 1, tag)
+      try:
+        tag = data[pos]
+      except IndexError:
+        raise BinaryFormatError('Truncated value') from None
+      pos += 1
+      n = 0
+      if tag >= T_SMALL_REF:
+        v = table[tag & 0x7f]
+      elif tag == T_MAP or tag == T_LIST:
+        n, pos = read_varint(data, pos)
+        v = {} if tag == T_MAP else []
+      else:
+        v, pos = self.scalar(data, pos, tag)
+      if stack:
+        frame = stack[-1]
+        if frame[2]:
+          frame[0][key] = v
+        else:
+          frame[0].append(v)
+        frame[1] -= 1
+      else:
+        result = v
+      if n:
+        stack.append([v, n, tag == T_MAP])
+      while stack and not stack[-1][1]:
+        stack.pop()
+      if not stack:
+        return result, pos
+
+  def scalar(self, data, pos, tag):
+    if tag >= T_SMALL_REF:
+      return self.table[tag & 0x7f], pos
+    if T_SMALL_INT <= tag < T_SMALL_INT + 32:
+      return tag - T_SMALL_INT, pos
+    if tag == T_REF:
+      i, pos = read_varint(data, pos)
+      return self.table[i], pos
+    if tag == T_STR:
+      n, pos = read_varint(data, pos)
+      s = str(data[pos:pos + n], 'utf-8', 'surrogatepass')
+      self.table.append(s)
+      return s, pos + n
+    if tag == T_UUID:
+      s = str(uuidlib.UUID(bytes=bytes(data[pos:pos + 16])))
+      self.table.append(s)
+      return s, pos + 16
+    if tag == T_NONE:
+      return None, pos
+    if tag == T_FALSE:
+      return False, pos
+    if tag == T_TRUE:
+      return True, pos
+    if tag == T_INT:
+      n, pos = read_varint(data, pos)
+      return (n >> 1) if not n & 1 else -((n + 1) >> 1), pos
+    if tag == T_FLOAT:
+      return DOUBLE.unpack_from(data, pos)[0], pos + 8
+    raise BinaryFormatError('Unknown tag 0x{:02x}'.format(tag))
+
+  def chunk(self, data, pos=0):
+    n, pos = read_varint(data, pos)
+    end = pos + n
+    if end > len(data):
+      raise BinaryFormatError('Truncated chunk')
+    try:
+      value, p = self.value(data, pos)
+    except IndexError:
+      raise BinaryFormatError('Truncated or corrupt chunk') from None
+    if p != end:
+      raise BinaryFormatError('Chunk length mismatch')
+    return value, end
+
+def split_document(document, items_key=ITEMS_KEY):
+  items = document.get(items_key)
+  if type(items) is not list:
+    return list(document.items()), None, [], []
+  keys = list(document)
+  i = keys.index(items_key)
+  return (
+    [(k, document[k]) for k in keys[:i]],
+    items_key,
+    items,
+    [(k, document[k]) for k in keys[i + 1:]],
+  )
+
+def write_document(fp, fields, items_key, items, trailing=()):
+  encoder = Encoder()
+  fp.write(MAGIC)
+  fp.write(encoder.chunk([dict(fields), items_key]))
+  for item in items:
+    fp.write(encoder.chunk(item))
+  fp.write(b'\x00')
+  fp.write(encoder.chunk(dict(trailing)))
+
+def dumps(document, items_key=ITEMS_KEY):
+  out = io.BytesIO()
+  write_document(out, *split_document(document, items_key))
+  return out.getvalue()
+
+class DocumentReader:
+
+  def __init__(self, fp):
+    self.fp = fp
+    self.decoder = Decoder()
+    if fp.read(len(MAGIC)) != MAGIC:
+      raise BinaryFormatError('Not a binary pseudocodejson document')
+    head = self.read_chunk()
+    if head is None:
+      raise BinaryFormatError('Missing document head')
+    self.fields, self.items_key = head
+    self.trailing = None
+
+  def read_chunk(self):
+    n = shift = 0
+    while True:
+      b = self.fp.read(1)
+      if not b:
+        raise BinaryFormatError('Truncated document')
+      n |= (b[0] & 0x7f) << shift
+      if b[0] < 0x80:
+        break
+      shift += 7
+    if n == 0:
+      return None
+    payload = self.fp.read(n)
+    if len(payload) != n:
+      raise BinaryFormatError('Truncated chunk')
+    try:
+      value, pos = self.decoder.value(memoryview(payload), 0)
+    except IndexError:
+      raise BinaryFormatError('Truncated or corrupt chunk') from None
+    if pos != n:
+      raise BinaryFormatError('Chunk length mismatch')
+    return value
+
+  def __iter__(self):
+    while True:
+      item = self.read_chunk()
+      if item is None:
+        break
+      yield item
+    self.trailing = self.read_chunk()
+
+  def read(self):
+    document = dict(self.fields)
+    items = list(self)
+    if self.items_key is not None:
+      document[self.items_key] = items
+    document.update(self.trailing)
+    return document
+
+def loads(data):
+  data = memoryview(data)
+  if bytes(data[:len(MAGIC)]) != MAGIC:
+    raise BinaryFormatError('Not a binary pseudocodejson document')
+  decoder = Decoder()
+  (fields, items_key), pos = decoder.chunk(data, len(MAGIC))
+  document = dict(fields)
+  items = []
+  while True:
+    if pos >= len(data):
+      raise BinaryFormatError('Truncated document')
+    if data[pos] == 0:
+      pos += 1
+      break
+    item, pos = decoder.chunk(data, pos)
+    items.append(item)
+  if items_key is not None:
+    document[items_key] = items
+  trailing, pos = decoder.chunk(data, pos)
+  document.update(trailing)
+  return document
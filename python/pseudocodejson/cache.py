@@ -0,0 +1,175 @@
+import os
+import json
+import hashlib
+import tempfile
+from collections import OrderedDict
+from . import parse_utils as u
+from .signatures import signatures_digest
+
+CACHED_ERRORS = (u.ParseError, u.ParseUnsupportedError, u.MissingNameError)
+DEFAULT_MAXSIZE = 1024
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+EVICT_RATIO = 0.9
+
+def cache_key(src, typed_signatures, exclude_others, version, id_strategy='uuid', call_graph=False, screen=False):
+  h = hashlib.sha256()
+  h.update(version.encode())
+  h.update(b'\0')
+  h.update(id_strategy.encode())
+  h.update(b'\1' if call_graph else b'\0')
+  h.update(b'\1' if screen else b'\0')
+  h.update(signatures_digest(typed_signatures).encode())
+  h.update(b'\1' if exclude_others else b'\0')
+  h.update(src.encode('utf-8', 'surrogatepass'))
+  return h.hexdigest()
+
+def encode_result(result):
+  return json.dumps({ 'result': result })
+
+def encode_error(error):
+  entry = { 'error': error.__class__.__name__, 'message': str(error) }
+  if isinstance(error, u.MissingNameError):
+    entry['id'] = error.id
+  elif isinstance(error, u.UnsupportedConstructsError):
+    entry['issues'] = error.issues
+  return json.dumps(entry)
+
+def decode_entry(text):
+  entry = json.loads(text)
+  if 'result' in entry:
+    return entry['result']
+  if entry['error'] == 'MissingNameError':
+    raise u.MissingNameError(entry['id'])
+  if entry['error'] == 'ParseError':
+    raise u.ParseError(entry['message'])
+  if entry['error'] == 'UnsupportedConstructsError':
+    raise u.UnsupportedConstructsError(entry['issues'])
+  raise u.ParseUnsupportedError(entry['message'])
+
+class ResultCache:
+
+  def __init__(self, maxsize=DEFAULT_MAXSIZE, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+    self.maxsize = maxsize
+    self.directory = directory
+    self.max_bytes = max_bytes
+    self.memory = OrderedDict()
+    self.disk_bytes = None
+    self.hits = 0
+    self.misses = 0
+
+  def __getstate__(self):
+    # Copies sent to worker processes share the disk store only.
+    state = self.__dict__.copy()
+    state['memory'] = OrderedDict()
+    state['disk_bytes'] = None
+    return state
+
+  def cached(self, key, convert):
+    text = self.get(key)
+    if text is not None:
+      self.hits += 1
+      return decode_entry(text)
+    self.misses += 1
+    try:
+      result = convert()
+    except CACHED_ERRORS as error:
+      self.put(key, encode_error(error))
+      raise
+    try:
+      text = encode_result(result)
+    except RecursionError:
+      # json.loads could not read back chains nesting this deep.
+      return result
+    self.put(key, text)
+    return result
+
+  def get(self, key):
+    text = self.memory.get(key)
+    if text is not None:
+      self.memory.move_to_end(key)
+      return text
+    if self.directory:
+      text = self.disk_get(key)
+      if text is not None:
+        self.memory_put(key, text)
+    return text
+
+  def put(self, key, text):
+    self.memory_put(key, text)
+    if self.directory:
+      self.disk_put(key, text)
+
+  def clear(self):
+    self.memory.clear()
+    if self.directory:
+      for path, _, _ in self.disk_entries():
+        os.remove(path)
+      self.disk_bytes = 0
+
+  def memory_put(self, key, text):
+    if self.maxsize <= 0:
+      return
+    self.memory[key] = text
+    self.memory.move_to_end(key)
+    while len(self.memory) > self.maxsize:
+      self.memory.popitem(last=False)
+
+  def disk_path(self, key):
+    return os.path.join(self.directory, key[:2], key[2:] + '.json')
+
+  def disk_get(self, key):
+    path = self.disk_path(key)
+    try:
+      with open(path, encoding='utf-8') as f:
+        text = f.read()
+      os.utime(path)
+    except OSError:
+      return None
+    return text
+
+  def disk_put(self, key, text):
+    if self.disk_bytes is None:
+      self.disk_bytes = sum(size for _, _, size in self.disk_entries())
+    path = self.disk_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data = text.encode('utf-8')
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+      f.write(data)
+    # A rewritten entry replaces the size of the old one.
+    try:
+      self.disk_bytes -= os.stat(path).st_size
+    except OSError:
+      pass
+    os.replace(tmp, path)
+    self.disk_bytes += len(data)
+    if self.disk_bytes > self.max_bytes:
+      self.evict()
+
+  def disk_entries(self):
+    entries = []
+    for root, _, names in os.walk(self.directory):
+      for name in names:
+        if name.endswith('.json'):
+          path = os.path.join(root, name)
+          try:
+            st = os.stat(path)
+          except OSError:
+            continue
+          entries.append((path, st.st_mtime, st.st_size))
+    return entries
+
+  def evict(self):
+    # Other processes may share the directory, so recount before removing.
+    entries = sorted(self.disk_entries(), key=lambda e: e[1])
+    total = sum(size for _, _, size in entries)
+    limit = self.max_bytes * EVICT_RATIO
+    for path, _, size in entries:
+      if total <= limit:
+        break
+      try:
+        os.remove(path)
+      except OSError:
+        pass
+      total -= size
+    self.disk_bytes = total
@@ -0,0 +1,613 @@
+import io
+import json
+import math
+import keyword
+from functools import partial
+from . import presentation as p
+from .batch import imap_ordered, DEFAULT_CHUNKSIZE
+
+# Writes pseudocodejson documents back out as Python or Java source. Output
+# goes piece by piece to a text stream, expressions are not built as strings.
+
+LANGUAGES = ('python', 'java')
+INDENT = '    '
+BUILTIN_PREFIX = 'builtin:'
+COMPARISONS = frozenset(['equal', 'different', 'greater', 'greater_eq', 'smaller', 'smaller_eq'])
+LOGICAL = frozenset(['and', 'or'])
+ATOM = 100
+
+def procedure_variables(statements, found=None):
+  if found is None:
+    found = []
+  for s in statements:
+    kind = s.get('Statement')
+    if kind == 'Variable':
+      found.append(s)
+    elif kind == 'Selection':
+      procedure_variables(s['body'], found)
+      procedure_variables(s.get('alternative') or [], found)
+    elif kind == 'Loop':
+      procedure_variables(s['body'], found)
+  return found
+
+def declared_type(declaration):
+  typ = declaration.get('type', 'unknown')
+  return p.array_type(typ) if declaration.get('array') else typ
+
+class Emitter:
+  RESERVED = frozenset()
+  BINARY_OPS = {}
+  UNARY_OPS = {}
+
+  def __init__(self, document, out, indent=INDENT):
+    self.out = out
+    self.write = out.write
+    self.indent = indent
+    self.procedures = [f for f in document['procedures'] if f['id'] is not None]
+    self.default = next((f for f in document['procedures'] if f['id'] is None), None)
+    self.names = {}
+    self.types = {}
+    used = set()
+    for f in self.procedures:
+      name = self.identifier(f['id'])
+      while name in used:
+        name += '_'
+      used.add(name)
+      self.names[f['uuid']] = name
+      self.types[f['uuid']] = declared_type(f)
+      for v in f['parameters'] + procedure_variables(f['body']):
+        self.declare(v)
+    for v in document.get('constants', []):
+      self.declare(v)
+    if self.default is not None:
+      for v in procedure_variables(self.default['body']):
+        self.declare(v)
+    self.statement_writers = {
+      'Assignment': self.assignment,
+      'Array Assignment': self.array_assignment,
+      'Call': self.call_statement,
+      'Return': self.return_statement,
+      'Selection': self.selection,
+      'Loop': self.loop,
+      'Break': self.break_statement,
+      'Continue': self.continue_statement,
+    }
+    self.expression_writers = {
+      'Variable': self.variable,
+      'Literal': self.literal,
+      'Call': self.call,
+      'Array Length': self.array_length,
+      'Array Element': self.array_element,
+      'Binary Op': self.binary_op,
+      'Unary Op': self.unary_op,
+    }
+
+  def identifier(self, id):
+    return id + '_' if id in self.RESERVED else id
+
+  def declare(self, variable):
+    self.names[variable['uuid']] = self.identifier(variable['id'])
+    self.types[variable['uuid']] = declared_type(variable)
+
+  def name(self, uuid):
+    name = self.names.get(uuid)
+    if name is None:
+      raise ValueError("Unknown reference '{}'".format(uuid))
+    return name
+
+  def line(self, level):
+    self.write(self.indent * level)
+
+  def statements(self, statements, level):
+    for s in statements:
+      writer = self.statement_writers.get(s['Statement'])
+      if writer is not None:
+        writer(s, level)
+      elif s['Statement'] != 'Variable':
+        raise ValueError("Unsupported statement '{}'".format(s['Statement']))
+
+  def expression(self, e, required=0):
+    writer = self.expression_writers.get(e['Expression'])
+    if writer is None:
+      raise ValueError("Unsupported expression '{}'".format(e['Expression']))
+    if self.precedence(e) < required:
+      self.write('(')
+      writer(e)
+      self.write(')')
+    else:
+      writer(e)
+
+  def arguments(self, args):
+    for i, a in enumerate(args):
+      if i > 0:
+        self.write(', ')
+      self.expression(a)
+
+  def indexes(self, indexes):
+    for i in indexes:
+      self.write('[')
+      self.expression(i)
+      self.write(']')
+
+  def precedence(self, e):
+    kind = e['Expression']
+    if kind == 'Binary Op':
+      return self.BINARY_OPS[e['op']][1]
+    if kind == 'Unary Op':
+      return self.UNARY_OPS[e['op']][1]
+    return ATOM
+
+  def expression_type(self, e):
+    kind = e['Expression']
+    if kind == 'Literal':
+      return declared_type(e)
+    if kind == 'Variable':
+      return self.types.get(e.get('variable'), 'unknown')
+    if kind == 'Call':
+      if 'call' in e:
+        return self.types.get(e['call']['procedure'], 'int')
+      return 'unknown'
+    if kind == 'Array Length':
+      return 'int'
+    if kind == 'Array Element':
+      return p.unarray_type(self.expression_type(e['target']))
+    if kind == 'Unary Op':
+      return 'boolean' if e['op'] == 'not' else self.expression_type(e['expression'])
+    if e['op'] in COMPARISONS or e['op'] in LOGICAL:
+      return 'boolean'
+    # Same rules as parse_expression.parse_bin_op
+    left, right = self.expression_type(e['left']), self.expression_type(e['right'])
+    if left == 'string' or right == 'string':
+      return 'string'
+    if e['op'] == 'div' or left == 'double' or right == 'double':
+      return 'double'
+    if left == 'int' or right == 'int':
+      return 'int'
+    return 'unknown'
+
+  def binary_op(self, e):
+    symbol, level = self.BINARY_OPS[e['op']]
+    # Comparisons chain in Python and do not nest in Java, keep them grouped.
+    grouped = e['op'] in COMPARISONS
+    self.expression(e['left'], level + 1 if grouped else level)
+    self.write(symbol)
+    self.expression(e['right'], level + 1)
+
+  def unary_op(self, e):
+    symbol, level = self.UNARY_OPS[e['op']]
+    self.write(symbol)
+    self.expression(e['expression'], level)
+
+  def variable(self, e):
+    if 'builtin' in e:
+      self.write(e['builtin'])
+    else:
+      self.write(self.name(e['variable']))
+
+  def array_element(self, e):
+    self.expression(e['target'], ATOM)
+    self.indexes(e['indexes'])
+
+  def call(self, e):
+    if 'call' in e:
+      self.procedure_call(e['call'])
+    else:
+      self.write(e['builtin'])
+      self.write('(')
+      self.arguments(e['arguments'])
+      self.write(')')
+
+  def procedure_call(self, call):
+    self.write(self.name(call['procedure']))
+    self.write('(')
+    self.arguments(call['arguments'])
+    self.write(')')
+
+  def builtin_call(self, call, prefix, suffix=')'):
+    self.write(prefix)
+    self.arguments(call['arguments'])
+    self.write(suffix)
+
+class PythonEmitter(Emitter):
+  RESERVED = frozenset(keyword.kwlist) | frozenset(['abs', 'int', 'round', 'len'])
+  BINARY_OPS = {
+    'or': (' or ', 1), 'and': (' and ', 2),
+    'equal': (' == ', 4), 'different': (' != ', 4),
+    'greater': (' > ', 4), 'greater_eq': (' >= ', 4), 'smaller': (' < ', 4), 'smaller_eq': (' <= ', 4),
+    'add': (' + ', 5), 'sub': (' - ', 5),
+    'mul': (' * ', 6), 'div': (' / ', 6), 'idiv': (' // ', 6), 'mod': (' % ', 6),
+  }
+  UNARY_OPS = { 'not': ('not ', 3), 'minus': ('-', 7) }
+  BUILTINS = { 'builtin:bnAbs': 'abs(', 'builtin:bnInt': 'int(', 'builtin:bnRound': 'round(' }
+
+  def module(self):
+    for f in self.procedures:
+      self.write('def ')
+      self.write(self.names[f['uuid']])
+      self.write('(')
+      for i, v in enumerate(f['parameters']):
+        if i > 0:
+          self.write(', ')
+        self.write(self.names[v['uuid']])
+      self.write('):\n')
+      self.block(f['body'], 1)
+      self.write('\n')
+    if self.default is not None:
+      self.statements(self.default['body'], 0)
+
+  def block(self, statements, level):
+    if all(s['Statement'] == 'Variable' for s in statements):
+      self.line(level)
+      self.write('pass\n')
+    else:
+      self.statements(statements, level)
+
+  def assignment(self, s, level):
+    self.line(level)
+    self.write(self.name(s['variable']))
+    self.write(' = ')
+    self.expression(s['expression'])
+    self.write('\n')
+
+  def array_assignment(self, s, level):
+    self.line(level)
+    self.expression(s['target'], ATOM)
+    self.indexes(s['indexes'])
+    self.write(' = ')
+    self.expression(s['expression'])
+    self.write('\n')
+
+  def call_statement(self, s, level):
+    self.line(level)
+    self.procedure_call(s)
+    self.write('\n')
+
+  def procedure_call(self, call):
+    builtin = self.BUILTINS.get(call['procedure'])
+    if builtin is not None:
+      self.builtin_call(call, builtin)
+    else:
+      super().procedure_call(call)
+
+  def return_statement(self, s, level):
+    self.line(level)
+    if s.get('expression') is None:
+      self.write('return\n')
+    else:
+      self.write('return ')
+      self.expression(s['expression'])
+      self.write('\n')
+
+  def selection(self, s, level, keyword='if '):
+    self.line(level)
+    self.write(keyword)
+    self.expression(s['guard'])
+    self.write(':\n')
+    self.block(s['body'], level + 1)
+    alternative = s.get('alternative') or []
+    if len(alternative) == 1 and alternative[0]['Statement'] == 'Selection':
+      self.selection(alternative[0], level, 'elif ')
+    elif any(a['Statement'] != 'Variable' for a in alternative):
+      self.line(level)
+      self.write('else:\n')
+      self.statements(alternative, level + 1)
+
+  def loop(self, s, level):
+    self.line(level)
+    self.write('while ')
+    self.expression(s['guard'])
+    self.write(':\n')
+    self.block(s['body'], level + 1)
+
+  def break_statement(self, s, level):
+    self.line(level)
+    self.write('break\n')
+
+  def continue_statement(self, s, level):
+    self.line(level)
+    self.write('continue\n')
+
+  def literal(self, e):
+    value = e['value']
+    if type(value) is float and not math.isfinite(value):
+      self.write("float('{}')".format(value))
+    else:
+      self.write(repr(value))
+
+  def array_length(self, e):
+    self.write('len(')
+    self.expression(e['target'])
+    self.write(')')
+
+class JavaEmitter(Emitter):
+  RESERVED = frozenset([
+    'abstract', 'assert', 'boolean', 'break', 'byte', 'case', 'catch', 'char', 'class', 'const',
+    'continue', 'default', 'do', 'double', 'else', 'enum', 'extends', 'final', 'finally', 'float',
+    'for', 'goto', 'if', 'implements', 'import', 'instanceof', 'int', 'interface', 'long', 'native',
+    'new', 'package', 'private', 'protected', 'public', 'return', 'short', 'static', 'strictfp',
+    'super', 'switch', 'synchronized', 'this', 'throw', 'throws', 'transient', 'try', 'void',
+    'volatile', 'while', 'true', 'false', 'null', 'var', 'record', 'yield', 'args', 'Math',
+    'Objects', 'String', 'Object',
+  ])
+  BINARY_OPS = {
+    'or': (' || ', 1), 'and': (' && ', 2),
+    'equal': (' == ', 3), 'different': (' != ', 3),
+    'greater': (' > ', 4), 'greater_eq': (' >= ', 4), 'smaller': (' < ', 4), 'smaller_eq': (' <= ', 4),
+    'add': (' + ', 5), 'sub': (' - ', 5),
+    'mul': (' * ', 6), 'div': (' / ', 6), 'idiv': (' / ', 6), 'mod': (' % ', 6),
+  }
+  UNARY_OPS = { 'not': ('!', 7), 'minus': ('-', 7) }
+  TYPES = { 'int': 'int', 'double': 'double', 'boolean': 'boolean', 'string': 'String' }
+  DEFAULTS = { 'int': '0', 'double': '0.0', 'boolean': 'false' }
+  PRIMITIVES = frozenset(['int', 'double', 'boolean'])
+  NUMBERS = frozenset(['int', 'double'])
+
+  def __init__(self, document, out, indent=INDENT, class_name='Main'):
+    super().__init__(document, out, indent)
+    self.class_name = class_name
+
+  def java_type(self, typ):
+    if p.is_array_type(typ):
+      return self.java_type(p.unarray_type(typ)) + '[]'
+    return self.TYPES.get(typ, 'Object')
+
+  def module(self):
+    self.write('public class ')
+    self.write(self.class_name)
+    self.write(' {\n')
+    if self.default is not None:
+      variables = procedure_variables(self.default['body'])
+      if variables:
+        self.write('\n')
+        for v in variables:
+          self.line(1)
+          self.write('static ')
+          self.write(self.java_type(declared_type(v)))
+          self.write(' ')
+          self.write(self.names[v['uuid']])
+          self.write(';\n')
+    for f in self.procedures:
+      self.write('\n')
+      self.line(1)
+      self.write('public static ')
+      self.write('void' if f['type'] == 'void' else self.java_type(declared_type(f)))
+      self.write(' ')
+      self.write(self.names[f['uuid']])
+      self.write('(')
+      for i, v in enumerate(f['parameters']):
+        if i > 0:
+          self.write(', ')
+        self.write(self.java_type(declared_type(v)))
+        self.write(' ')
+        self.write(self.names[v['uuid']])
+      self.write(') {\n')
+      # Python variables live in the whole function, declare them up front.
+      for v in procedure_variables(f['body']):
+        typ = declared_type(v)
+        self.line(2)
+        self.write(self.java_type(typ))
+        self.write(' ')
+        self.write(self.names[v['uuid']])
+        self.write(' = ')
+        self.write(self.DEFAULTS.get(typ, 'null'))
+        self.write(';\n')
+      self.statements(f['body'], 2)
+      self.line(1)
+      self.write('}\n')
+    if self.default is not None:
+      self.write('\n')
+      self.line(1)
+      self.write('public static void main(String[] args) {\n')
+      self.statements(self.default['body'], 2)
+      self.line(1)
+      self.write('}\n')
+    self.write('}\n')
+
+  def assignment(self, s, level):
+    self.line(level)
+    self.write(self.name(s['variable']))
+    self.write(' = ')
+    self.expression(s['expression'])
+    self.write(';\n')
+
+  def array_assignment(self, s, level):
+    self.line(level)
+    self.expression(s['target'], ATOM)
+    self.indexes(s['indexes'])
+    self.write(' = ')
+    self.expression(s['expression'])
+    self.write(';\n')
+
+  def call_statement(self, s, level):
+    self.line(level)
+    self.procedure_call(s)
+    self.write(';\n')
+
+  def return_statement(self, s, level):
+    self.line(level)
+    if s.get('expression') is None:
+      self.write('return;\n')
+    else:
+      self.write('return ')
+      self.expression(s['expression'])
+      self.write(';\n')
+
+  def selection(self, s, level):
+    self.line(level)
+    self.write('if (')
+    self.expression(s['guard'])
+    self.write(') {\n')
+    while True:
+      self.statements(s['body'], level + 1)
+      alternative = s.get('alternative') or []
+      if len(alternative) == 1 and alternative[0]['Statement'] == 'Selection':
+        s = alternative[0]
+        self.line(level)
+        self.write('} else if (')
+        self.expression(s['guard'])
+        self.write(') {\n')
+        continue
+      if any(a['Statement'] != 'Variable' for a in alternative):
+        self.line(level)
+        self.write('} else {\n')
+        self.statements(alternative, level + 1)
+      break
+    self.line(level)
+    self.write('}\n')
+
+  def loop(self, s, level):
+    self.line(level)
+    self.write('while (')
+    self.expression(s['guard'])
+    self.write(') {\n')
+    self.statements(s['body'], level + 1)
+    self.line(level)
+    self.write('}\n')
+
+  def break_statement(self, s, level):
+    self.line(level)
+    self.write('break;\n')
+
+  def continue_statement(self, s, level):
+    self.line(level)
+    self.write('continue;\n')
+
+  def literal(self, e):
+    value = e['value']
+    typ = type(value)
+    if value is None:
+      self.write('null')
+    elif typ is bool:
+      self.write('true' if value else 'false')
+    elif typ is int:
+      self.write(str(value) if -2 ** 31 <= value < 2 ** 31 else '{:d}L'.format(value))
+    elif typ is float:
+      if math.isnan(value):
+        self.write('Double.NaN')
+      elif math.isinf(value):
+        self.write('Double.POSITIVE_INFINITY' if value > 0 else 'Double.NEGATIVE_INFINITY')
+      else:
+        self.write(repr(value))
+    else:
+      self.write(json.dumps(value))
+
+  def array_length(self, e):
+    self.expression(e['target'], ATOM)
+    self.write('.length')
+
+  def precedence(self, e):
+    if e['Expression'] == 'Binary Op':
+      op = e['op']
+      if op in ('equal', 'different') and not self.primitive_operands(e):
+        return ATOM if op == 'equal' else self.UNARY_OPS['not'][1]
+      if op in ('idiv', 'mod') and self.integer_operands(e):
+        return ATOM
+      if op == 'idiv' and self.expression_type(e) == 'double':
+        return ATOM
+    return super().precedence(e)
+
+  def primitive_operands(self, e):
+    left, right = self.expression_type(e['left']), self.expression_type(e['right'])
+    if left in self.NUMBERS and right in self.NUMBERS:
+      return True
+    return left == right and left in self.PRIMITIVES
+
+  def integer_operands(self, e):
+    return self.expression_type(e['left']) == 'int' and self.expression_type(e['right']) == 'int'
+
+  def binary_op(self, e):
+    op = e['op']
+    if op in ('equal', 'different') and not self.primitive_operands(e):
+      self.write('java.util.Objects.equals(' if op == 'equal' else '!java.util.Objects.equals(')
+      self.expression(e['left'])
+      self.write(', ')
+      self.expression(e['right'])
+      self.write(')')
+    elif op in ('idiv', 'mod') and self.integer_operands(e):
+      # Python rounds integer division and modulo towards negative infinity.
+      self.write('Math.floorDiv(' if op == 'idiv' else 'Math.floorMod(')
+      self.expression(e['left'])
+      self.write(', ')
+      self.expression(e['right'])
+      self.write(')')
+    elif op == 'idiv' and self.expression_type(e) == 'double':
+      self.write('Math.floor(')
+      self.expression(e['left'], 6)
+      self.write(' / ')
+      self.expression(e['right'], 7)
+      self.write(')')
+    elif op == 'div' and self.integer_operands(e):
+      self.write('(double) ')
+      self.expression(e['left'], 7)
+      self.write(' / ')
+      self.expression(e['right'], 7)
+    else:
+      super().binary_op(e)
+
+  def unary_op(self, e):
+    operand = e['expression']
+    if e['op'] == 'minus' and (
+      operand['Expression'] == 'Unary Op' and operand['op'] == 'minus'
+      or operand['Expression'] == 'Literal' and type(operand['value']) in (int, float) and operand['value'] < 0
+    ):
+      # Keep '- -x' from becoming the decrement operator.
+      self.write('-(')
+      self.expression(operand)
+      self.write(')')
+    else:
+      super().unary_op(e)
+
+  def procedure_call(self, call):
+    procedure = call['procedure']
+    if procedure == 'builtin:bnAbs':
+      self.builtin_call(call, 'Math.abs(')
+    elif procedure == 'builtin:bnRound':
+      self.builtin_call(call, '(int) Math.rint(')
+    elif procedure == 'builtin:bnInt':
+      args = call['arguments']
+      if len(args) == 1 and self.expression_type(args[0]) == 'string':
+        self.builtin_call(call, 'Integer.parseInt(')
+      else:
+        self.builtin_call(call, '(int) (')
+    else:
+      super().procedure_call(call)
+
+EMITTERS = { 'python': PythonEmitter, 'java': JavaEmitter }
+
+def emitter_class(language):
+  cls = EMITTERS.get(language)
+  if cls is None:
+    raise ValueError("Unknown language '{}'".format(language))
+  return cls
+
+def write_source(document, out, language='python', **options):
+  emitter_class(language)(document, out, **options).module()
+
+def pseudo2src(document, language='python', **options):
+  out = io.StringIO()
+  write_source(document, out, language, **options)
+  return out.getvalue()
+
+def emit_record(line, language='python', **options):
+  # Accepts batch output records as well as bare documents, one per line.
+  record = json.loads(line)
+  if 'procedures' in record:
+    record = { 'file': None, 'result': record }
+  emitted = { 'file': record.get('file') }
+  if 'result' in record:
+    try:
+      emitted['source'] = pseudo2src(record['result'], language, **options)
+    except (ValueError, KeyError, TypeError) as error:
+      emitted['error'] = "{}: {}".format(error.__class__.__name__, error)
+  else:
+    emitted['error'] = record.get('error')
+  return json.dumps(emitted)
+
+def write_sources(out, lines, language='python', workers=None, chunksize=DEFAULT_CHUNKSIZE, **options):
+  func = partial(emit_record, language=language, **options)
+  count = 0
+  for line in imap_ordered(func, (l for l in lines if l.strip()), workers, chunksize):
+    out.write(line)
+    out.write('\n')
+    count += 1
+  return count
@@ -0,0 +1,355 @@
+import copy
+
+# Runs pseudocodejson documents. Each procedure is compiled once into nested
+# closures that read and write variables by slot index in a list frame, so
+# repeated runs do not look anything up by uuid. Slot 0 of a frame holds the
+# return value, module level variables live in a shared globals frame.
+
+DEFAULT_MAX_STEPS = 10000000
+BREAK, CONTINUE, RETURN = 'break', 'continue', 'return'
+BUILTINS = {
+  'builtin:bnAbs': abs,
+  'builtin:bnInt': int,
+  'builtin:bnRound': round,
+}
+RUNTIME_ERRORS = (ArithmeticError, LookupError, TypeError, ValueError)
+
+class ExecutionError(Exception):
+  pass
+
+class StepLimitError(ExecutionError):
+  pass
+
+def compile_error(feature):
+  raise ExecutionError('Cannot execute {}'.format(feature))
+
+def block_variables(statements, found):
+  for s in statements:
+    kind = s.get('Statement')
+    if kind == 'Variable':
+      found.append(s)
+    elif kind == 'Selection':
+      block_variables(s['body'], found)
+      block_variables(s.get('alternative') or [], found)
+    elif kind == 'Loop':
+      block_variables(s['body'], found)
+  return found
+
+def binary(op, l, r):
+  if op == 'add':
+    return lambda f: l(f) + r(f)
+  if op == 'sub':
+    return lambda f: l(f) - r(f)
+  if op == 'mul':
+    return lambda f: l(f) * r(f)
+  if op == 'div':
+    return lambda f: l(f) / r(f)
+  if op == 'idiv':
+    return lambda f: l(f) // r(f)
+  if op == 'mod':
+    return lambda f: l(f) % r(f)
+  if op == 'equal':
+    return lambda f: l(f) == r(f)
+  if op == 'different':
+    return lambda f: l(f) != r(f)
+  if op == 'greater':
+    return lambda f: l(f) > r(f)
+  if op == 'greater_eq':
+    return lambda f: l(f) >= r(f)
+  if op == 'smaller':
+    return lambda f: l(f) < r(f)
+  if op == 'smaller_eq':
+    return lambda f: l(f) <= r(f)
+  if op == 'and':
+    return lambda f: l(f) and r(f)
+  if op == 'or':
+    return lambda f: l(f) or r(f)
+  compile_error("operation '{}'".format(op))
+
+def unary(op, e):
+  if op == 'minus':
+    return lambda f: -e(f)
+  if op == 'not':
+    return lambda f: not e(f)
+  compile_error("operation '{}'".format(op))
+
+class Procedure:
+
+  def __init__(self, declaration, slots):
+    self.declaration = declaration
+    self.slots = slots
+    self.size = len(slots) + 1
+    self.arity = len(declaration['parameters'])
+    self.body = None
+
+class ProcedureCompiler:
+
+  def __init__(self, module, procedure):
+    self.module = module
+    self.procedure = procedure
+    self.steps = module.steps
+    self.expressions = {
+      'Literal': self.literal,
+      'Variable': self.variable,
+      'Call': self.call,
+      'Array Length': self.array_length,
+      'Array Element': self.array_element,
+      'Binary Op': self.binary_op,
+      'Unary Op': self.unary_op,
+    }
+    self.statements = {
+      'Variable': None,
+      'Assignment': self.assignment,
+      'Array Assignment': self.array_assignment,
+      'Call': self.call_statement,
+      'Return': self.return_statement,
+      'Selection': self.selection,
+      'Loop': self.loop,
+      'Break': lambda s: lambda f: BREAK,
+      'Continue': lambda s: lambda f: CONTINUE,
+    }
+
+  def block(self, statements):
+    compiled = []
+    for s in statements:
+      if not s['Statement'] in self.statements:
+        compile_error("statement '{}'".format(s['Statement']))
+      factory = self.statements[s['Statement']]
+      if factory is not None:
+        compiled.append(factory(s))
+    if not compiled:
+      return lambda f: None
+    if len(compiled) == 1:
+      return compiled[0]
+    compiled = tuple(compiled)
+    def run(f):
+      for s in compiled:
+        r = s(f)
+        if r is not None:
+          return r
+    return run
+
+  def expression(self, e):
+    factory = self.expressions.get(e['Expression'])
+    if factory is None:
+      compile_error("expression '{}'".format(e['Expression']))
+    return factory(e)
+
+  def slot(self, uuid):
+    i = self.procedure.slots.get(uuid)
+    if i is not None:
+      return False, i
+    i = self.module.globals_slots.get(uuid)
+    if i is not None:
+      return True, i
+    compile_error("reference to '{}' outside the procedure and module".format(uuid))
+
+  def literal(self, e):
+    value = e['value']
+    if type(value) is list:
+      # Array literals must not be shared between runs.
+      return lambda f: copy.deepcopy(value)
+    return lambda f: value
+
+  def variable(self, e):
+    if 'builtin' in e:
+      compile_error("builtin value '{}'".format(e['builtin']))
+    is_global, i = self.slot(e['variable'])
+    if is_global:
+      g = self.module.globals
+      return lambda f: g[i]
+    return lambda f: f[i]
+
+  def call(self, e):
+    if not 'call' in e:
+      compile_error("builtin function '{}'".format(e['builtin']))
+    return self.invocation(e['call'])
+
+  def invocation(self, call):
+    args = tuple(self.expression(a) for a in call['arguments'])
+    builtin = BUILTINS.get(call['procedure'])
+    if builtin is not None:
+      if len(args) != 1:
+        compile_error("'{}' with {:d} arguments".format(call['procedure'], len(args)))
+      a, = args
+      return lambda f: builtin(a(f))
+    procedure = self.module.procedures.get(call['procedure'])
+    if procedure is None:
+      compile_error("call to unknown procedure '{}'".format(call['procedure']))
+    if len(args) != procedure.arity:
+      compile_error("call to '{}' with {:d} arguments".format(procedure.declaration['id'], len(args)))
+    steps = self.steps
+    padding = [None] * (procedure.size - len(args) - 1)
+    def invoke(f):
+      frame = [None]
+      for a in args:
+        frame.append(a(f))
+      frame.extend(padding)
+      steps[0] -= 1
+      if steps[0] < 0:
+        raise StepLimitError('Step limit exceeded')
+      procedure.body(frame)
+      return frame[0]
+    return invoke
+
+  def array_length(self, e):
+    t = self.expression(e['target'])
+    return lambda f: len(t(f))
+
+  def array_element(self, e):
+    t = self.expression(e['target'])
+    indexes = [self.expression(i) for i in e['indexes']]
+    if len(indexes) == 1:
+      i, = indexes
+      return lambda f: t(f)[i(f)]
+    def element(f):
+      value = t(f)
+      for i in indexes:
+        value = value[i(f)]
+      return value
+    return element
+
+  def binary_op(self, e):
+    return binary(e['op'], self.expression(e['left']), self.expression(e['right']))
+
+  def unary_op(self, e):
+    return unary(e['op'], self.expression(e['expression']))
+
+  def assignment(self, s):
+    v = self.expression(s['expression'])
+    is_global, i = self.slot(s['variable'])
+    frame = self.module.globals if is_global else None
+    if frame is not None:
+      def assign_global(f):
+        frame[i] = v(f)
+      return assign_global
+    def assign(f):
+      f[i] = v(f)
+    return assign
+
+  def array_assignment(self, s):
+    t = self.expression(s['target'])
+    indexes = [self.expression(i) for i in s['indexes']]
+    v = self.expression(s['expression'])
+    *path, last = indexes
+    def assign(f):
+      value = v(f)
+      target = t(f)
+      for i in path:
+        target = target[i(f)]
+      target[last(f)] = value
+    return assign
+
+  def call_statement(self, s):
+    c = self.invocation(s)
+    def call(f):
+      c(f)
+    return call
+
+  def return_statement(self, s):
+    if s.get('expression') is None:
+      return lambda f: RETURN
+    v = self.expression(s['expression'])
+    def ret(f):
+      f[0] = v(f)
+      return RETURN
+    return ret
+
+  def selection(self, s):
+    g = self.expression(s['guard'])
+    body = self.block(s['body'])
+    alternative = self.block(s.get('alternative') or [])
+    def select(f):
+      if g(f):
+        return body(f)
+      return alternative(f)
+    return select
+
+  def loop(self, s):
+    g = self.expression(s['guard'])
+    body = self.block(s['body'])
+    steps = self.steps
+    def loop(f):
+      while g(f):
+        steps[0] -= 1
+        if steps[0] < 0:
+          raise StepLimitError('Step limit exceeded')
+        r = body(f)
+        if r is not None and r is not CONTINUE:
+          if r is BREAK:
+            break
+          return r
+    return loop
+
+class CompiledModule:
+
+  def __init__(self, document):
+    self.steps = [DEFAULT_MAX_STEPS]
+    self.max_steps = DEFAULT_MAX_STEPS
+    self.procedures = {}
+    self.names = {}
+    self.default = None
+    declarations = document['procedures']
+    for d in declarations:
+      if d['id'] is None:
+        self.default = d
+    module_variables = list(document.get('constants', []))
+    if self.default is not None:
+      block_variables(self.default['body'], module_variables)
+    self.globals_slots = { v['uuid']: i for i, v in enumerate(module_variables) }
+    self.globals_names = [v['id'] for v in module_variables]
+    self.globals = [None] * len(module_variables)
+    for d in declarations:
+      if d['id'] is not None:
+        variables = block_variables(d['body'], list(d['parameters']))
+        procedure = Procedure(d, { v['uuid']: i for i, v in enumerate(variables, 1) })
+        self.procedures[d['uuid']] = procedure
+        self.names[d['id']] = procedure
+    for procedure in self.procedures.values():
+      procedure.body = ProcedureCompiler(self, procedure).block(procedure.declaration['body'])
+    if self.default is not None:
+      # Module level statements use the globals frame as their own.
+      main = Procedure(self.default, {})
+      self.main = ProcedureCompiler(self, main).block(self.default['body'])
+    else:
+      self.main = lambda f: None
+
+  def reset(self):
+    self.globals[:] = [None] * len(self.globals)
+
+  def variables(self):
+    return dict(zip(self.globals_names, self.globals))
+
+  def execute(self, func, max_steps):
+    self.max_steps = max_steps
+    self.steps[0] = max_steps
+    try:
+      return func()
+    except RecursionError as error:
+      raise ExecutionError('Recursion too deep') from error
+    except RUNTIME_ERRORS as error:
+      raise ExecutionError('{}: {}'.format(error.__class__.__name__, error)) from error
+
+  def run(self, max_steps=DEFAULT_MAX_STEPS):
+    self.reset()
+    self.execute(lambda: self.main(self.globals), max_steps)
+    return self.variables()
+
+  def call(self, procedure, *args, max_steps=DEFAULT_MAX_STEPS):
+    target = self.procedures.get(procedure) or self.names.get(procedure)
+    if target is None:
+      raise ExecutionError("Unknown procedure '{}'".format(procedure))
+    if len(args) != target.arity:
+      raise ExecutionError("Procedure '{}' takes {:d} arguments".format(target.declaration['id'], target.arity))
+    def invoke():
+      frame = [None] * target.size
+      frame[1:1 + len(args)] = args
+      target.body(frame)
+      return frame[0]
+    return self.execute(invoke, max_steps)
+
+  def steps_used(self):
+    return self.max_steps - self.steps[0]
+
+def compile_module(document):
+  return CompiledModule(document)
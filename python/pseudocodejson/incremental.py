@@ -0,0 +1,167 @@
+import re
+import ast
+import json
+from . import VERSION_STRING
+from .ParseState import ParseState
+from .parse_module import parse_into_state
+from .signatures import signatures_digest
+
+LINE_RE = re.compile(r'[^\r\n]*(?:\r\n?|\n)?')
+
+# Converts top level functions again only when their source text, signature
+# or any name they resolve from the module scope has changed. Hash ids keep
+# procedure and variable ids stable between edits.
+
+class ProcedureRecord:
+
+  def __init__(self, text, signature, declared_type):
+    self.text = text
+    self.signature = signature
+    self.declared_type = declared_type
+    self.lookups = []
+    self.calls = []
+    self.ids = []
+    self.locals = set()
+    self.reusable = True
+    self.type = None
+    self.procedure = None
+
+class IncrementalResult:
+
+  def __init__(self, pseudo, records, options, reused, parsed):
+    self.pseudo = pseudo
+    self.records = records
+    self.options = options
+    self.reused = reused
+    self.parsed = parsed
+
+def signature_key(signature):
+  return json.dumps(signature, sort_keys=True)
+
+def lookup_key(id, declaration):
+  if declaration is None:
+    return (id, None, None)
+  return (id, declaration['uuid'], declaration['type'])
+
+class IncrementalParseState(ParseState):
+
+  def __init__(self, src, previous, typed_signatures=None, id_strategy='hash', emission='direct', hash_cons=False):
+    super().__init__(typed_signatures, id_strategy, emission, False, hash_cons)
+    self.lines = LINE_RE.findall(src)
+    self.previous = previous
+    self.records = {}
+    self.reused = {}
+    self.record = None
+    self.record_procedure = None
+
+  def segment(self, node):
+    return ''.join(self.lines[node.lineno - 1:node.end_lineno])
+
+  def reuse_procedure(self, procedure, node):
+    if len(self.namestack) != 1 or self.record is not None:
+      return False
+    text = self.segment(node)
+    signature = signature_key(self.typed_signatures.get(procedure['id']))
+    previous = self.previous.get(procedure['uuid'])
+    if (
+      previous is not None and previous.reusable
+      and previous.text == text
+      and previous.signature == signature
+      and previous.declared_type == procedure['type']
+      and self.same_lookups(previous.lookups)
+    ):
+      self.replay(procedure, previous)
+      return True
+    self.record = ProcedureRecord(text, signature, procedure['type'])
+    self.record_procedure = procedure
+    return False
+
+  def same_lookups(self, lookups):
+    for key in lookups:
+      if lookup_key(key[0], self.find_id(key[0], True)) != key:
+        return False
+    return True
+
+  def replay(self, procedure, record):
+    for id, types in record.calls:
+      ParseState.find_function_id(self, None, id, [{ 'type': t } for t in types])
+    self.ids.issued.update(record.ids)
+    procedure['parameters'] = []
+    procedure['body'] = []
+    procedure['type'] = record.type
+    self.reused[procedure['uuid']] = record
+    self.records[procedure['uuid']] = record
+
+  def pop_names(self):
+    super().pop_names()
+    if self.record is not None and len(self.namestack) == 1:
+      self.record.type = self.record_procedure['type']
+      self.record.locals = None
+      self.records[self.record_procedure['uuid']] = self.record
+      self.record = None
+      self.record_procedure = None
+
+  def make_id(self, kind, id):
+    uuid = super().make_id(kind, id)
+    if self.record is not None:
+      self.record.ids.append(uuid)
+    return uuid
+
+  def add_procedure(self, module_root, id, typ=None):
+    if self.record is not None:
+      # Nested procedures are registered outside the record, parse them every time.
+      self.record.reusable = False
+    return super().add_procedure(module_root, id, typ)
+
+  def add_variable(self, id, typ=None, func_id=None, func_arg_i=0):
+    variable = super().add_variable(id, typ, func_id, func_arg_i)
+    if self.record is not None:
+      self.record.locals.add(variable['uuid'])
+    return variable
+
+  def find_id(self, id, up=False, level=None):
+    declaration = super().find_id(id, up, level)
+    if self.record is not None and up and level is None and not id in self.namestack[-1]:
+      self.record.lookups.append(lookup_key(id, declaration))
+    return declaration
+
+  def find_function_id(self, node, id, args):
+    declaration = super().find_function_id(node, id, args)
+    if self.record is not None and declaration is not None:
+      self.record.calls.append((id, [a.get('type', 'unknown') for a in args]))
+    return declaration
+
+  def set_variable_type(self, node, uuid, typ):
+    if self.record is not None and not uuid in self.record.locals:
+      self.record.reusable = False
+    super().set_variable_type(node, uuid, typ)
+
+def src2pseudo_incremental(src, previous=None, typed_signatures=None, exclude_others=False):
+  options = (signatures_digest(typed_signatures), exclude_others)
+  records = previous.records if previous is not None and previous.options == options else {}
+
+  state = IncrementalParseState(src, records, typed_signatures)
+  parse_into_state(state, ast.parse(src), exclude_others)
+  procedures = state.nodes.finalize(state.procedures)
+  for i, procedure in enumerate(procedures):
+    record = state.records.get(procedure['uuid'])
+    if record is not None:
+      if procedure['uuid'] in state.reused:
+        procedures[i] = record.procedure
+      else:
+        record.procedure = procedure
+
+  return IncrementalResult(
+    {
+      'format': 'pseudocodejson',
+      'version': VERSION_STRING,
+      'type': 'Module',
+      'id': None,
+      'constants': state.nodes.finalize(state.constants),
+      'procedures': procedures,
+    },
+    state.records,
+    options,
+    list(state.reused),
+    [uuid for uuid in state.records if not uuid in state.reused],
+  )
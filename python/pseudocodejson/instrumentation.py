@@ -0,0 +1,132 @@
+from time import perf_counter
+from .ParseState import ParseState
+
+# Opt-in measurements for a conversion. A plain ParseState never touches the
+# collector, the instrumented state swaps in wrapped handler tables instead.
+
+class Collector:
+
+  def __init__(self):
+    self.conversions = 0
+    self.phases = {}
+    self.nodes = {}
+    self.lookups = 0
+    self.function_lookups = 0
+    self.deferred_rounds = 0
+    self.deferred_procedures = 0
+    self.procedures = 0
+    self.children = []
+
+  def add_phase(self, phase, seconds):
+    self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+  def enter_node(self):
+    self.children.append(0.0)
+
+  def leave_node(self, name, seconds):
+    # Node times are inclusive, self times exclude the nested handled nodes.
+    nested = self.children.pop()
+    if self.children:
+      self.children[-1] += seconds
+    stat = self.nodes.get(name)
+    if stat is None:
+      self.nodes[name] = [1, seconds, seconds - nested]
+    else:
+      stat[0] += 1
+      stat[1] += seconds
+      stat[2] += seconds - nested
+
+  def add_nodes(self, name, count):
+    # Nodes converted within the dispatch of another one, their times included there.
+    stat = self.nodes.setdefault(name, [0, 0.0, 0.0])
+    stat[0] += count
+
+  def merge(self, other):
+    self.conversions += other.conversions
+    for phase, seconds in other.phases.items():
+      self.add_phase(phase, seconds)
+    for name, (count, seconds, own) in other.nodes.items():
+      stat = self.nodes.setdefault(name, [0, 0.0, 0.0])
+      stat[0] += count
+      stat[1] += seconds
+      stat[2] += own
+    self.lookups += other.lookups
+    self.function_lookups += other.function_lookups
+    self.deferred_rounds += other.deferred_rounds
+    self.deferred_procedures += other.deferred_procedures
+    self.procedures += other.procedures
+    return self
+
+  def as_dict(self):
+    return {
+      'conversions': self.conversions,
+      'phases': dict(self.phases),
+      'nodes': {
+        name: { 'count': count, 'seconds': seconds, 'self_seconds': own }
+        for name, (count, seconds, own) in self.nodes.items()
+      },
+      'lookups': self.lookups,
+      'function_lookups': self.function_lookups,
+      'deferred_rounds': self.deferred_rounds,
+      'deferred_procedures': self.deferred_procedures,
+      'procedures': self.procedures,
+    }
+
+def timed(collector, phase, func, *args):
+  if collector is None:
+    return func(*args)
+  start = perf_counter()
+  try:
+    return func(*args)
+  finally:
+    collector.add_phase(phase, perf_counter() - start)
+
+def timed_handler(collector, name, handler):
+  def wrapper(state, node, *args):
+    collector.enter_node()
+    start = perf_counter()
+    try:
+      return handler(state, node, *args)
+    finally:
+      collector.leave_node(name, perf_counter() - start)
+  return wrapper
+
+def timed_handlers(collector, handlers):
+  return { cls: timed_handler(collector, cls.__name__, h) for cls, h in handlers.items() }
+
+class InstrumentedParseState(ParseState):
+
+  def __init__(self, collector, typed_signatures=None, id_strategy='uuid', emission='finalize',
+      call_graph=False, hash_cons=False, limits=None):
+    super().__init__(typed_signatures, id_strategy, emission, call_graph, hash_cons, limits)
+    self.collector = collector
+    self.expression_handlers = timed_handlers(collector, self.expression_handlers)
+    self.statement_handlers = timed_handlers(collector, self.statement_handlers)
+    collector.conversions += 1
+
+  def find_id(self, id, up=False, level=None):
+    self.collector.lookups += 1
+    return super().find_id(id, up, level)
+
+  def find_function_id(self, node, id, args):
+    self.collector.function_lookups += 1
+    return super().find_function_id(node, id, args)
+
+  def enter_procedure(self, procedure):
+    self.collector.procedures += 1
+    super().enter_procedure(procedure)
+
+  def start_round(self, uuids, module_root=False):
+    self.collector.deferred_rounds += 1
+    self.collector.deferred_procedures += len(uuids)
+
+  def add_chain_nodes(self, cls, count):
+    super().add_chain_nodes(cls, count)
+    self.collector.add_nodes(cls.__name__, count)
+
+def create_state(collector, typed_signatures=None, id_strategy='uuid', emission='finalize', call_graph=False,
+    hash_cons=False, limits=None):
+  if collector is None:
+    return ParseState(typed_signatures, id_strategy, emission, call_graph, hash_cons, limits)
+  return InstrumentedParseState(collector, typed_signatures, id_strategy, emission, call_graph, hash_cons,
+    limits)
@@ -0,0 +1,96 @@
+import json
+from json.encoder import encode_basestring_ascii
+
+COMPACT_SEPARATORS = (',', ':')
+MISSING = object()
+
+def dumps(value, indent=None, separators=None):
+  # The C encoder recurses, long expression chains nest deeper than it allows.
+  try:
+    return json.dumps(value, indent=indent, separators=separators)
+  except RecursionError:
+    return dumps_iterative(value, indent, separators)
+
+def dumps_iterative(value, indent=None, separators=None):
+  # Writes the text json.dumps would, with an explicit stack of open containers.
+  item_separator, key_separator = separators or ((', ', ': ') if indent is None else (',', ': '))
+  parts = []
+  stack = []
+  while True:
+    t = type(value)
+    if (t is dict or t is list) and value:
+      parts.append('{' if t is dict else '[')
+      stack.append((t is dict, iter(value.items() if t is dict else value)))
+      first = True
+    else:
+      parts.append(('{}' if t is dict else '[]') if t is dict or t is list else json.dumps(value))
+      first = False
+    while stack:
+      is_dict, items = stack[-1]
+      item = next(items, MISSING)
+      if item is MISSING:
+        stack.pop()
+        if indent is not None:
+          parts.append('\n' + ' ' * (indent * len(stack)))
+        parts.append('}' if is_dict else ']')
+        first = False
+        continue
+      if not first:
+        parts.append(item_separator)
+      if indent is not None:
+        parts.append('\n' + ' ' * (indent * len(stack)))
+      if is_dict:
+        key, value = item
+        parts.append(encode_basestring_ascii(key))
+        parts.append(key_separator)
+      else:
+        value = item
+      break
+    else:
+      return ''.join(parts)
+
+def dumps_nested(value, indent, level):
+  # Encoded JSON strings never hold raw newlines, so lines can be shifted as is.
+  if indent is None:
+    return dumps(value, None, COMPACT_SEPARATORS)
+  return dumps(value, indent).replace('\n', '\n' + ' ' * (indent * level))
+
+def write_document(fp, fields, items_key, items, indent=2):
+  if indent is None:
+    fp.write('{')
+    for key, value in fields:
+      fp.write(json.dumps(key))
+      fp.write(':')
+      fp.write(dumps_nested(value, None, 0))
+      fp.write(',')
+    fp.write(json.dumps(items_key))
+    fp.write(':[')
+    first = True
+    for item in items:
+      if not first:
+        fp.write(',')
+      fp.write(dumps_nested(item, None, 0))
+      first = False
+    fp.write(']}')
+  else:
+    pad = ' ' * indent
+    fp.write('{')
+    for key, value in fields:
+      fp.write('\n')
+      fp.write(pad)
+      fp.write(json.dumps(key))
+      fp.write(': ')
+      fp.write(dumps_nested(value, indent, 1))
+      fp.write(',')
+    fp.write('\n')
+    fp.write(pad)
+    fp.write(json.dumps(items_key))
+    fp.write(': [')
+    first = True
+    for item in items:
+      fp.write('\n' if first else ',\n')
+      fp.write(pad * 2)
+      fp.write(dumps_nested(item, indent, 2))
+      first = False
+    fp.write(']' if first else '\n' + pad + ']')
+    fp.write('\n}')
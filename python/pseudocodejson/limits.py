@@ -0,0 +1,111 @@
+from time import perf_counter
+from .parse_utils import ResourceLimitError
+
+# Budgets for converting untrusted input. A state without limits has no
+# budget and pays one attribute test per dispatched ast node. A state limiting
+# them counts the ast nodes parse_statements and parse_expression dispatch and
+# their depth, checking the rarer ast node count and the clock only at the
+# next checkpoint, which for the clock is every CLOCK_INTERVAL'th node.
+# Procedures and output nodes are counted once per converted procedure.
+
+CLOCK_INTERVAL = 64
+NEVER = float('inf')
+
+class Limits:
+
+  def __init__(self, max_ast_nodes=None, max_output_nodes=None, max_depth=None, max_procedures=None,
+      max_seconds=None):
+    self.max_ast_nodes = max_ast_nodes
+    self.max_output_nodes = max_output_nodes
+    self.max_depth = max_depth
+    self.max_procedures = max_procedures
+    self.max_seconds = max_seconds
+
+class Budget:
+
+  __slots__ = (
+    'limits', 'started', 'deadline', 'max_ast_nodes', 'max_output_nodes', 'max_depth', 'max_procedures',
+    'counts_handled', 'counts_output', 'handled', 'output_nodes', 'depth', 'peak_depth', 'procedures',
+    'checkpoint',
+  )
+
+  def __init__(self, limits):
+    self.limits = limits
+    self.started = perf_counter()
+    self.deadline = self.started + limits.max_seconds if limits.max_seconds is not None else None
+    self.max_ast_nodes = limits.max_ast_nodes
+    self.max_output_nodes = limits.max_output_nodes
+    self.max_depth = limits.max_depth
+    self.max_procedures = limits.max_procedures
+    self.counts_handled = self.max_ast_nodes is not None or self.max_depth is not None \
+      or self.deadline is not None
+    self.counts_output = self.max_output_nodes is not None
+    self.handled = 0
+    self.output_nodes = 0
+    self.depth = 0
+    self.peak_depth = 0
+    self.procedures = 0
+    self.checkpoint = 0
+    self.next_checkpoint()
+
+  def stats(self):
+    return {
+      'ast_nodes': self.handled,
+      'output_nodes': self.output_nodes,
+      'depth': self.peak_depth,
+      'procedures': self.procedures,
+      'seconds': perf_counter() - self.started,
+    }
+
+  def exceeded(self, limit):
+    raise ResourceLimitError(limit, getattr(self.limits, limit), self.stats())
+
+  def next_checkpoint(self):
+    checkpoint = self.handled + CLOCK_INTERVAL if self.deadline is not None else NEVER
+    if self.max_ast_nodes is not None:
+      checkpoint = min(checkpoint, self.max_ast_nodes + 1)
+    self.checkpoint = checkpoint
+
+  def check(self):
+    if self.depth > self.peak_depth:
+      self.peak_depth = self.depth
+      if self.max_depth is not None and self.depth > self.max_depth:
+        self.exceeded('max_depth')
+    if self.handled >= self.checkpoint:
+      if self.max_ast_nodes is not None and self.handled > self.max_ast_nodes:
+        self.exceeded('max_ast_nodes')
+      if self.deadline is not None and perf_counter() > self.deadline:
+        self.exceeded('max_seconds')
+      self.next_checkpoint()
+
+  def add_output(self, *trees):
+    if self.counts_output:
+      self.output_nodes += sum(count_nodes(t) for t in trees)
+      if self.output_nodes > self.max_output_nodes:
+        self.exceeded('max_output_nodes')
+
+  def add_procedure(self):
+    self.procedures += 1
+    if self.max_procedures is not None and self.procedures > self.max_procedures:
+      self.exceeded('max_procedures')
+
+def count_nodes(tree):
+  # Nodes are the dicts of the output, shared ones counted where they appear.
+  count = 0
+  stack = [tree]
+  pop = stack.pop
+  push = stack.append
+  extend = stack.extend
+  while stack:
+    node = pop()
+    if type(node) is dict:
+      count += 1
+      for v in node.values():
+        t = type(v)
+        if t is dict:
+          push(v)
+        elif t is list and v and type(v[0]) is not str:
+          extend(v)
+    elif type(node) is list:
+      extend(node)
+  return count
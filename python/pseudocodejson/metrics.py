@@ -0,0 +1,140 @@
+from functools import partial
+from .batch import imap_ordered, error_text, DEFAULT_CHUNKSIZE
+from .parse_expression import OP_TABLE
+from . import srcfile2pseudo
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+# Per document metrics in a fixed column order, collected in one walk over
+# the document. Rows are plain lists of ints, corpus matrices are numpy
+# arrays when numpy is installed and lists of rows otherwise.
+
+STATEMENT_KINDS = (
+  'Procedure', 'Variable', 'Call', 'Return', 'Assignment', 'Array Assignment',
+  'Selection', 'Loop', 'Break', 'Continue',
+)
+EXPRESSION_KINDS = (
+  'Variable', 'Call', 'Array Length', 'Array Element', 'Literal', 'Binary Op', 'Unary Op',
+)
+OPS = tuple(OP_TABLE.values())
+SUMMARY_COLUMNS = (
+  'procedures', 'nodes', 'max_loop_depth', 'max_selection_depth', 'cyclomatic', 'max_cyclomatic',
+  'builtin_calls',
+)
+COLUMNS = SUMMARY_COLUMNS \
+  + tuple('statement:' + k for k in STATEMENT_KINDS) \
+  + tuple('expression:' + k for k in EXPRESSION_KINDS) \
+  + tuple('op:' + op for op in OPS)
+COLUMN_INDEX = { name: i for i, name in enumerate(COLUMNS) }
+
+PROCEDURES, NODES, MAX_LOOP_DEPTH, MAX_SELECTION_DEPTH, CYCLOMATIC, MAX_CYCLOMATIC, BUILTIN_CALLS = \
+  range(len(SUMMARY_COLUMNS))
+STATEMENT_COLUMNS = { k: COLUMN_INDEX['statement:' + k] for k in STATEMENT_KINDS }
+EXPRESSION_COLUMNS = { k: COLUMN_INDEX['expression:' + k] for k in EXPRESSION_KINDS }
+OP_COLUMNS = { op: COLUMN_INDEX['op:' + op] for op in OPS }
+DECISION_OPS = ('and', 'or')
+
+def is_builtin_call(call):
+  return 'builtin' in call or call.get('procedure', '').startswith('builtin:')
+
+def walk_children(node, row, loops, selections, decisions):
+  for value in node.values():
+    t = type(value)
+    if t is dict:
+      walk(value, row, loops, selections, decisions)
+    elif t is list:
+      for v in value:
+        if type(v) is dict:
+          walk(v, row, loops, selections, decisions)
+
+def walk_procedure(procedure, row):
+  # Cyclomatic complexity of a procedure is one plus its decision points.
+  decisions = [1]
+  walk_children(procedure, row, 0, 0, decisions)
+  row[CYCLOMATIC] += decisions[0]
+  if decisions[0] > row[MAX_CYCLOMATIC]:
+    row[MAX_CYCLOMATIC] = decisions[0]
+
+def walk(node, row, loops, selections, decisions):
+  row[NODES] += 1
+  kind = node.get('Statement')
+  if kind is not None:
+    row[STATEMENT_COLUMNS[kind]] += 1
+    if kind == 'Procedure':
+      if node['id'] is not None:
+        row[PROCEDURES] += 1
+      walk_procedure(node, row)
+      return
+    if kind == 'Loop':
+      loops += 1
+      decisions[0] += 1
+      if loops > row[MAX_LOOP_DEPTH]:
+        row[MAX_LOOP_DEPTH] = loops
+    elif kind == 'Selection':
+      selections += 1
+      decisions[0] += 1
+      if selections > row[MAX_SELECTION_DEPTH]:
+        row[MAX_SELECTION_DEPTH] = selections
+    elif kind == 'Call' and is_builtin_call(node):
+      row[BUILTIN_CALLS] += 1
+  else:
+    kind = node['Expression']
+    row[EXPRESSION_COLUMNS[kind]] += 1
+    if kind == 'Binary Op' or kind == 'Unary Op':
+      row[OP_COLUMNS[node['op']]] += 1
+      if node['op'] in DECISION_OPS:
+        decisions[0] += 1
+    elif kind == 'Call':
+      # The call of an expression is counted as the expression only.
+      call = node.get('call', node)
+      if is_builtin_call(call):
+        row[BUILTIN_CALLS] += 1
+      for argument in call['arguments']:
+        walk(argument, row, loops, selections, decisions)
+      return
+  walk_children(node, row, loops, selections, decisions)
+
+def document_metrics(document):
+  row = [0] * len(COLUMNS)
+  for node in document.get('constants', []):
+    walk(node, row, 0, 0, [0])
+  for procedure in document['procedures']:
+    walk(procedure, row, 0, 0, None)
+  return row
+
+def empty_matrix(count):
+  if numpy is None:
+    return [[0] * len(COLUMNS) for _ in range(count)]
+  return numpy.zeros((count, len(COLUMNS)), dtype=numpy.int64)
+
+def metrics_matrix(documents, count=None):
+  if count is None:
+    count = len(documents)
+  matrix = empty_matrix(count)
+  for i, document in enumerate(documents):
+    matrix[i] = document_metrics(document)
+  return matrix
+
+def file_metrics(filename, typed_signatures=None, exclude_others=False, cache=None, id_strategy='uuid'):
+  try:
+    document = srcfile2pseudo(filename, typed_signatures, exclude_others, cache, id_strategy)
+    return { 'file': filename, 'metrics': document_metrics(document) }
+  except Exception as error:
+    return { 'file': filename, 'error': error_text(error) }
+
+def corpus_metrics(files, typed_signatures=None, exclude_others=False,
+    workers=None, chunksize=DEFAULT_CHUNKSIZE, cache=None, id_strategy='uuid'):
+  # Rows follow the order of files, the rows of failed files stay zero.
+  func = partial(file_metrics, typed_signatures=typed_signatures,
+    exclude_others=exclude_others, cache=cache, id_strategy=id_strategy)
+  matrix = empty_matrix(len(files))
+  errors = []
+  for i, record in enumerate(imap_ordered(func, files, workers, chunksize)):
+    if 'error' in record:
+      errors.append(record)
+    else:
+      matrix[i] = record['metrics']
+  return matrix, errors
@@ -0,0 +1,261 @@
+import sys
+
+# Compact in-memory representation of the final pseudocodejson schema. Each
+# node kind mirrors a presentation.py factory with the scratch keys removed.
+# Optional fields hold plain JSON values and are left out when missing.
+
+class Node:
+  __slots__ = ()
+  KIND = None
+  NAME = None
+  FIELDS = ()
+  INTERNED = ()
+  OPTIONAL = ()
+
+  def __init__(self, *values):
+    for field in self.OPTIONAL:
+      setattr(self, field, None)
+    for field, value in zip(self.FIELDS, values):
+      setattr(self, field, value)
+
+  def __repr__(self):
+    return '{}({})'.format(
+      self.__class__.__name__,
+      ', '.join('{}={!r}'.format(f, getattr(self, f)) for f in self.FIELDS)
+    )
+
+  def to_json(self):
+    return to_json(self)
+
+class Module(Node):
+  FIELDS = ('format', 'version', 'type', 'id', 'constants', 'procedures', 'call_graph')
+  INTERNED = ('format', 'version', 'type')
+  OPTIONAL = ('call_graph',)
+  __slots__ = FIELDS
+
+class Procedure(Node):
+  KIND, NAME = 'Statement', 'Procedure'
+  FIELDS = ('uuid', 'id', 'parameters', 'body', 'type', 'array')
+  INTERNED = ('uuid', 'id', 'type')
+  __slots__ = FIELDS
+
+class Variable(Node):
+  KIND, NAME = 'Statement', 'Variable'
+  FIELDS = ('uuid', 'id', 'type', 'array')
+  INTERNED = ('uuid', 'id', 'type')
+  __slots__ = FIELDS
+
+class Call(Node):
+  KIND, NAME = 'Statement', 'Call'
+  FIELDS = ('procedure', 'arguments')
+  INTERNED = ('procedure',)
+  __slots__ = FIELDS
+
+class Return(Node):
+  KIND, NAME = 'Statement', 'Return'
+  FIELDS = ('expression',)
+  __slots__ = FIELDS
+
+class Assignment(Node):
+  KIND, NAME = 'Statement', 'Assignment'
+  FIELDS = ('variable', 'expression')
+  INTERNED = ('variable',)
+  __slots__ = FIELDS
+
+class ArrayAssignment(Node):
+  KIND, NAME = 'Statement', 'Array Assignment'
+  FIELDS = ('target', 'indexes', 'expression')
+  __slots__ = FIELDS
+
+class Selection(Node):
+  KIND, NAME = 'Statement', 'Selection'
+  FIELDS = ('guard', 'body', 'alternative')
+  __slots__ = FIELDS
+
+class Loop(Node):
+  KIND, NAME = 'Statement', 'Loop'
+  FIELDS = ('guard', 'body')
+  __slots__ = FIELDS
+
+class Break(Node):
+  KIND, NAME = 'Statement', 'Break'
+  __slots__ = ()
+
+class Continue(Node):
+  KIND, NAME = 'Statement', 'Continue'
+  __slots__ = ()
+
+class VariableExpression(Node):
+  KIND, NAME = 'Expression', 'Variable'
+  FIELDS = ('variable',)
+  INTERNED = ('variable',)
+  __slots__ = FIELDS
+
+class BuiltinVariableExpression(Node):
+  KIND, NAME = 'Expression', 'Variable'
+  FIELDS = ('builtin',)
+  INTERNED = ('builtin',)
+  __slots__ = FIELDS
+
+class CallExpression(Node):
+  KIND, NAME = 'Expression', 'Call'
+  FIELDS = ('call',)
+  __slots__ = FIELDS
+
+class BuiltinCallExpression(Node):
+  KIND, NAME = 'Expression', 'Call'
+  FIELDS = ('builtin', 'arguments')
+  INTERNED = ('builtin',)
+  __slots__ = FIELDS
+
+class ArrayLength(Node):
+  KIND, NAME = 'Expression', 'Array Length'
+  FIELDS = ('target', 'indexes')
+  __slots__ = FIELDS
+
+class ArrayElement(Node):
+  KIND, NAME = 'Expression', 'Array Element'
+  FIELDS = ('target', 'indexes')
+  __slots__ = FIELDS
+
+class Literal(Node):
+  KIND, NAME = 'Expression', 'Literal'
+  FIELDS = ('value', 'type', 'array')
+  INTERNED = ('type',)
+  __slots__ = FIELDS
+
+class BinaryOp(Node):
+  KIND, NAME = 'Expression', 'Binary Op'
+  FIELDS = ('op', 'left', 'right')
+  INTERNED = ('op',)
+  __slots__ = FIELDS
+
+class UnaryOp(Node):
+  KIND, NAME = 'Expression', 'Unary Op'
+  FIELDS = ('op', 'expression')
+  INTERNED = ('op',)
+  __slots__ = FIELDS
+
+NODE_CLASSES = {
+  (c.KIND, c.NAME): c for c in (
+    Procedure, Variable, Call, Return, Assignment, ArrayAssignment, Selection, Loop,
+    Break, Continue, VariableExpression, CallExpression, ArrayLength, ArrayElement,
+    Literal, BinaryOp, UnaryOp,
+  )
+}
+BUILTIN_VARIANTS = {
+  VariableExpression: BuiltinVariableExpression,
+  CallExpression: BuiltinCallExpression,
+}
+
+def node_class(d):
+  if 'Statement' in d:
+    cls = NODE_CLASSES.get(('Statement', d['Statement']))
+  elif 'Expression' in d:
+    cls = NODE_CLASSES.get(('Expression', d['Expression']))
+    if cls in BUILTIN_VARIANTS and 'builtin' in d:
+      cls = BUILTIN_VARIANTS[cls]
+  elif d.get('type') == 'Module':
+    cls = Module
+  else:
+    cls = None
+  if cls is None:
+    raise ValueError('Unknown pseudocodejson node {!r}'.format(d))
+  return cls
+
+# Recursion is faster, expression chains that nest deeper than the recursion
+# limit are converted again from an explicit stack of (parent, key, value)
+# tasks, each container attached to its parent before its items are converted.
+
+def from_json(value):
+  try:
+    return from_json_recursive(value)
+  except RecursionError:
+    return from_json_iterative(value)
+
+def from_json_recursive(value):
+  if type(value) is list:
+    return [from_json_recursive(v) for v in value]
+  if type(value) is not dict:
+    return value
+  cls = node_class(value)
+  node = cls.__new__(cls)
+  for f in cls.FIELDS:
+    v = value.get(f)
+    if f in cls.INTERNED and type(v) is str:
+      v = sys.intern(v)
+    elif not f in cls.OPTIONAL:
+      v = from_json_recursive(v)
+    setattr(node, f, v)
+  return node
+
+def from_json_iterative(value):
+  root = [None]
+  stack = [(root, 0, value)]
+  while stack:
+    parent, key, value = stack.pop()
+    if type(value) is list:
+      items = [None] * len(value)
+      stack.extend((items, i, v) for i, v in enumerate(value))
+      value = items
+    elif type(value) is dict:
+      cls = node_class(value)
+      node = cls.__new__(cls)
+      for f in cls.FIELDS:
+        v = value.get(f)
+        if f in cls.INTERNED and type(v) is str:
+          setattr(node, f, sys.intern(v))
+        elif f in cls.OPTIONAL:
+          setattr(node, f, v)
+        else:
+          stack.append((node, f, v))
+      value = node
+    if type(parent) is list:
+      parent[key] = value
+    else:
+      setattr(parent, key, value)
+  return root[0]
+
+def to_json(value):
+  try:
+    return to_json_recursive(value)
+  except RecursionError:
+    return to_json_iterative(value)
+
+def to_json_recursive(value):
+  if isinstance(value, Node):
+    d = { value.KIND: value.NAME } if value.KIND else {}
+    for f in value.FIELDS:
+      v = getattr(value, f)
+      if f in value.OPTIONAL:
+        if v is not None:
+          d[f] = v
+      else:
+        d[f] = to_json_recursive(v)
+    return d
+  if type(value) is list:
+    return [to_json_recursive(v) for v in value]
+  return value
+
+def to_json_iterative(value):
+  root = [None]
+  stack = [(root, 0, value)]
+  while stack:
+    parent, key, value = stack.pop()
+    if isinstance(value, Node):
+      d = { value.KIND: value.NAME } if value.KIND else {}
+      for f in value.FIELDS:
+        v = getattr(value, f)
+        if f in value.OPTIONAL:
+          if v is not None:
+            d[f] = v
+        else:
+          d[f] = None
+          stack.append((d, f, v))
+      value = d
+    elif type(value) is list:
+      items = [None] * len(value)
+      stack.extend((items, i, v) for i, v in enumerate(value))
+      value = items
+    parent[key] = value
+  return root[0]
@@ -0,0 +1,334 @@
+import gc
+import os
+import ast
+import uuid as uuidlib
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from . import VERSION_STRING
+from . import parse_utils as u
+from . import presentation as p
+from .ParseState import ParseState
+from .parse_module import parse_into_state, module_document
+from .parse_statements import parse_statements, parse_procedure
+from .incremental import IncrementalParseState, signature_key, lookup_key
+
+# Converts the bodies of top level functions speculatively in worker
+# processes. A worker repeats the module level pass and converts each body it
+# is given against a view: the return types of the procedures the body called
+# last time and that convert before it, and the signature the calls before it
+# inferred for it. Views are refined over a few rounds from the previous
+# results. The parent then walks the bodies in the sequential order and takes
+# a speculative body only when the signature, name lookups and ids it saw
+# match the parent state at that point, replaying its calls. Any other body,
+# and every body of a batch whose worker failed or could not send it back, is
+# converted by the parent as usual, so the output is that of the sequential
+# conversion. Bodies are matched by procedure uuid, as functions defined in
+# module level blocks are converted in between during the module pass.
+
+DEFAULT_MIN_PROCEDURES = 16
+SCAN_ROUNDS = 1
+TASKS_PER_WORKER = 2
+ID_KEYS = ('uuid', 'variable', 'procedure')
+
+class ModulePassDone(Exception):
+  pass
+
+class ReplayIds:
+
+  # Repeats the ids the parent issued in its module pass, then makes new ones.
+  def __init__(self, ids):
+    self.ids = iter(ids)
+
+  def make(self, scope, kind, name):
+    return next(self.ids, None) or u.uuid()
+
+def direct_nodes(nodes):
+  nodes = getattr(nodes, 'nodes', nodes)
+  return nodes if isinstance(nodes, p.DirectNodes) else None
+
+class SpeculativeParseState(IncrementalParseState):
+
+  def __init__(self, src, typed_signatures, id_strategy, emission, hash_cons, module_ids):
+    super().__init__(src, {}, typed_signatures, id_strategy, emission, hash_cons)
+    if module_ids is not None:
+      self.ids = ReplayIds(module_ids)
+    self.root_procedures = []
+
+  def add_procedure(self, module_root, id, typ=None):
+    procedure = super().add_procedure(module_root, id, typ)
+    if module_root:
+      self.root_procedures.append(procedure)
+    return procedure
+
+  def start_round(self, uuids, module_root=False):
+    if module_root:
+      raise ModulePassDone()
+
+class Speculator:
+
+  def __init__(self, src, options, module_ids):
+    self.src = src
+    self.options = options
+    self.module_ids = module_ids
+    self.state = None
+
+  def prepare(self):
+    typed_signatures, exclude_others, id_strategy, emission, hash_cons = self.options
+    module = ast.parse(self.src)
+    state = SpeculativeParseState(self.src, typed_signatures, id_strategy, emission, hash_cons, self.module_ids)
+    try:
+      parse_statements(state, module.body, exclude_others, True)
+    except ModulePassDone:
+      pass
+    defs = [s for s in module.body if s.__class__ is ast.FunctionDef]
+    self.defs = { d['uuid']: (d, node) for d, node in zip(state.root_procedures, defs) }
+    self.module_length = len(state.procedures)
+    self.declarations = { uuid: d for uuid, (d, _) in self.defs.items() }
+    self.types = { uuid: d['type'] for uuid, d in self.declarations.items() }
+    self.inferred = dict(state.typed_signatures.inferred)
+    self.typing = dict(state.variable_typing)
+    self.count = getattr(state.ids, 'count', None)
+    self.state = state
+
+  def speculate(self, uuid, view, bodies=True, count=None):
+    if self.state is None:
+      self.prepare()
+    state = self.state
+    fdef, node = self.defs[uuid]
+    types, signature = view
+    for uuid, typ in types:
+      self.declarations[uuid]['type'] = typ
+    if signature is not None:
+      state.typed_signatures.inferred[fdef['id']] = {
+        'return': 'unknown',
+        'arguments': [(None, t) for t in signature],
+      }
+    if self.count is not None:
+      state.ids.count = count if count is not None else self.count
+    nodes = direct_nodes(state.nodes)
+    start = len(nodes.patches) if nodes is not None else 0
+    if isinstance(state.nodes, p.SharedNodes):
+      # Nodes shared with the module pass or another body would not come along.
+      state.nodes.shared.clear()
+    try:
+      state.reuse_procedure(fdef, node)
+      parse_procedure(state, fdef, node, self.options[1])
+    except Exception:
+      self.state = None
+      return None
+    record = state.records.pop(fdef['uuid'])
+    record.text = None
+    if record.reusable and bodies:
+      result = (record, fdef['parameters'], fdef['body'], nodes.patches[start:] if nodes is not None else None)
+    else:
+      result = (record, None, None, None)
+    if not record.reusable:
+      state.variable_typing = dict(self.typing)
+    for id in record.ids:
+      state.variable_typing.pop(id, None)
+    if hasattr(state.ids, 'issued'):
+      state.ids.issued.difference_update(record.ids)
+    if nodes is not None:
+      del nodes.patches[start:]
+    del state.procedures[self.module_length:]
+    state.typed_signatures.inferred = dict(self.inferred)
+    for uuid, _ in types:
+      self.declarations[uuid]['type'] = self.types[uuid]
+    fdef['type'] = self.types[fdef['uuid']]
+    fdef['parameters'] = None
+    fdef['body'] = None
+    return result
+
+WORKER = threading.local()
+
+def speculate_bodies(token, src, options, module_ids, items, bodies=True):
+  # Each worker keeps the module pass of the conversion it last served.
+  speculator = getattr(WORKER, 'speculator', None)
+  if speculator is None or WORKER.token != token:
+    speculator = WORKER.speculator = Speculator(src, options, module_ids)
+    WORKER.token = token
+  return [speculator.speculate(uuid, view, bodies, count) for uuid, view, count in items]
+
+def remap_ids(nodes, mapping):
+  seen = set()
+  stack = [nodes]
+  while stack:
+    node = stack.pop()
+    if id(node) in seen:
+      continue
+    seen.add(id(node))
+    if type(node) is list:
+      stack.extend(node)
+    elif type(node) is dict:
+      for key, value in node.items():
+        if type(value) is str:
+          if key in ID_KEYS and value in mapping:
+            node[key] = mapping[value]
+        elif type(value) is dict or type(value) is list:
+          stack.append(value)
+
+class ParallelParseState(ParseState):
+
+  def __init__(self, src, executor, workers=None, typed_signatures=None, exclude_others=False, id_strategy='uuid',
+      emission='finalize', call_graph=False, hash_cons=False, min_procedures=DEFAULT_MIN_PROCEDURES):
+    super().__init__(typed_signatures, id_strategy, emission, call_graph, hash_cons)
+    self.src = src
+    self.executor = executor
+    self.workers = workers or os.cpu_count() or 1
+    self.options = (typed_signatures, exclude_others, id_strategy, emission, hash_cons)
+    self.min_procedures = min_procedures
+    self.module_ids = [] if id_strategy == 'uuid' else None
+    self.speculations = None
+    self.speculated = 0
+    self.taken = 0
+
+  def make_id(self, kind, id):
+    uuid = super().make_id(kind, id)
+    if self.module_ids is not None and self.speculations is None:
+      self.module_ids.append(uuid)
+    return uuid
+
+  def start_round(self, uuids, module_root=False):
+    if module_root and self.speculations is None:
+      self.speculations = self.speculate(uuids) if len(uuids) >= self.min_procedures else {}
+
+  def speculate(self, uuids):
+    positions = { d['uuid']: i for i, d in enumerate(self.procedures) }
+    order = sorted(positions[uuid] for uuid in uuids)
+    procedures = self.procedures
+    known = set(d['id'] for d in procedures if d['id'] in self.typed_signatures)
+    token = uuidlib.uuid4().hex
+    # Unpickling the results builds many containers that would only trigger
+    # collections, none of them is garbage.
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+      # Scans return records only, to refine the views before the bodies come back.
+      views = {}
+      records = {}
+      for _ in range(SCAN_ROUNDS):
+        wanted = predict_views(order, procedures, positions, known, records)
+        todo = [i for i in order if views.get(i) != wanted[i]]
+        if not todo:
+          break
+        for position, result in self.run(token, todo, wanted, False):
+          records[position] = result[0] if result is not None else None
+          views[position] = wanted[position]
+      wanted = predict_views(order, procedures, positions, known, records)
+      results = self.run(token, order, wanted, True, self.predict_counts(order, records))
+    finally:
+      if collecting:
+        gc.enable()
+    return { procedures[i]['uuid']: r for i, r in results if r is not None and r[2] is not None }
+
+  def predict_counts(self, order, records):
+    # Sequential ids of a body follow the ids of the bodies before it, a good
+    # guess spares renumbering the body when it is taken.
+    count = getattr(self.ids, 'count', None)
+    counts = {}
+    for i in order:
+      if count is None or records.get(i) is None:
+        break
+      counts[i] = count
+      count += len(records[i].ids)
+    return counts
+
+  def run(self, token, todo, views, bodies, counts=None):
+    size = -(-len(todo) // (self.workers * TASKS_PER_WORKER))
+    batches = [todo[i:i + size] for i in range(0, len(todo), size)]
+    futures = [
+      self.executor.submit(speculate_bodies, token, self.src, self.options, self.module_ids,
+        [(self.procedures[j]['uuid'], views[j], counts and counts.get(j)) for j in batch], bodies)
+      for batch in batches
+    ]
+    self.speculated += len(todo)
+    results = []
+    for batch, future in zip(batches, futures):
+      try:
+        items = future.result()
+      except Exception:
+        # A worker that failed, or whose bodies nest too deep to pickle, leaves them to the parent.
+        items = [None] * len(batch)
+      results.extend(zip(batch, items))
+    return results
+
+  def reuse_procedure(self, procedure, node):
+    if len(self.namestack) != 1 or not self.speculations:
+      return False
+    result = self.speculations.pop(procedure['uuid'], None)
+    if result is None or not self.valid(procedure, result[0]):
+      return False
+    self.take(procedure, *result)
+    return True
+
+  def valid(self, procedure, record):
+    return (
+      record.declared_type == procedure['type']
+      and record.signature == signature_key(self.typed_signatures.get(procedure['id']))
+      and all(lookup_key(key[0], self.find_id(key[0], True)) == key for key in record.lookups)
+      and (not hasattr(self.ids, 'issued') or self.ids.issued.isdisjoint(record.ids))
+    )
+
+  def take(self, procedure, record, parameters, body, patches):
+    if hasattr(self.ids, 'count'):
+      first = int(record.ids[0]) if record.ids else self.ids.count + 1
+      if first != self.ids.count + 1:
+        remap_ids([parameters, body], { id: str(self.ids.count + 1 + i) for i, id in enumerate(record.ids) })
+      self.ids.count += len(record.ids)
+    elif hasattr(self.ids, 'issued'):
+      self.ids.issued.update(record.ids)
+    procedure['parameters'] = parameters
+    procedure['body'] = body
+    procedure['type'] = record.type
+    self.callers.append(procedure['uuid'])
+    for id, types in record.calls:
+      self.find_function_id(None, id, [{ 'type': t } for t in types])
+    self.callers.pop()
+    if patches is not None:
+      direct_nodes(self.nodes).patches.extend(patches)
+    self.taken += 1
+
+def predict_views(order, procedures, positions, known, records):
+  # The first view of every body is the module pass as it is.
+  rank = { position: i for i, position in enumerate(order) }
+  first_calls = {}
+  for i in order:
+    record = records.get(i)
+    if record is not None:
+      for id, types in record.calls:
+        first_calls.setdefault(id, (rank[i], tuple(types)))
+  views = {}
+  for i in order:
+    types = set()
+    record = records.get(i)
+    if record is not None:
+      for _, uuid, _ in record.lookups:
+        j = positions.get(uuid)
+        callee = records.get(j)
+        if j in rank and rank[j] < rank[i] and callee is not None \
+            and procedures[j]['type'] == 'unknown' and callee.type != 'unknown':
+          types.add((uuid, callee.type))
+    signature = None
+    name = procedures[i]['id']
+    if not name in known and name in first_calls and first_calls[name][0] < rank[i]:
+      signature = first_calls[name][1]
+    views[i] = (tuple(sorted(types)), signature)
+  return views
+
+def src2pseudo_parallel(src, typed_signatures=None, exclude_others=False, id_strategy='uuid',
+    emission='finalize', call_graph=False, hash_cons=False, workers=None, executor=None,
+    min_procedures=DEFAULT_MIN_PROCEDURES):
+  root = ast.parse(src)
+  pool = executor if executor is not None else ProcessPoolExecutor(workers)
+  try:
+    state = ParallelParseState(src, pool, workers, typed_signatures, exclude_others, id_strategy, emission,
+      call_graph, hash_cons, min_procedures)
+    parse_into_state(state, root, exclude_others)
+  finally:
+    if executor is None:
+      pool.shutdown()
+  return {
+    'format': 'pseudocodejson',
+    'version': VERSION_STRING,
+    **module_document(state, call_graph),
+  }
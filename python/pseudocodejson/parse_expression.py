@@ -1,8 +1,9 @@
+import ast
 from . import parse_utils as u
 from . import presentation as p
 
-IGNORE_NODES = []
-BUILT_IN_FUNCTIONS = [
+IGNORE_NODES = frozenset()
+BUILT_IN_FUNCTIONS = frozenset([
   'abs', 'all', 'any', 'ascii', 'bin', 'bool', 'breakpoint', 'bytearray', 'bytes',
   'callable', 'chr', 'classmethod', 'compile', 'complex', 'delattr', 'dict', 'dir',
   'divmod', 'enumerate', 'eval', 'exec', 'filter', 'float', 'format', 'frozenset',
@@ -12,7 +13,7 @@ BUILT_IN_FUNCTIONS = [
   'property', 'range', 'repr', 'reversed', 'round', 'set', 'setattr', 'slice',
   'sorted', 'staticmethod', 'str', 'sum', 'super', 'tuple', 'type', 'vars', 'zip',
   '__import__', 'NotImplementedError'
-]
+])
 SUPPORTED_BUILT_IN_FUNCTIONS = {
   # len is transpiled to array length expression instead of call
   'abs': 'int', 'int': 'int', 'round': 'int'
@@ -27,135 +28,181 @@ OP_TABLE = {
   'Gt': 'greater', 'GtE': 'greater_eq', 'Lt': 'smaller', 'LtE': 'smaller_eq',
   'USub': 'minus', 'Not': 'not',
 }
+OP_CLASS_TABLE = { getattr(ast, name): op for name, op in OP_TABLE.items() }
+CONSTANT_TYPES = { bool: 'boolean', int: 'int', float: 'double', str: 'string' }
 
 
 def parse_expression(state, expr, builtins = None):
   u.require_expr(expr)
-  expr_type = u.node_type(expr)
+  handler = state.expression_handlers.get(expr.__class__)
+  if handler is None:
+    expr_type = u.node_type(expr)
+    handler = DEPRECATED_EXPRESSION_HANDLERS.get(expr_type)
+    if handler is None:
+      if not expr_type in IGNORE_NODES:
+        raise u.unsupported_error(expr)
+      return None
+  budget = state.node_budget
+  if budget is None:
+    return handler(state, expr, builtins)
+  handled = budget.handled = budget.handled + 1
+  depth = budget.depth = budget.depth + 1
+  if depth > budget.peak_depth or handled >= budget.checkpoint:
+    budget.check()
+  # Handlers raise on purpose too, MissingNameError for every new assigned name.
+  try:
+    return handler(state, expr, builtins)
+  finally:
+    budget.depth -= 1
 
-  if expr_type == 'Name':
-    hit = state.find_variable_id(expr, expr.id, u.node_type(expr.ctx) != 'Store')
+def parse_name(state, expr, builtins):
+  hit = state.find_variable_id(expr, expr.id, expr.ctx.__class__ is not ast.Store)
+  if hit:
+    return state.nodes.variable_expression(hit['uuid'], hit['type'])
+  if expr.id in BUILT_IN_VARIABLES:
+    if builtins and expr.id in builtins:
+      return state.nodes.builtin_variable_expression(expr.id, BUILT_IN_VARIABLES[expr.id])
+    u.unsupported_error(expr, f"builtin value '{expr.id}'")
+  raise u.MissingNameError(expr.id)
+
+def parse_call(state, expr, builtins):
+  func_class = expr.func.__class__
+  args = [parse_expression(state, a) for a in expr.args]
+  if func_class is ast.Attribute:
+    val = parse_expression(state, expr.func.value)
+    if val['Expression'] == 'Literal':
+      u.unsupported_error(expr.func, "method call '{}.{}'".format(val['type'], expr.func.attr))
+    elif val['Expression'] == 'Variable':
+      u.unsupported_error(expr.func, "method call '{}.{}'".format(expr.func.value.id, expr.func.attr))
+  elif func_class is ast.Name:
+    id = expr.func.id
+    hit = state.find_function_id(expr.func, id, args)
     if hit:
-      return p.variable_expression(hit['uuid'], hit['type'])
-    if expr.id in BUILT_IN_VARIABLES:
-      if builtins and expr.id in builtins:
-        return p.builtin_variable_expression(expr.id, BUILT_IN_VARIABLES[expr.id])
-      u.unsupported_error(expr, f"builtin value '{expr.id}'")
-    raise u.MissingNameError(expr.id)
-
-  elif expr_type == 'Call':
-    func_type = u.node_type(expr.func)
-    args = [parse_expression(state, a) for a in expr.args]
-    if func_type == 'Attribute':
-      val = parse_expression(state, expr.func.value)
-      if val['Expression'] == 'Literal':
-        u.unsupported_error(expr.func, "method call '{}.{}'".format(val['type'], expr.func.attr))
-      elif val['Expression'] == 'Variable':
-        u.unsupported_error(expr.func, "method call '{}.{}'".format(expr.func.value.id, expr.func.attr))
-    elif func_type == 'Name':
-      hit = state.find_function_id(expr.func, expr.func.id, args)
-      if hit:
-        return p.call_expression(hit['uuid'], hit['type'], args)
-      if expr.func.id in BUILT_IN_FUNCTIONS:
-        if expr.func.id == 'len':
-          if len(expr.args) != 1:
-            u.parse_error(expr, 'Expected exactly one argument')
-          return p.array_length_expression(args[0])
-        if expr.func.id in SUPPORTED_BUILT_IN_FUNCTIONS:
-          return p.call_supported_builtin_expression(
-            expr.func.id,
-            SUPPORTED_BUILT_IN_FUNCTIONS[expr.func.id],
-            args
-          )
-        if builtins and expr.func.id in builtins:
-          return p.call_builtin_expression(expr.func.id, 'unknown', args)
-        u.unsupported_error(expr.func, f"builtin function '{expr.func.id}'")
-      raise u.MissingNameError(expr.func.id)
-    else:
-      u.unsupported_error(expr.func, "call of '{}'".format(func_type))
-
-  elif expr_type == 'Constant':
-    if expr.value is None:
-      return p.null_expression()
-    elif type(expr.value) == bool:
-      return p.literal_expression('boolean', expr.value)
-    elif type(expr.value) == int:
-      return p.literal_expression('int', expr.value)
-    elif type(expr.value) == float:
-      return p.literal_expression('double', expr.value)
-    elif type(expr.value) == str:
-      return p.literal_expression('string', expr.value)
-    else:
-      u.unsupported_error(expr, "constant '{}'".format(expr.value))
-
-  elif expr_type == 'NameConstant': # deprecated
-    if expr.value is None:
-      return p.null_expression()
-    if type(expr.value) == bool:
-      return p.literal_expression('boolean', expr.value)
-    else:
-      u.unsupported_error(expr, "literal '{}'".format(expr.value))
-
-  elif expr_type == 'Num': # deprecated
-    if type(expr.n) == int:
-      return p.literal_expression('int', expr.n)
-    return p.literal_expression('double', expr.n)
-
-  elif expr_type == 'Str': # deprecated
-    return p.literal_expression('string', expr.s)
-
-  elif expr_type == 'BinOp':
-    op = u.node_type(expr.op)
-    if op in OP_TABLE:
-      left = parse_expression(state, expr.left)
-      right = parse_expression(state, expr.right)
-      if left['type'] == 'string' or right['type'] == 'string':
-        typ = 'string'
-      elif op == 'Div' or left['type'] == 'double' or right['type'] == 'double':
-        typ = 'double'
-      elif left['type'] == 'int' or right['type'] == 'int':
-        typ = 'int'
-      else:
-        typ = 'unknown'
-      return p.binary_operation(OP_TABLE[op], left, right, typ)
-    u.unsupported_error(expr, "operation '{}'".format(op))
-
-  elif expr_type == 'UnaryOp':
-    op = u.node_type(expr.op)
-    if op in OP_TABLE:
-      operand = parse_expression(state, expr.operand)
-      return p.unary_operation(OP_TABLE[op], operand, operand['type'])
-    raise u.unsupported_error(expr, "operation '{}'".format(op))
-
-  elif expr_type == 'BoolOp':
-    op = u.node_type(expr.op)
-    if op in OP_TABLE:
-      args = [parse_expression(state, e) for e in expr.values]
-      return build_bool_tree(op, args)
-
-  elif expr_type == 'Compare':
-    left = parse_expression(state, expr.left)
-    args = [parse_expression(state, e) for e in expr.comparators]
-    return build_compare_tree(expr, left, expr.ops, args)
-
-  # TODO elif expr_type == 'IfExp':
-
-  elif expr_type == 'Subscript':
-    u.require_type(expr.value, 'Name')
-    value = parse_expression(state, expr.value)
-    sub_type = u.node_type(expr.slice)
-    if sub_type == 'Slice':
-      u.unsupported_error(expr, 'creation of a slice from an iterable')
-    else:
-      index = parse_expression(state, expr.slice.value if sub_type == 'Index' else expr.slice)
-      return p.array_element_expression(value, index, p.unarray_type(value['type']))
-
-  elif expr_type in ('List', 'Tuple'):
-    # TODO should allocate and populate
-    u.unsupported_error(expr)
-
-  elif not expr_type in IGNORE_NODES:
-    raise u.unsupported_error(expr)
+      return state.nodes.call_expression(hit['uuid'], hit['type'], args)
+    if id in BUILT_IN_FUNCTIONS:
+      if id == 'len':
+        if len(expr.args) != 1:
+          u.parse_error(expr, 'Expected exactly one argument')
+        return state.nodes.array_length_expression(args[0])
+      if id in SUPPORTED_BUILT_IN_FUNCTIONS:
+        return state.nodes.call_supported_builtin_expression(id, SUPPORTED_BUILT_IN_FUNCTIONS[id], args)
+      if builtins and id in builtins:
+        return state.nodes.call_builtin_expression(id, 'unknown', args)
+      u.unsupported_error(expr.func, f"builtin function '{id}'")
+    raise u.MissingNameError(id)
+  else:
+    u.unsupported_error(expr.func, "call of '{}'".format(u.node_type(expr.func)))
+
+def parse_constant(state, expr, builtins):
+  if expr.value is None:
+    return state.nodes.null_expression()
+  typ = CONSTANT_TYPES.get(type(expr.value))
+  if typ is None:
+    u.unsupported_error(expr, "constant '{}'".format(expr.value))
+  return state.nodes.literal_expression(typ, expr.value)
+
+def parse_name_constant(state, expr, builtins): # deprecated
+  if expr.value is None:
+    return state.nodes.null_expression()
+  if type(expr.value) == bool:
+    return state.nodes.literal_expression('boolean', expr.value)
+  else:
+    u.unsupported_error(expr, "literal '{}'".format(expr.value))
+
+def parse_num(state, expr, builtins): # deprecated
+  if type(expr.n) == int:
+    return state.nodes.literal_expression('int', expr.n)
+  return state.nodes.literal_expression('double', expr.n)
+
+def parse_str(state, expr, builtins): # deprecated
+  return state.nodes.literal_expression('string', expr.s)
+
+def bin_op_type(op, left, right):
+  if left['type'] == 'string' or right['type'] == 'string':
+    return 'string'
+  if op == 'div' or left['type'] == 'double' or right['type'] == 'double':
+    return 'double'
+  if left['type'] == 'int' or right['type'] == 'int':
+    return 'int'
+  return 'unknown'
+
+def parse_bin_op(state, expr, builtins):
+  # Chains like a + b + c nest to the left, walk that spine without recursion.
+  spine = []
+  while expr.__class__ is ast.BinOp:
+    op = OP_CLASS_TABLE.get(expr.op.__class__)
+    if op is None:
+      u.unsupported_error(expr, "operation '{}'".format(u.node_type(expr.op)))
+    spine.append((expr, op))
+    expr = expr.left
+  if len(spine) > 1:
+    state.add_chain_nodes(ast.BinOp, len(spine) - 1)
+  left = parse_expression(state, expr)
+  for expr, op in reversed(spine):
+    right = parse_expression(state, expr.right)
+    left = state.nodes.binary_operation(op, left, right, bin_op_type(op, left, right))
+  return left
+
+def parse_unary_op(state, expr, builtins):
+  ops = []
+  while expr.__class__ is ast.UnaryOp:
+    op = OP_CLASS_TABLE.get(expr.op.__class__)
+    if op is None:
+      raise u.unsupported_error(expr, "operation '{}'".format(u.node_type(expr.op)))
+    ops.append(op)
+    expr = expr.operand
+  if len(ops) > 1:
+    state.add_chain_nodes(ast.UnaryOp, len(ops) - 1)
+  operand = parse_expression(state, expr)
+  for op in reversed(ops):
+    operand = state.nodes.unary_operation(op, operand, operand['type'])
+  return operand
+
+def parse_bool_op(state, expr, builtins):
+  op = OP_CLASS_TABLE.get(expr.op.__class__)
+  if op is not None:
+    args = [parse_expression(state, e) for e in expr.values]
+    return build_bool_tree(state, op, args)
+
+def parse_compare(state, expr, builtins):
+  left = parse_expression(state, expr.left)
+  args = [parse_expression(state, e) for e in expr.comparators]
+  return build_compare_tree(state, expr, left, expr.ops, args)
+
+# TODO def parse_if_exp(state, expr, builtins):
+
+def parse_subscript(state, expr, builtins):
+  u.require_type(expr.value, 'Name')
+  value = parse_expression(state, expr.value)
+  sub_type = u.node_type(expr.slice)
+  if sub_type == 'Slice':
+    u.unsupported_error(expr, 'creation of a slice from an iterable')
+  else:
+    index = parse_expression(state, expr.slice.value if sub_type == 'Index' else expr.slice)
+    return state.nodes.array_element_expression(value, index, p.unarray_type(value['type']))
+
+def parse_sequence(state, expr, builtins):
+  # TODO should allocate and populate
+  u.unsupported_error(expr)
+
+EXPRESSION_HANDLERS = {
+  ast.Name: parse_name,
+  ast.Call: parse_call,
+  ast.Constant: parse_constant,
+  ast.BinOp: parse_bin_op,
+  ast.UnaryOp: parse_unary_op,
+  ast.BoolOp: parse_bool_op,
+  ast.Compare: parse_compare,
+  ast.Subscript: parse_subscript,
+  ast.List: parse_sequence,
+  ast.Tuple: parse_sequence,
+}
+# Node classes that older Python versions produce instead of Constant
+DEPRECATED_EXPRESSION_HANDLERS = {
+  'NameConstant': parse_name_constant,
+  'Num': parse_num,
+  'Str': parse_str,
+}
 
 # expr = BoolOp(boolop op, expr* values)
 #   | NamedExpr(expr target, expr value)
@@ -189,21 +236,24 @@ def parse_expression(state, expr, builtins = None):
 #
 #   | Slice(expr? lower, expr? upper, expr? step)
 
-def build_bool_tree(op, vals):
-  if len(vals) > 2:
-    return p.binary_operation(OP_TABLE[op], vals[0], build_bool_tree(op, vals[1:]), 'boolean')
-  return p.binary_operation(OP_TABLE[op], vals[0], vals[1], 'boolean')
-
-def build_compare_tree(expr, left, ops, comparators):
-  op = u.node_type(ops[0])
-  if op in OP_TABLE:
-    cmp = p.binary_operation(OP_TABLE[op], left, comparators[0], 'boolean')
-    if len(ops) > 1:
-      return p.binary_operation(
-        OP_TABLE['And'],
-        cmp,
-        build_compare_tree(expr, comparators[0], ops[1:], comparators[1:]),
-        'boolean'
-      )
-    return cmp
-  u.unsupported_error(expr, "operation '{}'".format(op))
+# Both trees nest to the right, a and b and c is and(a, and(b, c)), and are
+# folded from the last value so that long chains take linear time.
+
+def build_bool_tree(state, op, vals):
+  node = vals[-1]
+  for i in range(len(vals) - 2, -1, -1):
+    node = state.nodes.binary_operation(op, vals[i], node, 'boolean')
+  return node
+
+def build_compare_tree(state, expr, left, ops, comparators):
+  cmps = []
+  for o, right in zip(ops, comparators):
+    op = OP_CLASS_TABLE.get(o.__class__)
+    if op is None:
+      u.unsupported_error(expr, "operation '{}'".format(u.node_type(o)))
+    cmps.append(state.nodes.binary_operation(op, left, right, 'boolean'))
+    left = right
+  node = cmps[-1]
+  for i in range(len(cmps) - 2, -1, -1):
+    node = state.nodes.binary_operation(OP_TABLE['And'], cmps[i], node, 'boolean')
+  return node
@@ -1,24 +1,40 @@
 from .parse_statements import parse_statements
-from .ParseState import ParseState
-from . import presentation as p
+from .instrumentation import create_state, timed
 from . import parse_utils as u
 
-def parse_module(module, typed_signatures=None, exclude_others=False):
-  u.require_type(module, 'Module')
+def parse_module(module, typed_signatures=None, exclude_others=False, id_strategy='uuid', emission='finalize',
+    call_graph=False, collector=None, hash_cons=False, limits=None):
+  state = parse_module_state(module, typed_signatures, exclude_others, id_strategy, emission, call_graph, collector,
+    hash_cons, limits)
+  return module_document(state, call_graph, collector)
+
+def module_document(state, call_graph=False, collector=None):
+  result = timed(collector, 'finalize', lambda: {
+    'type': 'Module',
+    'id': None,
+    'constants': state.nodes.finalize(state.constants),
+    'procedures': state.nodes.finalize(state.procedures),
+  })
+  if call_graph:
+    result['call_graph'] = state.get_call_graph(state.module_uuid)
+  return result
+
+def parse_module_state(module, typed_signatures=None, exclude_others=False, id_strategy='uuid',
+    emission='finalize', call_graph=False, collector=None, hash_cons=False, limits=None):
+  state = create_state(collector, typed_signatures, id_strategy, emission, call_graph, hash_cons, limits)
+  return timed(collector, 'parse', parse_into_state, state, module, exclude_others)
 
-  state = ParseState(typed_signatures)
+def parse_into_state(state, module, exclude_others=False):
+  u.require_type(module, 'Module')
   module_stmt, module_typ = parse_statements(state, module.body, exclude_others, True)
+  if state.budget is not None:
+    state.budget.add_output(module_stmt, state.constants)
   if (len(module_stmt) > 0):
     default = state.add_procedure(True, None, module_typ)
     default['parameters'] = []
     default['body'] = module_stmt
-
-  return {
-    'type': 'Module',
-    'id': None,
-    'constants': p.finalize(state.constants),
-    'procedures': p.finalize(state.procedures),
-  }
+    state.module_uuid = default['uuid']
+  return state
 
 # mod = Module(stmt* body, type_ignore* type_ignores)
 #   | Interactive(stmt* body)
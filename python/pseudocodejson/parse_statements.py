@@ -1,9 +1,11 @@
+import ast
 from . import parse_utils as u
 from . import presentation as p
-from .parse_expression import parse_expression, OP_TABLE
+from .parse_expression import parse_expression, OP_CLASS_TABLE
 
-IGNORE_NODES = ['Pass', 'Delete', 'Import', 'ImportFrom', 'Assert']
-IGNORE_BUILTINS = ['print']
+IGNORE_NODES = frozenset(['Pass', 'Delete', 'Import', 'ImportFrom', 'Assert'])
+IGNORE_BUILTINS = frozenset(['print'])
+RANGE_BUILTINS = frozenset(['range'])
 
 def parse_statements(state, stmt, exclude_others=False, module_root=False):
   json = []
@@ -12,130 +14,164 @@ def parse_statements(state, stmt, exclude_others=False, module_root=False):
 
   for s in stmt:
     u.require_stmt(s)
-    stmt_type = u.node_type(s)
+    stmt_class = s.__class__
 
     # Python naming is single-pass when function bodies are parsed after the current level.
-    if stmt_type == 'FunctionDef':
-      function_defs.append([
-        state.add_procedure(module_root, s.name),
-        s.args,
-        s.body
-      ])
-  
+    if stmt_class is ast.FunctionDef:
+      function_defs.append([state.add_procedure(module_root, s.name), s])
+
     elif module_root and exclude_others:
       continue
 
-    elif stmt_type == 'Return':
-      value = parse_expression(state, s.value) if s.value else None
-      typ = value['type'] if value else 'void'
-      json.append(p.return_statement(value, typ))
-      return_types.append(typ)
-
-    elif stmt_type == 'Assign':
-      value_exp = parse_expression(state, s.value)
-      for target in s.targets:
-        parse_assignment_target(state, json, s, target, value_exp)
-
-    elif stmt_type == 'AugAssign':
-      op = u.node_type(s.op)
-      if op in OP_TABLE:
-        val = parse_expression(state, s.value)
-        value_exp = p.binary_operation(
-          OP_TABLE[op],
-          parse_expression(state, s.target),
-          val,
-          val['type']
-        )
-        if not add_array_assignment(state, json, s.target, value_exp):
-          uuid = parse_target_uuid(state, s.target, value_exp['type'])
-          json.append(p.assignment_statement(uuid, value_exp))
-      else:
-        u.unsupported_error(s, "operation '{}'".format(op))
-
-    elif stmt_type == 'If':
-      cond = parse_expression(state, s.test)
-      if_body, if_typ = parse_statements(state, s.body, exclude_others)
-      else_body, else_typ = parse_statements(state, s.orelse, exclude_others)
-      json.append(p.selection_statement(cond, if_body, else_body))
-      return_types.extend(t for t in [if_typ, else_typ] if t != 'void')
-
-    elif stmt_type == 'While':
-      if len(s.orelse) > 0:
-        u.unsupported_error(s, "'Else' in 'While'")
-      cond = parse_expression(state, s.test)
-      body, typ = parse_statements(state, s.body, exclude_others)
-      json.append(p.loop_statement(cond, body))
-      return_types.extend(t for t in [typ] if t != 'void')
-
-    elif stmt_type == 'For':
-      if len(s.orelse) > 0:
-        u.unsupported_error(s, "'Else' in 'For'")
-      iter = parse_expression(state, s.iter, ['range'])
-      if iter['Expression'] == 'Call' and iter['builtin'] == 'range':
-        uuid = parse_or_create_target_uuid(state, json, s.target, 'int')
-        args = iter['arguments']
-        begin = args[0] if len(args) > 1 else p.literal_expression('int', 0)
-        end = args[1 if len(args) > 1 else 0]
-        step = args[2] if len(args) > 2 else p.literal_expression('int', 1)
-        step_op = 'add'
-        if step['Expression'] == 'Unary Op' and step['op'] == 'minus':
-          step_op = 'sub'
-          step = step['expression']
-        elif step['Expression'] == 'Literal' and step['value'] < 0:
-          step_op = 'sub'
-          step['value'] = abs(step['value'])
-        body, typ = parse_statements(state, s.body, exclude_others)
-        json.append(p.assignment_statement(uuid, begin))
-        json.append(p.loop_statement(
-          p.binary_operation('different', p.variable_expression(uuid, 'int'), end, 'boolean'),
-          body + [
-            p.assignment_statement(
-              uuid,
-              p.binary_operation(step_op, p.variable_expression(uuid, 'int'), step, 'int')
-            )
-          ]
-        ))
-      else:
-        u.unsupported_error(s, f"for iterable '{iter['Expression']}' (only 'range' is supported)")
-
-    elif stmt_type == 'Break':
-      json.append(p.break_statement())
-    
-    elif stmt_type == 'Continue':
-      json.append(p.continue_statement())
-
-    elif stmt_type == 'Expr':
-      e = parse_expression(state, s.value, IGNORE_BUILTINS)
-      if e['Expression'] == 'Call':
-        if 'call' in e:
-          json.append(e['call'])
-      elif e['Expression'] == 'Literal' and e['type'] == 'string':
-        pass # Skip comment
-      else:
-        u.unsupported_error(s, "expression '{}' as statement".format(e['Expression']))
-
-    elif not stmt_type in IGNORE_NODES:
-      u.unsupported_error(s)
-
-  if exclude_others:
-    uuids = state.get_required_to_parse()
-  else:
-    uuids = [tr[0]['uuid'] for tr in function_defs]
-  while uuids:
-    for fdef, fargs, fstmt in function_defs:
-      if fdef['uuid'] in uuids:
-        state.push_names()
-        fdef['parameters'] = parse_args(state, fdef['id'], fargs)
-        body, typ = parse_statements(state, fstmt, exclude_others)
-        fdef['body'] = body
-        if fdef['type'] == 'unknown':
-          fdef['type'] = typ
-        state.pop_names()
-    uuids = state.get_required_to_parse()
+    else:
+      handler = state.statement_handlers.get(stmt_class)
+      if handler is not None:
+        budget = state.node_budget
+        if budget is None:
+          handler(state, s, json, return_types, exclude_others)
+        else:
+          handled = budget.handled = budget.handled + 1
+          depth = budget.depth = budget.depth + 1
+          if depth > budget.peak_depth or handled >= budget.checkpoint:
+            budget.check()
+          try:
+            handler(state, s, json, return_types, exclude_others)
+          finally:
+            budget.depth -= 1
+      elif not stmt_class.__name__ in IGNORE_NODES:
+        u.unsupported_error(s)
+
+  if function_defs:
+    # Worklist of procedures to parse, ordered by declaration inside each round.
+    positions = { fdef['uuid']: i for i, (fdef, _) in enumerate(function_defs) }
+    if exclude_others:
+      worklist = [uuid for uuid in state.get_required_to_parse() if uuid in positions]
+    else:
+      worklist = list(positions)
+    while worklist:
+      state.start_round(worklist, module_root)
+      for i in sorted(positions[uuid] for uuid in worklist):
+        fdef, fnode = function_defs[i]
+        if not state.reuse_procedure(fdef, fnode):
+          parse_procedure(state, fdef, fnode, exclude_others)
+      worklist = [uuid for uuid in state.get_required_to_parse() if uuid in positions]
 
   typ = u.common_type(stmt, return_types, 'multiple return types for a function') if return_types else 'void'
   return json, typ
 
+def parse_procedure(state, fdef, fnode, exclude_others):
+  state.enter_procedure(fdef)
+  fdef['parameters'] = parse_args(state, fdef['id'], fnode.args)
+  body, typ = parse_statements(state, fnode.body, exclude_others)
+  fdef['body'] = body
+  if state.budget is not None:
+    state.budget.add_output(fdef)
+  if fdef['type'] == 'unknown':
+    fdef['type'] = typ
+  state.exit_procedure()
+
+def parse_return(state, s, json, return_types, exclude_others):
+  value = parse_expression(state, s.value) if s.value else None
+  typ = value['type'] if value else 'void'
+  json.append(state.nodes.return_statement(value, typ))
+  return_types.append(typ)
+
+def parse_assign(state, s, json, return_types, exclude_others):
+  value_exp = parse_expression(state, s.value)
+  for target in s.targets:
+    parse_assignment_target(state, json, s, target, value_exp)
+
+def parse_aug_assign(state, s, json, return_types, exclude_others):
+  op = OP_CLASS_TABLE.get(s.op.__class__)
+  if op is not None:
+    val = parse_expression(state, s.value)
+    value_exp = state.nodes.binary_operation(
+      op,
+      parse_expression(state, s.target),
+      val,
+      val['type']
+    )
+    if not add_array_assignment(state, json, s.target, value_exp):
+      uuid = parse_target_uuid(state, s.target, value_exp['type'])
+      json.append(state.nodes.assignment_statement(uuid, value_exp))
+  else:
+    u.unsupported_error(s, "operation '{}'".format(u.node_type(s.op)))
+
+def parse_if(state, s, json, return_types, exclude_others):
+  cond = parse_expression(state, s.test)
+  if_body, if_typ = parse_statements(state, s.body, exclude_others)
+  else_body, else_typ = parse_statements(state, s.orelse, exclude_others)
+  json.append(state.nodes.selection_statement(cond, if_body, else_body))
+  return_types.extend(t for t in [if_typ, else_typ] if t != 'void')
+
+def parse_while(state, s, json, return_types, exclude_others):
+  if len(s.orelse) > 0:
+    u.unsupported_error(s, "'Else' in 'While'")
+  cond = parse_expression(state, s.test)
+  body, typ = parse_statements(state, s.body, exclude_others)
+  json.append(state.nodes.loop_statement(cond, body))
+  return_types.extend(t for t in [typ] if t != 'void')
+
+def parse_for(state, s, json, return_types, exclude_others):
+  if len(s.orelse) > 0:
+    u.unsupported_error(s, "'Else' in 'For'")
+  nodes = state.nodes
+  iter = parse_expression(state, s.iter, RANGE_BUILTINS)
+  if iter['Expression'] == 'Call' and iter['builtin'] == 'range':
+    uuid = parse_or_create_target_uuid(state, json, s.target, 'int')
+    args = iter['arguments']
+    begin = args[0] if len(args) > 1 else nodes.literal_expression('int', 0)
+    end = args[1 if len(args) > 1 else 0]
+    step = args[2] if len(args) > 2 else nodes.literal_expression('int', 1)
+    step_op = 'add'
+    if step['Expression'] == 'Unary Op' and step['op'] == 'minus':
+      step_op = 'sub'
+      step = step['expression']
+    elif step['Expression'] == 'Literal' and step['value'] < 0:
+      step_op = 'sub'
+      step = nodes.literal_expression(step['type'], abs(step['value']))
+    body, typ = parse_statements(state, s.body, exclude_others)
+    json.append(nodes.assignment_statement(uuid, begin))
+    json.append(nodes.loop_statement(
+      nodes.binary_operation('different', nodes.variable_expression(uuid, 'int'), end, 'boolean'),
+      body + [
+        nodes.assignment_statement(
+          uuid,
+          nodes.binary_operation(step_op, nodes.variable_expression(uuid, 'int'), step, 'int')
+        )
+      ]
+    ))
+  else:
+    u.unsupported_error(s, f"for iterable '{iter['Expression']}' (only 'range' is supported)")
+
+def parse_break(state, s, json, return_types, exclude_others):
+  json.append(state.nodes.break_statement())
+
+def parse_continue(state, s, json, return_types, exclude_others):
+  json.append(state.nodes.continue_statement())
+
+def parse_expr(state, s, json, return_types, exclude_others):
+  e = parse_expression(state, s.value, IGNORE_BUILTINS)
+  if e['Expression'] == 'Call':
+    if 'call' in e:
+      json.append(e['call'])
+  elif e['Expression'] == 'Literal' and e['type'] == 'string':
+    pass # Skip comment
+  else:
+    u.unsupported_error(s, "expression '{}' as statement".format(e['Expression']))
+
+STATEMENT_HANDLERS = {
+  ast.Return: parse_return,
+  ast.Assign: parse_assign,
+  ast.AugAssign: parse_aug_assign,
+  ast.If: parse_if,
+  ast.While: parse_while,
+  ast.For: parse_for,
+  ast.Break: parse_break,
+  ast.Continue: parse_continue,
+  ast.Expr: parse_expr,
+}
+
 # stmt = FunctionDef(identifier name, arguments args, stmt* body, expr* decorator_list, expr? returns, string? type_comment)
 #   | AsyncFunctionDef(identifier name, arguments args, stmt* body, expr* decorator_list, expr? returns, string? type_comment)
 #   | ClassDef(identifier name, expr* bases, keyword* keywords, stmt* body, expr* decorator_list)
@@ -184,7 +220,7 @@ def parse_assignment_target(state, json, stmt, target, value_exp):
       parse_assignment_target(state, json, stmt, target.elts[i], value_exp['value'][i])
   elif not add_array_assignment(state, json, target, value_exp):
     uuid = parse_or_create_target_uuid(state, json, target, value_exp['type'])
-    json.append(p.assignment_statement(uuid, value_exp))
+    json.append(state.nodes.assignment_statement(uuid, value_exp))
 
 def add_array_assignment(state, json, target, value_exp):
   if u.node_type(target) != 'Subscript':
@@ -195,16 +231,16 @@ def add_array_assignment(state, json, target, value_exp):
   if 'builtin' in arr['target']:
     u.unsupported_error(target, 'assignment to builtin')
   typ = p.array_type(value_exp['type'])
-  state.set_variable_type(target, arr['target']['variable'], typ)
-  arr['target']['type'] = typ
-  json.append(p.array_assignment_statement(arr['target'], arr['indexes'], value_exp))
+  uuid = arr['target']['variable']
+  state.set_variable_type(target, uuid, typ)
+  json.append(state.nodes.array_assignment_statement(
+    state.nodes.variable_expression(uuid, typ), arr['indexes'], value_exp))
   return True
 
 def parse_target_uuid(state, target, typ):
   u.require_type(target, 'Name')
   var = parse_expression(state, target)
   state.set_variable_type(target, var['variable'], typ)
-  var['type'] = typ
   return var['variable']
 
 def parse_or_create_target_uuid(state, json, target, typ):
@@ -1,4 +1,5 @@
 import ast
+import hashlib
 import uuid as makeuuid
 
 def node_type(node):
@@ -51,12 +52,69 @@ def common_type(expr, types, error):
 def uuid():
   return str(makeuuid.uuid4())
 
+class UuidIds:
+  def make(self, scope, kind, name):
+    return uuid()
+
+class SequentialIds:
+  def __init__(self):
+    self.count = 0
+
+  def make(self, scope, kind, name):
+    self.count += 1
+    return str(self.count)
+
+class HashIds:
+  def __init__(self, digest_size=8):
+    self.digest_size = digest_size
+    self.issued = set()
+
+  def make(self, scope, kind, name):
+    key = '/'.join(scope) + '\0' + kind + '\0' + (name or '')
+    id = self.digest(key)
+    n = 1
+    while id in self.issued:
+      # Redefinitions of a name in the same scope
+      n += 1
+      id = self.digest('{}#{:d}'.format(key, n))
+    self.issued.add(id)
+    return id
+
+  def digest(self, key):
+    return hashlib.blake2b(key.encode('utf-8', 'surrogatepass'), digest_size=self.digest_size).hexdigest()
+
+ID_STRATEGIES = {
+  'uuid': UuidIds,
+  'sequential': SequentialIds,
+  'hash': HashIds,
+}
+
+def id_generator(strategy):
+  if not strategy in ID_STRATEGIES:
+    raise ValueError("Unknown id strategy '{}'".format(strategy))
+  return ID_STRATEGIES[strategy]()
+
 class ParseError(Exception):
   pass
 
 class ParseUnsupportedError(Exception):
   pass
 
+class UnsupportedConstructsError(ParseUnsupportedError):
+  def __init__(self, issues):
+    super().__init__('; '.join("Unsupported {} at line {:d}".format(i['feature'], i['line']) for i in issues))
+    self.issues = issues
+
+class ResourceLimitError(Exception):
+  def __init__(self, limit, value, stats):
+    super().__init__("Exceeded {} of {}".format(limit, value))
+    self.limit = limit
+    self.value = value
+    self.stats = stats
+
+  def __reduce__(self):
+    return (self.__class__, (self.limit, self.value, self.stats))
+
 class MissingNameError(Exception):
   def __init__(self, id):
     super().__init__("Missing name '{}'".format(id))
@@ -0,0 +1,250 @@
+import ast
+from . import parse_utils as u
+from .parse_expression import (
+  EXPRESSION_HANDLERS, DEPRECATED_EXPRESSION_HANDLERS, BUILT_IN_FUNCTIONS, SUPPORTED_BUILT_IN_FUNCTIONS,
+  BUILT_IN_VARIABLES, OP_CLASS_TABLE, CONSTANT_TYPES,
+)
+from .parse_statements import STATEMENT_HANDLERS, IGNORE_NODES, IGNORE_BUILTINS, RANGE_BUILTINS
+
+# One walk over the ast that lists every construct the converter rejects,
+# without resolving names or building nodes. Builtin names are only reported
+# once the walk is over and every name bound somewhere in the module is known,
+# so a program defining its own 'max' is not flagged for calling it.
+
+class Screen:
+
+  def __init__(self):
+    self.issues = []
+    self.bound = set()
+    self.builtins = []
+    self.called = set()
+
+  def add(self, node, feature):
+    self.issues.append((u.node_line(node), getattr(node, 'col_offset', 0), feature))
+
+  def statements(self, stmts, module_root=False, exclude_others=False, roots=()):
+    outer = self.called
+    self.called = set()
+    defs = {}
+    for s in stmts:
+      cls = s.__class__
+      if cls is ast.FunctionDef:
+        self.bound.add(s.name)
+        self.bound.update(a.arg for a in s.args.args)
+        # The converter drops functions that a later one rebinds.
+        defs.pop(s.name, None)
+        defs[s.name] = s
+        if not exclude_others:
+          self.function(s)
+      elif module_root and exclude_others:
+        continue
+      elif cls in STATEMENT_SCREENS:
+        STATEMENT_SCREENS[cls](self, s)
+      elif not cls in STATEMENT_HANDLERS and not cls.__name__ in IGNORE_NODES:
+        self.add(s, "'{}'".format(u.node_type(s)))
+    called = self.called
+    self.called = outer
+    if exclude_others:
+      # Only the functions reachable from the roots by called names get
+      # converted, the calls that no function here binds go to the level up.
+      called |= set(roots)
+      screened = set()
+      todo = [name for name in defs if name in called]
+      while todo:
+        for name in todo:
+          screened.add(name)
+          called |= self.function(defs[name], exclude_others)
+        todo = [name for name in defs if name in called and not name in screened]
+      called -= defs.keys()
+    self.called |= called
+
+  def function(self, s, exclude_others=False):
+    outer = self.called
+    self.called = set()
+    self.statements(s.body, False, exclude_others)
+    called = self.called
+    self.called = outer
+    return called
+
+  def target(self, stmt, target):
+    cls = target.__class__
+    if cls is ast.Name:
+      self.bound.add(target.id)
+    elif cls is ast.Subscript:
+      self.expression(target)
+    elif cls is ast.Tuple or cls is ast.List:
+      self.add(stmt, 'assignment to tuple')
+    else:
+      self.add(target, "assignment to '{}'".format(u.node_type(target)))
+
+  def expression(self, expr, builtins=None):
+    cls = expr.__class__
+    screen = EXPRESSION_SCREENS.get(cls)
+    if screen is not None:
+      screen(self, expr, builtins)
+    elif cls in EXPRESSION_HANDLERS or u.node_type(expr) in DEPRECATED_EXPRESSION_HANDLERS:
+      for child in ast.iter_child_nodes(expr):
+        if isinstance(child, ast.expr):
+          self.expression(child)
+    else:
+      self.add(expr, "'{}'".format(u.node_type(expr)))
+
+  def operation(self, node, op):
+    if not op.__class__ in OP_CLASS_TABLE:
+      self.add(node, "operation '{}'".format(u.node_type(op)))
+
+  def result(self):
+    for node, feature, name in self.builtins:
+      if not name in self.bound:
+        self.add(node, feature)
+    return [{ 'line': line, 'feature': feature } for line, _, feature in sorted(self.issues)]
+
+def screen_return(screen, s):
+  if s.value is not None:
+    screen.expression(s.value)
+
+def screen_assign(screen, s):
+  screen.expression(s.value)
+  for target in s.targets:
+    screen.target(s, target)
+
+def screen_aug_assign(screen, s):
+  screen.operation(s, s.op)
+  screen.expression(s.value)
+  screen.target(s, s.target)
+
+def screen_if(screen, s):
+  screen.expression(s.test)
+  screen.statements(s.body)
+  screen.statements(s.orelse)
+
+def screen_while(screen, s):
+  if s.orelse:
+    screen.add(s, "'Else' in 'While'")
+  screen.expression(s.test)
+  screen.statements(s.body)
+
+def screen_for(screen, s):
+  if s.orelse:
+    screen.add(s, "'Else' in 'For'")
+  it = s.iter
+  if it.__class__ is ast.Call and it.func.__class__ is ast.Name and it.func.id in RANGE_BUILTINS:
+    screen.expression(it, RANGE_BUILTINS)
+  else:
+    screen.add(s, "for iterable '{}' (only 'range' is supported)".format(u.node_type(it)))
+    screen.expression(it)
+  screen.target(s, s.target)
+  screen.statements(s.body)
+
+def screen_expr(screen, s):
+  value = s.value
+  if value.__class__ is ast.Call:
+    screen.expression(value, IGNORE_BUILTINS)
+  elif not (value.__class__ is ast.Constant and type(value.value) is str):
+    screen.add(s, "expression '{}' as statement".format(u.node_type(value)))
+
+def screen_name(screen, expr, builtins):
+  if expr.id in BUILT_IN_VARIABLES:
+    screen.builtins.append((expr, "builtin value '{}'".format(expr.id), expr.id))
+
+def screen_call(screen, expr, builtins):
+  func = expr.func
+  for a in expr.args:
+    screen.expression(a)
+  if func.__class__ is ast.Attribute:
+    owner = func.value.id if func.value.__class__ is ast.Name else u.node_type(func.value)
+    screen.add(func, "method call '{}.{}'".format(owner, func.attr))
+    screen.expression(func.value)
+  elif func.__class__ is ast.Name:
+    id = func.id
+    screen.called.add(id)
+    if id in BUILT_IN_FUNCTIONS and id != 'len' and not id in SUPPORTED_BUILT_IN_FUNCTIONS \
+        and not (builtins and id in builtins):
+      screen.builtins.append((func, "builtin function '{}'".format(id), id))
+  else:
+    screen.add(func, "call of '{}'".format(u.node_type(func)))
+
+def screen_sequence(screen, expr, builtins):
+  screen.add(expr, "'{}'".format(u.node_type(expr)))
+
+def screen_constant(screen, expr, builtins):
+  if expr.value is not None and not type(expr.value) in CONSTANT_TYPES:
+    screen.add(expr, "constant '{}'".format(expr.value))
+
+def screen_bin_op(screen, expr, builtins):
+  # Walks the left spine of chains without recursion, as parse_bin_op does.
+  rights = []
+  while expr.__class__ is ast.BinOp:
+    screen.operation(expr, expr.op)
+    rights.append(expr.right)
+    expr = expr.left
+  screen.expression(expr)
+  for right in reversed(rights):
+    screen.expression(right)
+
+def screen_unary_op(screen, expr, builtins):
+  while expr.__class__ is ast.UnaryOp:
+    screen.operation(expr, expr.op)
+    expr = expr.operand
+  screen.expression(expr)
+
+def screen_bool_op(screen, expr, builtins):
+  screen.operation(expr, expr.op)
+  for e in expr.values:
+    screen.expression(e)
+
+def screen_compare(screen, expr, builtins):
+  for op in expr.ops:
+    screen.operation(expr, op)
+  screen.expression(expr.left)
+  for e in expr.comparators:
+    screen.expression(e)
+
+def screen_subscript(screen, expr, builtins):
+  if expr.value.__class__ is not ast.Name:
+    screen.add(expr, "subscript of '{}'".format(u.node_type(expr.value)))
+  else:
+    screen.expression(expr.value)
+  if expr.slice.__class__ is ast.Slice:
+    screen.add(expr, 'creation of a slice from an iterable')
+  else:
+    index = expr.slice.value if u.node_type(expr.slice) == 'Index' else expr.slice
+    screen.expression(index)
+
+STATEMENT_SCREENS = {
+  ast.Return: screen_return,
+  ast.Assign: screen_assign,
+  ast.AugAssign: screen_aug_assign,
+  ast.If: screen_if,
+  ast.While: screen_while,
+  ast.For: screen_for,
+  ast.Break: lambda screen, s: None,
+  ast.Continue: lambda screen, s: None,
+  ast.Expr: screen_expr,
+}
+EXPRESSION_SCREENS = {
+  ast.Name: screen_name,
+  ast.Call: screen_call,
+  ast.Constant: screen_constant,
+  ast.BinOp: screen_bin_op,
+  ast.UnaryOp: screen_unary_op,
+  ast.BoolOp: screen_bool_op,
+  ast.Compare: screen_compare,
+  ast.Subscript: screen_subscript,
+  ast.List: screen_sequence,
+  ast.Tuple: screen_sequence,
+}
+
+def screen_module(module, exclude_others=False, typed_signatures=None):
+  u.require_type(module, 'Module')
+  screen = Screen()
+  screen.statements(module.body, True, exclude_others, typed_signatures or ())
+  return screen.result()
+
+def prescreen(src, exclude_others=False, typed_signatures=None):
+  return screen_module(ast.parse(src), exclude_others, typed_signatures)
+
+def check_module(module, exclude_others=False, typed_signatures=None):
+  issues = screen_module(module, exclude_others, typed_signatures)
+  if issues:
+    raise u.UnsupportedConstructsError(issues)
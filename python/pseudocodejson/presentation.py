@@ -184,20 +184,254 @@ def should_strip(e):
   return e.get('Statement') == 'Procedure' and e['body'] is None
 
 def finalize(statements):
-  def filter(s):
-    sp = { k: v for k, v in s.items() if not k in ('type', '_called', '_children') }
-    if should_have_type(s):
-      typ = s.get('type', 'unknown')
-      if is_array_type(typ):
-        sp['type'] = unarray_type(typ)
-        sp['array'] = True
-      else:
-        sp['type'] = typ
-        sp['array'] = False
-    for c in s.get('_children', []):
-      if c in s and not s[c] is None:
-        sp[c] = finalize(s[c])
-    return sp
-  if type(statements) == list:
-    return [filter(s) for s in statements if not should_strip(s)]
-  return filter(statements)
+  # Copies with an explicit stack, expression chains may nest deeper than the
+  # recursion limit. Each entry fills one slot of an already copied parent.
+  root = [None]
+  stack = [(root, 0, statements)]
+  while stack:
+    parent, key, s = stack.pop()
+    if type(s) == list:
+      kept = [c for c in s if not should_strip(c)]
+      sp = [None] * len(kept)
+      stack.extend((sp, i, c) for i, c in enumerate(kept))
+    else:
+      sp = { k: v for k, v in s.items() if not k in ('type', '_called', '_children') }
+      if should_have_type(s):
+        typ = s.get('type', 'unknown')
+        if is_array_type(typ):
+          sp['type'] = unarray_type(typ)
+          sp['array'] = True
+        else:
+          sp['type'] = typ
+          sp['array'] = False
+      for c in s.get('_children', ()):
+        if c in s and not s[c] is None:
+          stack.append((sp, c, s[c]))
+    parent[key] = sp
+  return root[0]
+
+def iter_finalized(statements):
+  for s in statements:
+    if not should_strip(s):
+      yield finalize(s)
+
+EMISSIONS = ('finalize', 'direct')
+
+# Builds nodes without scratch keys for the direct emission mode. Types and
+# call status are still needed while parsing, so every node carrying them is
+# kept on a patch list that is resolved in place once parsing has finished.
+class DirectNodes:
+
+  def __init__(self):
+    self.patches = []
+
+  def patch(self, node):
+    self.patches.append(node)
+    return node
+
+  def procedure_declaration(self, uuid, id, type, called):
+    return self.patch({
+      'Statement': 'Procedure',
+      'uuid': uuid,
+      'id': id,
+      'type': type,
+      'parameters': None,
+      'body': None,
+      '_called': called,
+    })
+
+  def variable_statement(self, uuid, id, type):
+    return self.patch({
+      'Statement': 'Variable',
+      'uuid': uuid,
+      'id': id,
+      'type': type,
+    })
+
+  def call_statement(self, uuid, args):
+    return {
+      'Statement': 'Call',
+      'procedure': uuid,
+      'arguments': args,
+    }
+
+  def return_statement(self, expression, typ):
+    return self.patch({
+      'Statement': 'Return',
+      'expression': expression,
+      'type': typ,
+    })
+
+  def assignment_statement(self, uuid, expression):
+    return {
+      'Statement': 'Assignment',
+      'variable': uuid,
+      'expression': expression,
+    }
+
+  def array_assignment_statement(self, target, indexes, expression):
+    return {
+      'Statement': 'Array Assignment',
+      'target': target,
+      'indexes': indexes,
+      'expression': expression,
+    }
+
+  def selection_statement(self, guard, body, alternative):
+    return {
+      'Statement': 'Selection',
+      'guard': guard,
+      'body': body,
+      'alternative': alternative,
+    }
+
+  def loop_statement(self, guard, body):
+    return {
+      'Statement': 'Loop',
+      'guard': guard,
+      'body': body,
+    }
+
+  def break_statement(self):
+    return break_statement()
+
+  def continue_statement(self):
+    return continue_statement()
+
+  def variable_expression(self, uuid, typ):
+    return self.patch(variable_expression(uuid, typ))
+
+  def builtin_variable_expression(self, id, typ):
+    return self.patch(builtin_variable_expression(id, typ))
+
+  def call_expression(self, uuid, typ, args):
+    return self.patch({
+      'Expression': 'Call',
+      'call': self.call_statement(uuid, args),
+      'type': typ,
+    })
+
+  def call_supported_builtin_expression(self, id, typ, args):
+    return self.call_expression(f'builtin:bn{id.capitalize()}', typ, args)
+
+  def call_builtin_expression(self, id, typ, args):
+    return self.patch({
+      'Expression': 'Call',
+      'builtin': id,
+      'arguments': args,
+      'type': typ,
+    })
+
+  def array_length_expression(self, target):
+    return self.patch({
+      'Expression': 'Array Length',
+      'target': target,
+      'indexes': [],
+      'type': 'int',
+    })
+
+  def array_element_expression(self, target, index, typ):
+    return self.patch({
+      'Expression': 'Array Element',
+      'target': target,
+      'indexes': [index],
+      'type': typ,
+    })
+
+  def literal_expression(self, type, value):
+    return self.patch(literal_expression(type, value))
+
+  def null_expression(self):
+    return self.patch(null_expression())
+
+  def binary_operation(self, op, left, right, typ):
+    return self.patch({
+      'Expression': 'Binary Op',
+      'op': op,
+      'left': left,
+      'right': right,
+      'type': typ,
+    })
+
+  def unary_operation(self, op, expression, typ):
+    return self.patch({
+      'Expression': 'Unary Op',
+      'op': op,
+      'expression': expression,
+      'type': typ,
+    })
+
+  def resolve(self):
+    for node in self.patches:
+      typ = node.pop('type')
+      node.pop('_called', None)
+      if should_have_type(node):
+        if is_array_type(typ):
+          node['type'] = unarray_type(typ)
+          node['array'] = True
+        else:
+          node['type'] = typ
+          node['array'] = False
+    self.patches = []
+
+  def finalize(self, statements):
+    self.resolve()
+    return [s for s in statements if not should_strip(s)]
+
+  def iter_finalized(self, statements):
+    self.resolve()
+    for s in statements:
+      if not should_strip(s):
+        yield s
+
+# Hands out a single node for structurally identical pure expressions. The
+# children were shared when they were built, so they are keyed by identity.
+# Every other factory is taken from the wrapped nodes as is.
+class SharedNodes:
+
+  def __init__(self, nodes):
+    self.nodes = nodes
+    self.shared = {}
+
+  def __getattr__(self, name):
+    value = getattr(self.nodes, name)
+    setattr(self, name, value)
+    return value
+
+  def share(self, key, create, *args):
+    node = self.shared.get(key)
+    if node is None:
+      node = self.shared[key] = create(*args)
+    return node
+
+  def variable_expression(self, uuid, typ):
+    return self.share(('Variable', uuid, typ), self.nodes.variable_expression, uuid, typ)
+
+  def builtin_variable_expression(self, id, typ):
+    return self.share(('Builtin', id, typ), self.nodes.builtin_variable_expression, id, typ)
+
+  def literal_expression(self, type, value):
+    cls = value.__class__
+    if cls is list:
+      return self.nodes.literal_expression(type, value)
+    # Floats by their bits, so that 0.0 and -0.0 stay apart.
+    key = ('Literal', type, cls, value.hex() if cls is float else value)
+    return self.share(key, self.nodes.literal_expression, type, value)
+
+  def null_expression(self):
+    return self.share(('Null',), self.nodes.null_expression)
+
+  def array_length_expression(self, target):
+    return self.share(('Array Length', id(target)), self.nodes.array_length_expression, target)
+
+  def array_element_expression(self, target, index, typ):
+    key = ('Array Element', id(target), id(index), typ)
+    return self.share(key, self.nodes.array_element_expression, target, index, typ)
+
+  def binary_operation(self, op, left, right, typ):
+    key = ('Binary Op', op, id(left), id(right), typ)
+    return self.share(key, self.nodes.binary_operation, op, left, right, typ)
+
+  def unary_operation(self, op, expression, typ):
+    key = ('Unary Op', op, id(expression), typ)
+    return self.share(key, self.nodes.unary_operation, op, expression, typ)
@@ -0,0 +1,294 @@
+import sys
+import json
+import time
+import asyncio
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from . import src2pseudo
+from .batch import error_text
+from .parse_utils import ID_STRATEGIES
+from .json_stream import dumps
+
+# Line delimited JSON-RPC 2.0 over stdio or a unix socket. Conversions run on
+# a process pool and are serialized there, the event loop only frames lines.
+# A connection is not read further while max_pending requests are in flight,
+# so a fast client is held back by the transport instead of queueing memory.
+
+DEFAULT_MAX_PENDING = 64
+DEFAULT_MAX_BATCH = 1024
+LINE_LIMIT = 64 * 1024 * 1024
+LATENCY_WINDOW = 1024
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+CONVERSION_ERROR = 1
+
+class RequestError(Exception):
+
+  def __init__(self, code, message):
+    super().__init__(message)
+    self.code = code
+
+def convert_source(source, typed_signatures=None, exclude_others=False, id_strategy='uuid', limits=None):
+  try:
+    return True, dumps(src2pseudo(source, typed_signatures, exclude_others, None, id_strategy, 'direct',
+      limits=limits))
+  except Exception as error:
+    return False, error_text(error)
+
+def conversion_options(params):
+  typed_signatures = params.get('typed_signatures')
+  if typed_signatures is not None and type(typed_signatures) is not dict:
+    raise RequestError(INVALID_PARAMS, "'typed_signatures' must be an object")
+  exclude_others = params.get('exclude_others', False)
+  if type(exclude_others) is not bool:
+    raise RequestError(INVALID_PARAMS, "'exclude_others' must be a boolean")
+  id_strategy = params.get('id_strategy', 'uuid')
+  if not id_strategy in ID_STRATEGIES:
+    raise RequestError(INVALID_PARAMS, "Unknown id strategy '{}'".format(id_strategy))
+  return typed_signatures, exclude_others, id_strategy
+
+def latency_summary(latencies, count, total, maximum):
+  ordered = sorted(latencies)
+  def percentile(q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+  return {
+    'count': count,
+    'mean': total / count if count else 0.0,
+    'p50': percentile(0.5),
+    'p95': percentile(0.95),
+    'max': maximum,
+  }
+
+class MethodStats:
+
+  def __init__(self):
+    self.count = 0
+    self.errors = 0
+    self.total = 0.0
+    self.max = 0.0
+    self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+  def add(self, seconds, failed):
+    self.count += 1
+    self.errors += failed
+    self.total += seconds
+    self.max = max(self.max, seconds)
+    self.latencies.append(seconds)
+
+  def as_dict(self):
+    return {
+      'errors': self.errors,
+      'latency': latency_summary(self.latencies, self.count, self.total, self.max),
+    }
+
+class Server:
+
+  def __init__(self, workers=None, max_pending=DEFAULT_MAX_PENDING, max_batch=DEFAULT_MAX_BATCH, executor=None,
+      limits=None):
+    self.workers = workers
+    self.owns_executor = executor is None
+    self.executor = executor if executor is not None else ProcessPoolExecutor(workers)
+    self.limits = limits
+    self.max_pending = max_pending
+    self.max_batch = max_batch
+    self.slots = asyncio.Semaphore(max_pending)
+    self.started = time.monotonic()
+    self.connections = 0
+    self.requests = 0
+    self.errors = 0
+    self.in_flight = 0
+    self.peak_in_flight = 0
+    self.conversions = 0
+    self.conversion_errors = 0
+    self.method_stats = {}
+    self.methods = {
+      'convert': self.convert,
+      'convert_batch': self.convert_batch,
+      'stats': self.stats,
+    }
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.executor.shutdown()
+
+  async def handle(self, reader, writer):
+    self.connections += 1
+    lock = asyncio.Lock()
+    tasks = set()
+    try:
+      while True:
+        await self.slots.acquire()
+        try:
+          line = await reader.readline()
+        except ValueError:
+          self.slots.release()
+          await self.write(writer, lock, error_response(None, INVALID_REQUEST, 'Request line too long'))
+          break
+        if not line:
+          self.slots.release()
+          break
+        if not line.strip():
+          self.slots.release()
+          continue
+        task = asyncio.ensure_future(self.respond(line, writer, lock))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+      if tasks:
+        await asyncio.gather(*tasks)
+    finally:
+      writer.close()
+
+  async def write(self, writer, lock, response):
+    writer.write(response.encode('utf-8') + b'\n')
+    async with lock:
+      await writer.drain()
+
+  async def respond(self, line, writer, lock):
+    self.requests += 1
+    self.in_flight += 1
+    self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+    start = time.perf_counter()
+    method = None
+    failed = False
+    try:
+      id = None
+      try:
+        try:
+          request = json.loads(line)
+        except ValueError:
+          raise RequestError(PARSE_ERROR, 'Parse error') from None
+        if type(request) is not dict or type(request.get('method')) is not str:
+          raise RequestError(INVALID_REQUEST, 'Invalid request')
+        id = request.get('id')
+        handler = self.methods.get(request['method'])
+        if handler is None:
+          raise RequestError(METHOD_NOT_FOUND, "Method '{}' not found".format(request['method']))
+        method = request['method']
+        params = request.get('params', {})
+        if type(params) is not dict:
+          raise RequestError(INVALID_PARAMS, 'Params must be an object')
+        response = '{"jsonrpc":"2.0","id":' + json.dumps(id) + ',"result":' + await handler(params) + '}'
+      except RequestError as error:
+        failed = True
+        self.errors += 1
+        response = error_response(id, error.code, str(error))
+      except Exception as error:
+        # Every request gets a response, whatever went wrong.
+        failed = True
+        self.errors += 1
+        response = error_response(id, INTERNAL_ERROR, error_text(error))
+      await self.write(writer, lock, response)
+    finally:
+      self.in_flight -= 1
+      self.slots.release()
+      if method is not None:
+        self.method_stats.setdefault(method, MethodStats()).add(time.perf_counter() - start, failed)
+
+  async def run(self, source, options):
+    loop = asyncio.get_running_loop()
+    executor = self.executor
+    try:
+      ok, text = await loop.run_in_executor(executor, partial(convert_source, source, *options, self.limits))
+    except BrokenProcessPool as error:
+      # A worker died, likely converting this very source. The conversions
+      # in flight on the pool fail with it, later ones get a new pool.
+      self.replace_executor(executor)
+      ok, text = False, error_text(error)
+    self.conversions += 1
+    if not ok:
+      self.conversion_errors += 1
+    return ok, text
+
+  def replace_executor(self, broken):
+    if self.owns_executor and self.executor is broken:
+      broken.shutdown(wait=False)
+      self.executor = ProcessPoolExecutor(self.workers)
+
+  async def convert(self, params):
+    source = params.get('source')
+    if type(source) is not str:
+      raise RequestError(INVALID_PARAMS, "'source' must be a string")
+    ok, text = await self.run(source, conversion_options(params))
+    if not ok:
+      raise RequestError(CONVERSION_ERROR, text)
+    return text
+
+  async def convert_batch(self, params):
+    sources = params.get('sources')
+    if type(sources) is not list or not all(type(s) is str for s in sources):
+      raise RequestError(INVALID_PARAMS, "'sources' must be a list of strings")
+    if len(sources) > self.max_batch:
+      raise RequestError(INVALID_PARAMS, 'At most {:d} sources in a batch'.format(self.max_batch))
+    options = conversion_options(params)
+    results = await asyncio.gather(*(self.run(s, options) for s in sources))
+    return '[' + ','.join(
+      '{"result":' + text + '}' if ok else json.dumps({ 'error': text }) for ok, text in results
+    ) + ']'
+
+  async def stats(self, params):
+    return json.dumps(self.stats_dict())
+
+  def stats_dict(self):
+    return {
+      'uptime': time.monotonic() - self.started,
+      'connections': self.connections,
+      'requests': self.requests,
+      'errors': self.errors,
+      'in_flight': self.in_flight,
+      'peak_in_flight': self.peak_in_flight,
+      'max_pending': self.max_pending,
+      'conversions': self.conversions,
+      'conversion_errors': self.conversion_errors,
+      'methods': { name: s.as_dict() for name, s in self.method_stats.items() },
+    }
+
+def error_response(id, code, message):
+  return json.dumps({ 'jsonrpc': '2.0', 'id': id, 'error': { 'code': code, 'message': message } })
+
+async def serve_unix(server, path):
+  unix = await asyncio.start_unix_server(server.handle, path, limit=LINE_LIMIT)
+  async with unix:
+    await unix.serve_forever()
+
+class StdioReader:
+
+  # Blocking reads run in a thread so that stdin may be a pipe, a file or a tty.
+  def __init__(self, stream):
+    self.stream = stream
+
+  async def readline(self):
+    return await asyncio.get_running_loop().run_in_executor(None, self.stream.readline)
+
+class StdioWriter:
+
+  def __init__(self, stream):
+    self.stream = stream
+
+  def write(self, data):
+    self.stream.write(data)
+
+  async def drain(self):
+    self.stream.flush()
+
+  def close(self):
+    self.stream.flush()
+
+async def serve_stdio(server, stdin=None, stdout=None):
+  await server.handle(StdioReader(stdin or sys.stdin.buffer), StdioWriter(stdout or sys.stdout.buffer))
+
+def serve(path=None, workers=None, max_pending=DEFAULT_MAX_PENDING, max_batch=DEFAULT_MAX_BATCH, limits=None):
+  async def main():
+    with Server(workers, max_pending, max_batch, None, limits) as server:
+      if path is None:
+        await serve_stdio(server)
+      else:
+        await serve_unix(server, path)
+  asyncio.run(main())
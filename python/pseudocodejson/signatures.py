@@ -0,0 +1,200 @@
+import sys
+import json
+import struct
+import hashlib
+import weakref
+import uuid
+from array import array
+from collections.abc import Mapping
+from .binary import BinaryFormatError
+
+# Typed signatures map procedure ids to { 'return': type, 'arguments': [(name,
+# type), ...] }. A SignatureCatalog is their frozen form, built once and then
+# shared by conversions in threads and worker processes. Conversions never
+# write into their signatures, the ones inferred from calls go to a
+# SignatureOverlay of the conversion.
+#
+# Binary layout: MAGIC, uint32 counts of strings, signatures and arguments and
+# the byte length of the strings, the NUL separated utf-8 strings, then
+# (id, return, argument count) per signature and (name + 1, type) per argument
+# as uint32 string indexes, a missing name being 0. Integers are little endian.
+
+MAGIC = b'PCSC\x01'
+HEADER = struct.Struct('<IIII')
+
+# Unpickling a catalog in a worker that already has it, for example inherited
+# through fork, returns the existing one instead of another copy.
+SHARED = weakref.WeakValueDictionary()
+
+def signatures_digest(signatures):
+  if isinstance(signatures, SignatureCatalog):
+    return signatures.digest()
+  return hashlib.sha256(json.dumps(signatures, sort_keys=True).encode()).hexdigest()
+
+def frozen_string(s):
+  if type(s) is not str:
+    raise ValueError('Expected a string in signatures, got {!r}'.format(s))
+  return sys.intern(s)
+
+class SignatureCatalog(Mapping):
+
+  __slots__ = ('entries', 'token', 'content_digest', '__weakref__')
+
+  def __init__(self, signatures=None):
+    arguments = {}
+    entries = {}
+    for id, signature in (signatures or {}).items():
+      try:
+        args = tuple(
+          (None if n is None else frozen_string(n), frozen_string(t)) for n, t in signature['arguments']
+        )
+        entries[frozen_string(id)] = (frozen_string(signature['return']), arguments.setdefault(args, args))
+      except (KeyError, TypeError, ValueError):
+        raise ValueError("Invalid signature for '{}'".format(id)) from None
+    self.freeze(entries)
+
+  def freeze(self, entries, token=None):
+    object.__setattr__(self, 'entries', entries)
+    object.__setattr__(self, 'token', token or uuid.uuid4().hex)
+    object.__setattr__(self, 'content_digest', None)
+    SHARED[self.token] = self
+
+  def __getitem__(self, id):
+    ret, args = self.entries[id]
+    return { 'return': ret, 'arguments': list(args) }
+
+  def __contains__(self, id):
+    return id in self.entries
+
+  def __iter__(self):
+    return iter(self.entries)
+
+  def __len__(self):
+    return len(self.entries)
+
+  def __setattr__(self, name, value):
+    raise AttributeError('SignatureCatalog is immutable')
+
+  def __reduce__(self):
+    return (shared_catalog, (self.token, dumps(self)))
+
+  def digest(self):
+    # Equals the digest of the same signatures given as a dict.
+    if self.content_digest is None:
+      object.__setattr__(self, 'content_digest', signatures_digest(self.as_dict()))
+    return self.content_digest
+
+  def as_dict(self):
+    return {
+      id: { 'return': ret, 'arguments': [list(a) for a in args] }
+      for id, (ret, args) in self.entries.items()
+    }
+
+def shared_catalog(token, data):
+  catalog = SHARED.get(token)
+  return catalog if catalog is not None else loads(data, token)
+
+class SignatureOverlay(Mapping):
+
+  # Reads through to the given signatures and keeps its own writes.
+  def __init__(self, base=None):
+    self.base = base if base is not None else {}
+    self.inferred = {}
+
+  def __getitem__(self, id):
+    if id in self.inferred:
+      return self.inferred[id]
+    return self.base[id]
+
+  def __contains__(self, id):
+    return id in self.base or id in self.inferred
+
+  def __setitem__(self, id, signature):
+    self.inferred[id] = signature
+
+  def __iter__(self):
+    yield from self.base
+    yield from (id for id in self.inferred if not id in self.base)
+
+  def __len__(self):
+    return len(self.base) + sum(1 for id in self.inferred if not id in self.base)
+
+def dumps(catalog):
+  if not isinstance(catalog, SignatureCatalog):
+    catalog = SignatureCatalog(catalog)
+  strings = {}
+  def index(s):
+    return strings.setdefault(s, len(strings))
+  signatures = array('I')
+  arguments = array('I')
+  for id, (ret, args) in catalog.entries.items():
+    signatures.extend((index(id), index(ret), len(args)))
+    for name, typ in args:
+      arguments.append(0 if name is None else index(name) + 1)
+      arguments.append(index(typ))
+  if any('\0' in s for s in strings):
+    raise ValueError('Signature strings may not contain NUL')
+  if sys.byteorder == 'big':
+    signatures.byteswap()
+    arguments.byteswap()
+  text = '\0'.join(strings).encode('utf-8', 'surrogatepass')
+  return b''.join((
+    MAGIC, HEADER.pack(len(strings), len(signatures) // 3, len(arguments) // 2, len(text)),
+    text, signatures.tobytes(), arguments.tobytes(),
+  ))
+
+def read_array(data, pos, count):
+  values = array('I')
+  end = pos + count * values.itemsize
+  if end > len(data):
+    raise BinaryFormatError('Truncated signature catalog')
+  values.frombytes(data[pos:end])
+  if sys.byteorder == 'big':
+    values.byteswap()
+  return values, end
+
+def loads(data, token=None):
+  # Accepts the binary form or the JSON of typed signatures.
+  if data[:len(MAGIC)] != MAGIC:
+    return SignatureCatalog(json.loads(data))
+  pos = len(MAGIC)
+  try:
+    string_count, signature_count, argument_count, text_length = HEADER.unpack_from(data, pos)
+  except struct.error:
+    raise BinaryFormatError('Truncated signature catalog') from None
+  pos += HEADER.size
+  text = str(data[pos:pos + text_length], 'utf-8', 'surrogatepass')
+  strings = [sys.intern(s) for s in text.split('\0')] if string_count else []
+  if len(strings) != string_count:
+    raise BinaryFormatError('Signature catalog string count mismatch')
+  signatures, pos = read_array(data, pos + text_length, signature_count * 3)
+  arguments, pos = read_array(data, pos, argument_count * 2)
+  if pos != len(data):
+    raise BinaryFormatError('Signature catalog length mismatch')
+  entries = {}
+  shared_args = {}
+  j = 0
+  try:
+    for i in range(0, len(signatures), 3):
+      end = j + 2 * signatures[i + 2]
+      args = tuple(
+        (strings[arguments[k] - 1] if arguments[k] else None, strings[arguments[k + 1]])
+        for k in range(j, end, 2)
+      )
+      entries[strings[signatures[i]]] = (strings[signatures[i + 1]], shared_args.setdefault(args, args))
+      j = end
+  except IndexError:
+    raise BinaryFormatError('Corrupt signature catalog') from None
+  if j != len(arguments):
+    raise BinaryFormatError('Signature catalog argument count mismatch')
+  catalog = SignatureCatalog.__new__(SignatureCatalog)
+  catalog.freeze(entries, token)
+  return catalog
+
+def load(filename):
+  with open(filename, 'rb') as f:
+    return loads(f.read())
+
+def dump(catalog, filename):
+  with open(filename, 'wb') as f:
+    f.write(dumps(catalog))
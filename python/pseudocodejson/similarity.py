@@ -0,0 +1,127 @@
+import heapq
+import random
+from operator import eq
+from array import array
+from hashlib import blake2b
+
+# Near-duplicate search over pseudocodejson documents. Every node gets a
+# Merkle hash over its own fields and the hashes of its children, with the
+# identifiers of variables and user procedures left out, so renaming does not
+# change it. A document is the set of its node hashes, MinHash signatures
+# estimate the Jaccard similarity of two such sets and an LSH index over
+# signature bands only compares a query with documents sharing a band. With
+# the default 16 bands of 8 rows pairs above a similarity of about 0.7 are
+# likely to share one.
+
+ABSTRACT_KEYS = frozenset(('uuid', 'id', 'variable'))
+MERSENNE_PRIME = (1 << 61) - 1
+DEFAULT_NUM_PERM = 128
+DEFAULT_BANDS = 16
+
+def stable_hash(text):
+  return int.from_bytes(blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=8).digest(), 'big')
+
+def value_hash(value, features):
+  t = type(value)
+  if t is dict:
+    return node_hash(value, features)
+  if t is list:
+    return stable_hash('[{}]'.format(','.join('{:x}'.format(value_hash(v, features)) for v in value)))
+  return stable_hash(repr(value))
+
+def node_hash(node, features):
+  parts = []
+  for key, value in node.items():
+    if key in ABSTRACT_KEYS or (key == 'procedure' and not value.startswith('builtin:')):
+      parts.append(key)
+    elif type(value) is dict or type(value) is list:
+      parts.append('{}:{:x}'.format(key, value_hash(value, features)))
+    else:
+      parts.append('{}={!r}'.format(key, value))
+  h = stable_hash('{' + ';'.join(parts) + '}')
+  features.add(h)
+  return h
+
+def structural_hashes(node):
+  features = set()
+  value_hash(node, features)
+  return features
+
+def document_features(document):
+  features = set()
+  value_hash(document.get('constants', []), features)
+  value_hash(document['procedures'], features)
+  return features
+
+def jaccard(a, b):
+  if not a and not b:
+    return 1.0
+  return len(a & b) / len(a | b)
+
+class SimilarityIndex:
+
+  def __init__(self, num_perm=DEFAULT_NUM_PERM, bands=DEFAULT_BANDS, seed=1):
+    if num_perm % bands != 0:
+      raise ValueError('num_perm must be a multiple of bands')
+    rnd = random.Random(seed)
+    self.num_perm = num_perm
+    self.rows = num_perm // bands
+    self.permutations = [
+      (rnd.randrange(1, MERSENNE_PRIME), rnd.randrange(MERSENNE_PRIME)) for _ in range(num_perm)
+    ]
+    self.buckets = [{} for _ in range(bands)]
+    self.signatures = {}
+
+  def __len__(self):
+    return len(self.signatures)
+
+  def __contains__(self, key):
+    return key in self.signatures
+
+  def signature(self, document):
+    return self.features_signature(document_features(document))
+
+  def features_signature(self, features):
+    if not features:
+      return array('Q', [MERSENNE_PRIME] * self.num_perm)
+    features = list(features)
+    return array('Q', [min([(a * h + b) % MERSENNE_PRIME for h in features]) for a, b in self.permutations])
+
+  def bands(self, signature):
+    rows = self.rows
+    for i in range(len(self.buckets)):
+      yield signature[i * rows:(i + 1) * rows].tobytes()
+
+  def add(self, key, document):
+    self.add_signature(key, self.signature(document))
+
+  def add_signature(self, key, signature):
+    if key in self.signatures:
+      raise ValueError("Key '{}' is already indexed".format(key))
+    if len(signature) != self.num_perm:
+      raise ValueError('Signature length {:d} does not match {:d}'.format(len(signature), self.num_perm))
+    signature = array('Q', signature)
+    self.signatures[key] = signature
+    for buckets, band in zip(self.buckets, self.bands(signature)):
+      bucket = buckets.get(band)
+      if bucket is None:
+        buckets[band] = [key]
+      else:
+        bucket.append(key)
+
+  def query(self, document, k=10, min_similarity=0.0):
+    return self.query_signature(self.signature(document), k, min_similarity)
+
+  def query_signature(self, signature, k=10, min_similarity=0.0):
+    signature = array('Q', signature)
+    candidates = set()
+    for buckets, band in zip(self.buckets, self.bands(signature)):
+      bucket = buckets.get(band)
+      if bucket is not None:
+        candidates.update(bucket)
+    scored = []
+    for key in candidates:
+      similarity = sum(map(eq, signature, self.signatures[key])) / self.num_perm
+      if similarity >= min_similarity:
+        scored.append((similarity, key))
+    return [(key, similarity) for similarity, key in heapq.nlargest(k, scored, key=lambda s: s[0])]
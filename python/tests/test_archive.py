@@ -0,0 +1,130 @@
+import io
+import os
+import sys
+import json
+import tarfile
+import zipfile
+import tempfile
+import unittest
+import subprocess
+from pseudocodejson import src2pseudo, archive
+
+MEMBERS = [
+  ('sub1/a.py', "a = 1\n".encode()),
+  ('sub1/notes.txt', b'not python'),
+  ('sub2/b.py', "# -*- coding: latin-1 -*-\ns = '\xe4'\n".encode('latin-1')),
+  ('sub2/c.py', "\ufeffs = '\u00e4'\n".encode('utf-8')),
+  ('sub3/d.py', b'class A:\n  pass\n'),
+  ('__MACOSX/sub1/._a.py', b'\x00\x05\x16\x07'),
+]
+
+def tar_bytes(members, mode='w:gz'):
+  data = io.BytesIO()
+  with tarfile.open(fileobj=data, mode=mode) as tf:
+    for name, content in members:
+      info = tarfile.TarInfo(name)
+      info.size = len(content)
+      tf.addfile(info, io.BytesIO(content))
+  return data.getvalue()
+
+class TestArchive(unittest.TestCase):
+
+  def setUp(self):
+    self.tmp = tempfile.TemporaryDirectory()
+    self.zip = os.path.join(self.tmp.name, 'subs.zip')
+    with zipfile.ZipFile(self.zip, 'w') as zf:
+      for name, content in MEMBERS:
+        zf.writestr(name, content)
+    self.tar = os.path.join(self.tmp.name, 'subs.tar.gz')
+    with open(self.tar, 'wb') as f:
+      f.write(tar_bytes(MEMBERS))
+
+  def tearDown(self):
+    self.tmp.cleanup()
+
+  def test_members(self):
+    names = ['sub1/a.py', 'sub2/b.py', 'sub2/c.py', 'sub3/d.py']
+    for path in (self.zip, self.tar):
+      self.assertEqual([n for n, _ in archive.read_members(path)], names)
+    self.assertEqual([n for n, _ in archive.read_members(self.zip, 'sub2/*')], ['sub2/b.py', 'sub2/c.py'])
+    # A tar archive streams from a file that cannot seek.
+    class Unseekable(io.RawIOBase):
+      def __init__(self, data):
+        self.data = io.BytesIO(data)
+      def readable(self):
+        return True
+      def readinto(self, b):
+        return self.data.readinto(b)
+    stream = io.BufferedReader(Unseekable(tar_bytes(MEMBERS, 'w:bz2')))
+    self.assertEqual([n for n, _ in archive.read_members(stream, kind='tar:')], names)
+
+  def test_convert(self):
+    records = [archive.convert_source(s, id_strategy='sequential') for s in archive.iter_sources([self.zip])]
+    self.assertEqual([(r['archive'], r['file']) for r in records], [(self.zip, n) for n in (
+      'sub1/a.py', 'sub2/b.py', 'sub2/c.py', 'sub3/d.py')])
+    self.assertEqual(records[0]['result'], src2pseudo("a = 1\n", id_strategy='sequential'))
+    self.assertEqual(records[1]['result'], src2pseudo("s = '\u00e4'\n", id_strategy='sequential'))
+    self.assertEqual(records[2]['result'], records[1]['result'])
+    self.assertIn('ParseUnsupportedError', records[3]['error'])
+    sources = list(archive.iter_sources([self.tar], max_bytes=8))
+    self.assertIn('ResourceLimitError', archive.convert_source(sources[1])['error'])
+
+  def test_jsonl(self):
+    plain = os.path.join(self.tmp.name, 'e.py')
+    with open(plain, 'w') as f:
+      f.write("e = 5\n")
+    out = io.StringIO()
+    count = archive.write_jsonl(out, archive.iter_sources([self.zip, plain, self.tar]), workers=2, chunksize=1)
+    self.assertEqual(count, 9)
+    records = [json.loads(line) for line in out.getvalue().splitlines()]
+    self.assertEqual(records[4], { 'file': plain, 'result': records[4]['result'] })
+    self.assertEqual([r.get('archive') for r in records], [self.zip] * 4 + [None] + [self.tar] * 4)
+    self.assertEqual(['error' in r for r in records], [False, False, False, True, False, False, False, False, True])
+
+  def test_corrupt(self):
+    # The tar breaks off in the data of its second member.
+    broken = os.path.join(self.tmp.name, 'broken.tar')
+    with open(broken, 'wb') as f:
+      f.write(tar_bytes([('a.py', b'a = 1\n' * 200), ('b.py', b'b = 2\n' * 200)], 'w')[:2660])
+    garbage = os.path.join(self.tmp.name, 'garbage.zip')
+    with open(garbage, 'wb') as f:
+      f.write(b'not a zip file')
+    missing = os.path.join(self.tmp.name, 'missing.tar')
+    crc = os.path.join(self.tmp.name, 'crc.zip')
+    with zipfile.ZipFile(crc, 'w') as zf:
+      zf.writestr('a.py', 'a = 1\n')
+      zf.writestr('b.py', 'b = 2\n')
+    with open(crc, 'rb') as f:
+      content = f.read()
+    with open(crc, 'wb') as f:
+      f.write(content.replace(b'a = 1', b'a = 2'))
+    out = io.StringIO()
+    count = archive.write_jsonl(out, archive.iter_sources([broken, garbage, missing, crc, self.zip]), workers=1)
+    self.assertEqual(count, 10)
+    records = [json.loads(line) for line in out.getvalue().splitlines()]
+    self.assertEqual([(r.get('archive'), r['file']) for r in records[:6]], [
+      (broken, 'a.py'), (None, broken), (None, garbage), (None, missing), (crc, 'a.py'), (crc, 'b.py')])
+    self.assertEqual([r.get('error', '').split(':')[0] for r in records[:6]], [
+      '', 'ReadError', 'BadZipFile', 'FileNotFoundError', 'BadZipFile', ''])
+
+  def test_output_archive(self):
+    expected = ['subs.zip/sub1/a.py.json', 'subs.zip/sub2/b.py.json', 'subs.zip/sub2/c.py.json',
+      'subs.zip/sub3/d.py.error']
+    output = os.path.join(self.tmp.name, 'out.zip')
+    self.assertEqual(archive.write_archive(output, archive.iter_sources([self.zip]), workers=1), 4)
+    with zipfile.ZipFile(output) as zf:
+      self.assertEqual(zf.namelist(), expected)
+      self.assertEqual(json.loads(zf.read(expected[0]))['format'], 'pseudocodejson')
+    data = io.BytesIO()
+    archive.write_archive(data, archive.iter_sources([self.zip]), workers=1, kind='tar:gz')
+    with tarfile.open(fileobj=io.BytesIO(data.getvalue())) as tf:
+      self.assertEqual(tf.getnames(), expected)
+    self.assertEqual(archive.entry_name(None, '/../x/./y.py'), 'x/y.py')
+
+  def test_cli(self):
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    out = subprocess.run(
+      [sys.executable, '-m', 'pseudocodejson', 'batch', self.tar, '--pattern', 'sub[13]/*.py', '-j', '1'],
+      env=env, capture_output=True, text=True, check=True
+    ).stdout
+    self.assertEqual([json.loads(line)['file'] for line in out.splitlines()], ['sub1/a.py', 'sub3/d.py'])
@@ -0,0 +1,34 @@
+import os
+import io
+import json
+import tempfile
+import unittest
+from pseudocodejson import batch
+
+class TestBatch(unittest.TestCase):
+
+  def setUp(self):
+    self.tmp = tempfile.TemporaryDirectory()
+    self.files = []
+    for i in range(5):
+      name = os.path.join(self.tmp.name, 'sub{:d}.py'.format(i))
+      with open(name, 'w') as f:
+        f.write("a = {:d}\n".format(i) if i != 3 else "class A:\n  pass\n")
+      self.files.append(name)
+
+  def tearDown(self):
+    self.tmp.cleanup()
+
+  def test_collect(self):
+    self.assertEqual(batch.collect_files([self.tmp.name]), self.files)
+    self.assertEqual(batch.collect_files([os.path.join(self.tmp.name, '*.py')]), self.files)
+
+  def test_jsonl(self):
+    out = io.StringIO()
+    count = batch.write_jsonl(out, self.files, workers=2, chunksize=2)
+    self.assertEqual(count, 5)
+    records = [json.loads(line) for line in out.getvalue().splitlines()]
+    self.assertEqual([r['file'] for r in records], self.files)
+    self.assertIn('error', records[3])
+    self.assertIn('ParseUnsupportedError', records[3]['error'])
+    self.assertEqual(records[4]['result']['format'], 'pseudocodejson')
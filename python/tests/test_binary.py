@@ -0,0 +1,51 @@
+import io
+import json
+import unittest
+from pseudocodejson import src2pseudo, src2pseudo_binary, binary
+from benchmarks.generate import generate_program
+
+SOURCE = generate_program(10, 4)
+
+class TestBinary(unittest.TestCase):
+
+  def assertExact(self, a, b):
+    self.assertEqual(json.dumps(a), json.dumps(b))
+
+  def test_roundtrip(self):
+    for ids in ('uuid', 'sequential', 'hash'):
+      document = src2pseudo(SOURCE, id_strategy=ids, call_graph=True)
+      data = binary.dumps(document)
+      self.assertExact(binary.loads(data), document)
+      self.assertLess(len(data), len(json.dumps(document, separators=(',', ':'))) / 4)
+
+  def test_values(self):
+    value = {
+      'numbers': [0, 31, 32, -1, 2 ** 70, -2 ** 70, 0.1, -2.5, float('inf')],
+      'flags': [True, False, None],
+      'strings': ['', 'é\ud800', '00000000-0000-0000-0000-00000000000A', 'x' * 300],
+      'nested': { 'procedures': 'not a list' },
+    }
+    self.assertExact(binary.loads(binary.dumps(value)), value)
+
+  def test_stream(self):
+    out = io.BytesIO()
+    src2pseudo_binary(SOURCE, out, id_strategy='sequential')
+    document = src2pseudo(SOURCE, id_strategy='sequential')
+    reader = binary.DocumentReader(io.BytesIO(out.getvalue()))
+    self.assertEqual(reader.items_key, 'procedures')
+    self.assertEqual(reader.fields['version'], document['version'])
+    procedures = []
+    for procedure in reader:
+      procedures.append(procedure)
+    self.assertExact(procedures, document['procedures'])
+    self.assertEqual(reader.trailing, {})
+    self.assertExact(binary.loads(out.getvalue()), document)
+
+  def test_corrupt(self):
+    data = binary.dumps(src2pseudo(SOURCE))
+    with self.assertRaises(binary.BinaryFormatError):
+      binary.loads(b'JSON' + data[4:])
+    with self.assertRaises(binary.BinaryFormatError):
+      binary.loads(data[:len(data) // 2])
+    with self.assertRaises(binary.BinaryFormatError):
+      binary.DocumentReader(io.BytesIO(data[:len(data) // 2])).read()
@@ -0,0 +1,62 @@
+import os
+import tempfile
+import unittest
+from pseudocodejson import src2pseudo, ResultCache, ParseUnsupportedError, UnsupportedConstructsError
+
+class TestCache(unittest.TestCase):
+
+  def test_memory(self):
+    cache = ResultCache(maxsize=2)
+    first = src2pseudo("a = 1\n", cache=cache)
+    second = src2pseudo("a = 1\n", cache=cache)
+    self.assertEqual(first, second)
+    self.assertIsNot(first, second)
+    self.assertEqual((cache.hits, cache.misses), (1, 1))
+    src2pseudo("a = 2\n", cache=cache)
+    src2pseudo("a = 3\n", cache=cache)
+    self.assertEqual(len(cache.memory), 2)
+
+  def test_options_in_key(self):
+    cache = ResultCache()
+    src = "def f():\n  return 1\n"
+    self.assertEqual(len(src2pseudo(src, cache=cache)['procedures']), 1)
+    self.assertEqual(len(src2pseudo(src, {}, True, cache=cache)['procedures']), 0)
+    self.assertEqual(cache.hits, 0)
+
+  def test_errors(self):
+    cache = ResultCache()
+    for _ in range(2):
+      with self.assertRaises(ParseUnsupportedError):
+        src2pseudo("class A:\n  pass\n", cache=cache)
+    self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+  def test_screen_errors(self):
+    cache = ResultCache()
+    src = "class A:\n  pass\nx = [i for i in y]\n"
+    with self.assertRaises(ParseUnsupportedError) as plain:
+      src2pseudo(src, cache=cache)
+    for _ in range(2):
+      with self.assertRaises(UnsupportedConstructsError) as screened:
+        src2pseudo(src, cache=cache, screen=True)
+      self.assertEqual(len(screened.exception.issues), 2)
+    self.assertNotIsInstance(plain.exception, UnsupportedConstructsError)
+    self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+  def test_disk_rewrite(self):
+    with tempfile.TemporaryDirectory() as tmp:
+      cache = ResultCache(maxsize=0, directory=tmp)
+      for _ in range(3):
+        cache.put('ab' * 32, '{"result": 1}')
+      self.assertEqual(cache.disk_bytes, sum(size for _, _, size in cache.disk_entries()))
+
+  def test_disk(self):
+    with tempfile.TemporaryDirectory() as tmp:
+      first = src2pseudo("a = 1\n", cache=ResultCache(directory=tmp))
+      cache = ResultCache(directory=tmp)
+      self.assertEqual(src2pseudo("a = 1\n", cache=cache), first)
+      self.assertEqual(cache.hits, 1)
+      small = ResultCache(maxsize=0, directory=tmp, max_bytes=1000)
+      for i in range(20):
+        src2pseudo("a = {:d}\n".format(i), cache=small)
+      total = sum(size for _, _, size in small.disk_entries())
+      self.assertLessEqual(total, 1000)
@@ -0,0 +1,37 @@
+import unittest
+from pseudocodejson import src2pseudo
+
+SOURCE = """
+def main():
+  def g():
+    return 1
+  if True:
+    x = g()
+  return x
+
+def f(a):
+  return main() + a
+
+y = f(2)
+"""
+
+SIGNATURES = { 'main': { 'arguments': [], 'return': 'int' } }
+
+class TestCallGraph(unittest.TestCase):
+
+  def test_call_graph(self):
+    pseudo = src2pseudo(SOURCE, id_strategy='sequential', call_graph=True)
+    uuids = { p['id']: p['uuid'] for p in pseudo['procedures'] }
+    self.assertEqual(pseudo['call_graph'], {
+      uuids[None]: [uuids['f']],
+      uuids['main']: [uuids['g']],
+      uuids['f']: [uuids['main']],
+    })
+
+  def test_optional(self):
+    self.assertNotIn('call_graph', src2pseudo(SOURCE))
+
+  def test_nested_required(self):
+    pseudo = src2pseudo(SOURCE, dict(SIGNATURES), True, id_strategy='sequential', call_graph=True)
+    self.assertEqual([p['id'] for p in pseudo['procedures']], ['main', 'g'])
+    self.assertEqual(pseudo['call_graph'], { '1': ['3'] })
@@ -0,0 +1,75 @@
+import io
+import sys
+import json
+import unittest
+from pseudocodejson import src2pseudo, src2pseudo_stream, binary, node_classes
+from pseudocodejson.json_stream import dumps
+
+def chain(op, terms):
+  return 'x = 1\ny = ' + ' {} '.format(op).join(['x'] * terms) + '\n'
+
+def expression(src, emission='finalize'):
+  return src2pseudo(src, id_strategy='sequential', emission=emission)['procedures'][0]['body'][-1]['expression']
+
+def right_depth(node, key):
+  depth = 0
+  while node['Expression'] == 'Binary Op':
+    node = node[key]
+    depth += 1
+  return depth
+
+class Deep:
+  # json.loads and comparing the results recurse, checking output needs the room.
+
+  def __enter__(self):
+    self.limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(20 * self.limit)
+
+  def __exit__(self, *exc):
+    sys.setrecursionlimit(self.limit)
+
+class TestDeep(unittest.TestCase):
+
+  def test_long_chains(self):
+    terms = 2 * sys.getrecursionlimit()
+    for emission in ('finalize', 'direct'):
+      e = expression(chain('and', terms), emission)
+      self.assertEqual((e['op'], right_depth(e, 'right')), ('and', terms - 1))
+      e = expression(chain('<', terms), emission)
+      self.assertEqual((e['op'], e['left']['op']), ('and', 'smaller'))
+      self.assertEqual(right_depth(e, 'right'), terms - 1)
+      e = expression(chain('+', terms), emission)
+      self.assertEqual((e['op'], right_depth(e, 'left')), ('add', terms - 1))
+
+  def test_serialize(self):
+    src = chain('and', 2 * sys.getrecursionlimit())
+    expected = src2pseudo(src, id_strategy='sequential', emission='direct')
+    outputs = []
+    for indent in (None, 2):
+      out = io.StringIO()
+      src2pseudo_stream(src, out, id_strategy='sequential', emission='direct', indent=indent)
+      outputs += [out.getvalue(), dumps(expected, indent)]
+    decoded = binary.loads(binary.dumps(expected))
+    converted = node_classes.to_json(node_classes.from_json(expected))
+    with Deep():
+      for text in outputs:
+        self.assertEqual(json.loads(text), expected)
+      self.assertEqual(decoded, expected)
+      self.assertEqual(converted, expected)
+
+  def test_unary_chain(self):
+    e = expression('x = 1\ny = ' + '-' * 1500 + 'x\n')
+    for _ in range(1500):
+      self.assertEqual((e['Expression'], e['op']), ('Unary Op', 'minus'))
+      e = e['expression']
+    self.assertEqual(e['Expression'], 'Variable')
+
+  def test_small_chains(self):
+    e = expression('x = 1\ny = x and x and not x\n')
+    self.assertEqual(e['right']['right']['op'], 'not')
+    e = expression('x = 1\ny = 0 <= x < 2\n')
+    self.assertEqual(e['left']['right'], { 'Expression': 'Variable', 'variable': '1' })
+    self.assertEqual(e['right']['left'], e['left']['right'])
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,38 @@
+import json
+import unittest
+from pseudocodejson import src2pseudo
+
+SOURCE = """
+def bubblesort(a):
+  changes = True
+  while changes:
+    changes = False
+    for i in range(len(a) - 1, 0, -1):
+      if a[i] < a[i - 1] and not i == 0:
+        a[i] = a[i - 1]
+        a[i - 1] = a[i]
+        changes = True
+  return a
+
+def unused():
+  return 1.5 / 2
+
+print(bubblesort(None))
+"""
+SIGNATURES = { 'bubblesort': { 'return': 'int[]', 'arguments': [('a', 'int[]')] } }
+
+class TestEmission(unittest.TestCase):
+
+  def convert(self, emission, signatures=None, exclude=False):
+    return json.dumps(src2pseudo(SOURCE, signatures, exclude, id_strategy='sequential', emission=emission))
+
+  def test_direct_matches_finalize(self):
+    self.assertEqual(self.convert('direct'), self.convert('finalize'))
+    self.assertEqual(
+      self.convert('direct', dict(SIGNATURES), True),
+      self.convert('finalize', dict(SIGNATURES), True)
+    )
+
+  def test_unknown(self):
+    with self.assertRaises(ValueError):
+      self.convert('lazy')
@@ -0,0 +1,103 @@
+import io
+import json
+import unittest
+from pseudocodejson import src2pseudo
+from pseudocodejson.emit import pseudo2src, write_sources
+from benchmarks.generate import generate_program
+
+SOURCE = """
+def bubblesort(a):
+  changes = True
+  while changes:
+    changes = False
+    for i in range(1, len(a)):
+      if a[i] < a[i - 1]:
+        t = a[i]
+        a[i] = a[i - 1]
+        a[i - 1] = t
+        changes = True
+  return a
+
+def mix(n):
+  t = -n // 3 % 2
+  if (n < 3) == (t > 0) and not n == 5:
+    return -(n - t) * (n + 1) / 2
+  elif n > 10:
+    return (abs(n) + round(n / 4)) / 2
+  return (int(2.5) - -n) / 1
+
+x = mix(7) + mix(2) + mix(11)
+"""
+
+JAVA = """public class Sample {
+
+    public static int half(int n) {
+        int h = 0;
+        h = Math.floorDiv(n, 2);
+        if (h > 3 && !java.util.Objects.equals(n, null)) {
+            return h;
+        } else if (h < 0) {
+            return -(-h);
+        }
+        return (int) Math.rint((double) n / 3);
+    }
+
+    public static void main(String[] args) {
+        half(4);
+    }
+}
+"""
+
+SIGNATURES = { 'half': { 'arguments': [('n', 'int')], 'return': 'int' } }
+
+def run(src):
+  scope = {}
+  exec(src, scope)
+  return scope
+
+class TestEmit(unittest.TestCase):
+
+  def test_python_roundtrip(self):
+    emitted = run(pseudo2src(src2pseudo(SOURCE)))
+    self.assertEqual(emitted['x'], run(SOURCE)['x'])
+    self.assertEqual(emitted['bubblesort']([3, 1, 2]), [1, 2, 3])
+    program = generate_program(20, 5, 1, 3, 2)
+    self.assertEqual(run(pseudo2src(src2pseudo(program)))['x'], run(program)['x'])
+
+  def test_python_text(self):
+    emitted = pseudo2src(src2pseudo(SOURCE))
+    self.assertIn('    if (n < 3) == (t > 0) and not n == 5:\n', emitted)
+    self.assertIn('    elif n > 10:\n', emitted)
+    self.assertIn('    return (int(2.5) - -n) / 1\n', emitted)
+
+  def test_java(self):
+    src = """
+def half(n):
+  h = n // 2
+  if h > 3 and n != None:
+    return h
+  elif h < 0:
+    return -(-h)
+  return round(n / 3)
+
+half(4)
+"""
+    self.assertEqual(pseudo2src(src2pseudo(src, SIGNATURES), 'java', class_name='Sample'), JAVA)
+
+  def test_unknown_language(self):
+    with self.assertRaises(ValueError):
+      pseudo2src(src2pseudo(SOURCE), 'cobol')
+
+  def test_batch(self):
+    lines = [
+      json.dumps({ 'file': 'a.py', 'result': src2pseudo(SOURCE) }),
+      json.dumps({ 'file': 'b.py', 'error': 'ParseError: broken' }),
+      json.dumps(src2pseudo('z = 1')),
+    ]
+    out = io.StringIO()
+    self.assertEqual(write_sources(out, lines, 'java', 1), 3)
+    records = [json.loads(l) for l in out.getvalue().splitlines()]
+    self.assertEqual([r['file'] for r in records], ['a.py', 'b.py', None])
+    self.assertIn('public static Object bubblesort(Object a)', records[0]['source'])
+    self.assertEqual(records[1]['error'], 'ParseError: broken')
+    self.assertIn('z = 1;', records[2]['source'])
@@ -0,0 +1,82 @@
+import unittest
+from pseudocodejson import src2pseudo
+from pseudocodejson.execute import compile_module, ExecutionError, StepLimitError
+from benchmarks.generate import generate_program
+
+SOURCE = """
+def bubblesort(a):
+  changes = True
+  while changes:
+    changes = False
+    for i in range(1, len(a)):
+      if a[i] < a[i - 1]:
+        t = a[i]
+        a[i] = a[i - 1]
+        a[i - 1] = t
+        changes = True
+  return a
+
+def fib(n):
+  if n < 2:
+    return n
+  return fib(n - 1) + fib(n - 2)
+
+def scaled(n):
+  return abs(n - limit) + int(n / 3) + round(2.5) + round(n / 2)
+
+def spin():
+  while True:
+    continue
+
+def divide(n):
+  return 1 // n
+
+limit = 10
+total = 0
+for i in range(5, 0, -1):
+  if i == 2:
+    break
+  total += scaled(i)
+"""
+
+class TestExecute(unittest.TestCase):
+
+  def setUp(self):
+    self.module = compile_module(src2pseudo(SOURCE))
+
+  def test_run(self):
+    expected = {}
+    exec(SOURCE, expected)
+    variables = self.module.run()
+    self.assertEqual(variables, { k: expected[k] for k in ('limit', 'total', 'i') })
+    self.assertEqual(self.module.run(), variables)
+
+  def test_generated(self):
+    src = generate_program(20, 5, 3, 3, 2)
+    expected = {}
+    exec(src, expected)
+    self.assertEqual(compile_module(src2pseudo(src)).run()['x'], expected['x'])
+
+  def test_call(self):
+    self.assertEqual(self.module.call('bubblesort', [4, 2, 3, 1]), [1, 2, 3, 4])
+    self.assertEqual(self.module.call('fib', 15), 610)
+    self.module.run()
+    self.assertEqual(self.module.call('scaled', 7), 3 + 2 + 2 + 4)
+
+  def test_step_limit(self):
+    with self.assertRaises(StepLimitError):
+      self.module.call('spin', max_steps=1000)
+    self.assertEqual(self.module.steps_used(), 1001)
+    with self.assertRaises(StepLimitError):
+      self.module.call('fib', 20, max_steps=100)
+    self.module.call('fib', 10, max_steps=200)
+
+  def test_errors(self):
+    with self.assertRaises(ExecutionError):
+      self.module.call('divide', 0)
+    with self.assertRaises(ExecutionError):
+      self.module.call('fib')
+    with self.assertRaises(ExecutionError):
+      self.module.call('missing')
+    with self.assertRaises(ExecutionError):
+      self.module.call('fib', 100000)
@@ -0,0 +1,63 @@
+import json
+import unittest
+from pseudocodejson import src2pseudo
+from benchmarks.generate import generate_program
+
+SOURCE = """
+a = 0
+b = 10
+while a < b and not a == 3:
+  a += 1
+for i in range(10, 0, -2):
+  print(i + 1, i + 1, -i, -i)
+for j in range(10, 0, -2):
+  pass
+def g(c):
+  c[0] = c[0] + c[0] * 2.0
+  c[1] = 1 + 1.0
+  return len(c) + len(c)
+s = "x" + "x"
+print(g(None), s)
+"""
+
+def count_shared(node, seen, shared):
+  if type(node) is dict:
+    if id(node) in seen:
+      shared[0] += 1
+    seen.add(id(node))
+    for v in node.values():
+      count_shared(v, seen, shared)
+  elif type(node) is list:
+    for v in node:
+      count_shared(v, seen, shared)
+  return shared[0]
+
+class TestHashCons(unittest.TestCase):
+
+  def convert(self, src, emission, hash_cons, exclude=False):
+    return src2pseudo(src, None, exclude, id_strategy='sequential', emission=emission, hash_cons=hash_cons)
+
+  def test_output_unchanged(self):
+    for src in (SOURCE, generate_program(30, 5, seed=3)):
+      for emission in ('finalize', 'direct'):
+        for exclude in (False, True):
+          self.assertEqual(
+            json.dumps(self.convert(src, emission, True, exclude)),
+            json.dumps(self.convert(src, emission, False, exclude))
+          )
+
+  def test_nodes_shared(self):
+    self.assertGreater(count_shared(self.convert(SOURCE, 'direct', True), set(), [0]), 0)
+    self.assertEqual(count_shared(self.convert(SOURCE, 'direct', False), set(), [0]), 0)
+    self.assertGreater(count_shared(self.convert(SOURCE, 'finalize', True), set(), [0]), 0)
+
+  def test_equal_values_of_other_type(self):
+    document = self.convert(SOURCE, 'direct', True)
+    g = next(p for p in document['procedures'] if p['id'] == 'g')
+    add = g['body'][1]['expression']
+    self.assertIsNot(add['left'], add['right'])
+    self.assertEqual(add['left']['type'], 'int')
+    self.assertEqual(add['right']['type'], 'double')
+
+if __name__ == '__main__':
+  unittest.main()
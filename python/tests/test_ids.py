@@ -0,0 +1,36 @@
+import unittest
+from pseudocodejson import src2pseudo
+
+SOURCE = """
+def double(a):
+  b = 2 * a
+  return b
+
+def double(a):
+  return a + a
+
+x = double(2)
+"""
+
+class TestIds(unittest.TestCase):
+
+  def test_sequential(self):
+    pseudo = src2pseudo(SOURCE, id_strategy='sequential')
+    self.assertEqual([p['uuid'] for p in pseudo['procedures']], ['1', '2', '7'])
+    self.assertEqual(pseudo['procedures'][0]['parameters'][0]['uuid'], '4')
+    self.assertEqual(pseudo, src2pseudo(SOURCE, id_strategy='sequential'))
+
+  def test_hash(self):
+    pseudo = src2pseudo(SOURCE, id_strategy='hash')
+    self.assertEqual(pseudo, src2pseudo(SOURCE, id_strategy='hash'))
+    ids = [p['uuid'] for p in pseudo['procedures']]
+    self.assertEqual(len(set(ids)), 3)
+    self.assertTrue(all(len(i) == 16 for i in ids))
+
+  def test_uuid_default(self):
+    pseudo = src2pseudo(SOURCE)
+    self.assertEqual(len(pseudo['procedures'][0]['uuid']), 36)
+
+  def test_unknown(self):
+    with self.assertRaises(ValueError):
+      src2pseudo(SOURCE, id_strategy='random')
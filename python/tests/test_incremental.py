@@ -0,0 +1,57 @@
+import unittest
+from pseudocodejson import src2pseudo
+from pseudocodejson.incremental import src2pseudo_incremental
+
+SOURCE = """
+def square(x):
+  return x * x
+
+def area(w, h):
+  return w * h
+
+def total(n):
+  s = 0
+  for i in range(n):
+    s += square(i)
+    t = area(i, 2)
+  return s
+
+print(total(10))
+"""
+
+class TestIncremental(unittest.TestCase):
+
+  def check(self, src, previous=None):
+    result = src2pseudo_incremental(src, previous)
+    self.assertEqual(result.pseudo, src2pseudo(src, id_strategy='hash'))
+    return result
+
+  def names(self, result, uuids):
+    ids = { p['uuid']: p['id'] for p in result.pseudo['procedures'] }
+    return sorted(ids[u] for u in uuids)
+
+  def test_unchanged(self):
+    first = self.check(SOURCE)
+    self.assertEqual(self.names(first, first.parsed), ['area', 'square', 'total'])
+    second = self.check(SOURCE, first)
+    self.assertEqual(second.parsed, [])
+    self.assertEqual(second.pseudo['procedures'][0], first.pseudo['procedures'][0])
+
+  def test_body_edit(self):
+    first = self.check(SOURCE)
+    second = self.check(SOURCE.replace('w * h', 'h * w'), first)
+    self.assertEqual(self.names(second, second.parsed), ['area'])
+    self.assertEqual(self.names(second, second.reused), ['square', 'total'])
+
+  def test_signature_change(self):
+    first = self.check(SOURCE)
+    second = self.check(SOURCE.replace('return w * h', 'return 1.5'), first)
+    self.assertEqual(self.names(second, second.parsed), ['area', 'total'])
+
+  def test_argument_types(self):
+    # Signatures are inferred from the first parsed call, so only callees parsed later change.
+    src = SOURCE.replace('def square(x):\n  return x * x\n', '') + 'def square(x):\n  return x * x\n'
+    first = self.check(src)
+    second = self.check(src.replace('square(i)', 'square(1.5)'), first)
+    self.assertEqual(self.names(second, second.parsed), ['square', 'total'])
+    self.assertEqual(self.names(second, second.reused), ['area'])
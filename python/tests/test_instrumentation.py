@@ -0,0 +1,67 @@
+import io
+import unittest
+from pseudocodejson import src2pseudo, src2pseudo_stream, Collector, Limits, ResourceLimitError
+
+SOURCE = """
+def double(a):
+  return 2 * a
+
+def unused(a):
+  return a
+
+x = double(2)
+if x > 2:
+  x = x - 1
+"""
+
+SIGNATURES = { 'double': { 'arguments': [('a', 'int')], 'return': 'int' } }
+
+class TestInstrumentation(unittest.TestCase):
+
+  def test_same_output(self):
+    collector = Collector()
+    pseudo = src2pseudo(SOURCE, id_strategy='sequential', collector=collector)
+    self.assertEqual(pseudo, src2pseudo(SOURCE, id_strategy='sequential'))
+    self.assertEqual(set(collector.phases), { 'ast_parse', 'parse', 'finalize' })
+    self.assertEqual(collector.conversions, 1)
+
+  def test_counts(self):
+    collector = Collector()
+    src2pseudo(SOURCE, collector=collector)
+    stats = collector.as_dict()
+    self.assertEqual(stats['nodes']['If']['count'], 1)
+    self.assertEqual(stats['nodes']['Assign']['count'], 2)
+    self.assertEqual(stats['nodes']['BinOp']['count'], 2)
+    self.assertEqual(stats['function_lookups'], 1)
+    self.assertEqual(stats['procedures'], 2)
+    self.assertEqual(stats['deferred_rounds'], 1)
+    for stat in stats['nodes'].values():
+      self.assertLessEqual(stat['self_seconds'], stat['seconds'])
+
+  def test_chain_counts(self):
+    # Chains convert in one dispatch and still count every node.
+    src = 'a = 1\nb = a + a + a + a + a\nc = - - -a\n'
+    collector = Collector()
+    src2pseudo(src, collector=collector)
+    self.assertEqual(collector.nodes['BinOp'][0], 4)
+    self.assertEqual(collector.nodes['UnaryOp'][0], 3)
+    limited = 'a = 1\nb = ' + ' + '.join(['a'] * 100) + '\n'
+    with self.assertRaises(ResourceLimitError) as cm:
+      src2pseudo(limited, limits=Limits(max_ast_nodes=50))
+    self.assertEqual(cm.exception.limit, 'max_ast_nodes')
+
+  def test_exclude_others(self):
+    collector = Collector()
+    src2pseudo(SOURCE, dict(SIGNATURES), True, collector=collector)
+    self.assertEqual(collector.procedures, 1)
+    self.assertEqual(collector.deferred_procedures, 1)
+
+  def test_merge(self):
+    a, b = Collector(), Collector()
+    src2pseudo(SOURCE, collector=a)
+    src2pseudo_stream(SOURCE, io.StringIO(), collector=b)
+    self.assertIn('write', b.phases)
+    total = Collector().merge(a).merge(b)
+    self.assertEqual(total.conversions, 2)
+    self.assertEqual(total.nodes['If'][0], 2)
+    self.assertEqual(total.lookups, a.lookups + b.lookups)
@@ -0,0 +1,28 @@
+import io
+import json
+import unittest
+from pseudocodejson import src2pseudo, src2pseudo_stream
+
+SOURCE = """
+def a():
+  return 1
+def b(x):
+  return a() + x
+print(b(2))
+"""
+
+class TestJsonStream(unittest.TestCase):
+
+  def stream(self, src, indent, exclude=False):
+    out = io.StringIO()
+    signatures = { 'b': { 'return': 'int', 'arguments': [] } } if exclude else None
+    src2pseudo_stream(src, out, signatures, exclude, 'sequential', 'direct', indent)
+    return out.getvalue()
+
+  def test_matches_dumps(self):
+    for src in (SOURCE, '', 'import os\n'):
+      for exclude in (False, True):
+        signatures = { 'b': { 'return': 'int', 'arguments': [] } } if exclude else None
+        pseudo = src2pseudo(src, signatures, exclude, id_strategy='sequential')
+        self.assertEqual(self.stream(src, 2, exclude), json.dumps(pseudo, indent=2))
+        self.assertEqual(self.stream(src, None, exclude), json.dumps(pseudo, separators=(',', ':')))
@@ -0,0 +1,78 @@
+import pickle
+import unittest
+from pseudocodejson import src2pseudo, Limits, ResourceLimitError
+from pseudocodejson.ParseState import ParseState
+from pseudocodejson.server import convert_source
+from benchmarks.generate import generate_program
+
+SOURCE = generate_program(20, 4)
+
+def convert(limits, src=SOURCE, emission='finalize'):
+  return src2pseudo(src, id_strategy='sequential', emission=emission, limits=limits)
+
+class TestLimits(unittest.TestCase):
+
+  def assertExceeds(self, limit, limits, src=SOURCE):
+    with self.assertRaises(ResourceLimitError) as cm:
+      convert(limits, src)
+    self.assertEqual(cm.exception.limit, limit)
+    self.assertEqual(cm.exception.value, getattr(limits, limit))
+    return cm.exception.stats
+
+  def test_generous_limits_keep_output(self):
+    limits = Limits(10 ** 6, 10 ** 6, 1000, 1000, 60.0)
+    for emission in ('finalize', 'direct'):
+      self.assertEqual(convert(limits, emission=emission), convert(None, emission=emission))
+
+  def test_ast_nodes(self):
+    stats = self.assertExceeds('max_ast_nodes', Limits(max_ast_nodes=50))
+    self.assertEqual(stats['ast_nodes'], 51)
+
+  def test_output_nodes(self):
+    # Output is counted per procedure, so the count passes the limit by at most one procedure.
+    stats = self.assertExceeds('max_output_nodes', Limits(max_output_nodes=100))
+    self.assertGreater(stats['output_nodes'], 100)
+    self.assertLess(stats['output_nodes'], 200)
+
+  def test_depth(self):
+    src = 'def f(a):\n' + ''.join('{}if a:\n'.format('  ' * (i + 1)) for i in range(15)) + '  ' * 16 + 'a = 1\n'
+    self.assertEqual(convert(Limits(max_depth=40), src), convert(None, src))
+    stats = self.assertExceeds('max_depth', Limits(max_depth=10), src)
+    self.assertEqual(stats['depth'], 11)
+
+  def test_depth_of_flat_assignments(self):
+    # Each new name is found through a MissingNameError that must not keep its depth.
+    src = ''.join('v{:d} = {:d}\n'.format(i, i) for i in range(50))
+    self.assertEqual(convert(Limits(max_depth=3), src), convert(None, src))
+    self.assertEqual(convert(Limits(max_depth=100), generate_program(60, 4)), convert(None, generate_program(60, 4)))
+
+  def test_procedures(self):
+    convert(Limits(max_procedures=20))
+    stats = self.assertExceeds('max_procedures', Limits(max_procedures=19))
+    self.assertEqual(stats['procedures'], 20)
+
+  def test_seconds(self):
+    stats = self.assertExceeds('max_seconds', Limits(max_seconds=0.0))
+    self.assertGreater(stats['ast_nodes'], 0)
+
+  def test_error_pickles(self):
+    try:
+      convert(Limits(max_output_nodes=10))
+    except ResourceLimitError as error:
+      copy = pickle.loads(pickle.dumps(error))
+      self.assertEqual((copy.limit, copy.value, copy.stats), (error.limit, error.value, error.stats))
+      self.assertEqual(str(copy), str(error))
+
+  def test_no_wrappers(self):
+    state = ParseState()
+    self.assertIsNone(state.budget)
+    limited = ParseState(limits=Limits(10, 10, 10, 10, 1.0))
+    self.assertIsNotNone(limited.budget)
+    self.assertIs(limited.expression_handlers, state.expression_handlers)
+    self.assertIs(limited.statement_handlers, state.statement_handlers)
+    self.assertIs(limited.nodes, state.nodes)
+
+  def test_server_conversion(self):
+    ok, text = convert_source(SOURCE, limits=Limits(max_procedures=1))
+    self.assertFalse(ok)
+    self.assertIn('max_procedures', text)
@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+from pseudocodejson import src2pseudo, metrics
+
+SOURCE = """
+def f(a, n):
+  s = 0
+  for i in range(n):
+    for j in range(n):
+      if a[i] > 0 and a[j] < 0 or i == j:
+        s += abs(a[i])
+      elif i < 0:
+        break
+  return s
+
+def g():
+  return len(x)
+
+x = None
+y = f(None, 2) + g()
+"""
+
+class TestMetrics(unittest.TestCase):
+
+  def metric(self, row, name):
+    return row[metrics.COLUMN_INDEX[name]]
+
+  def test_document(self):
+    row = metrics.document_metrics(src2pseudo(SOURCE))
+    self.assertEqual(len(row), len(metrics.COLUMNS))
+    self.assertEqual(self.metric(row, 'procedures'), 2)
+    self.assertEqual(self.metric(row, 'max_loop_depth'), 2)
+    self.assertEqual(self.metric(row, 'max_selection_depth'), 2)
+    self.assertEqual(self.metric(row, 'cyclomatic'), 9)
+    self.assertEqual(self.metric(row, 'max_cyclomatic'), 7)
+    self.assertEqual(self.metric(row, 'builtin_calls'), 1)
+    self.assertEqual(self.metric(row, 'statement:Loop'), 2)
+    self.assertEqual(self.metric(row, 'statement:Call'), 0)
+    self.assertEqual(self.metric(row, 'expression:Call'), 3)
+    self.assertEqual(self.metric(row, 'op:or'), 1)
+
+  def test_corpus(self):
+    with tempfile.TemporaryDirectory() as tmp:
+      files = []
+      for i, src in enumerate((SOURCE, "class A:\n  pass\n", "a = 1 + 2\n")):
+        name = os.path.join(tmp, 'sub{:d}.py'.format(i))
+        with open(name, 'w') as f:
+          f.write(src)
+        files.append(name)
+      matrix, errors = metrics.corpus_metrics(files, workers=2, chunksize=1)
+    self.assertEqual([e['file'] for e in errors], files[1:2])
+    self.assertEqual(list(matrix[0]), metrics.document_metrics(src2pseudo(SOURCE)))
+    self.assertEqual(sum(matrix[1]), 0)
+    self.assertEqual(self.metric(matrix[2], 'op:add'), 1)
+
+  def test_pure_python_rows(self):
+    numpy = metrics.numpy
+    metrics.numpy = None
+    try:
+      matrix = metrics.metrics_matrix([src2pseudo(SOURCE)] * 2)
+    finally:
+      metrics.numpy = numpy
+    self.assertEqual(type(matrix), list)
+    self.assertEqual(matrix[0], matrix[1])
+
+  @unittest.skipIf(metrics.numpy is None, 'numpy is not installed')
+  def test_numpy_matrix(self):
+    matrix = metrics.metrics_matrix([src2pseudo(SOURCE)] * 2)
+    self.assertEqual(matrix.shape, (2, len(metrics.COLUMNS)))
+    self.assertEqual(list(matrix[0]), metrics.document_metrics(src2pseudo(SOURCE)))
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+from pseudocodejson import src2pseudo, node_classes as n
+
+SOURCE = """
+def bubblesort(a):
+  changes = True
+  while changes:
+    changes = False
+    for i in range(1, len(a)):
+      if a[i] < a[i - 1] or not changes:
+        a[i] = a[i - 1]
+        a[i - 1] = a[i]
+        changes = True
+        break
+      else:
+        continue
+  return a
+
+x = abs(-2) / 3
+print(bubblesort(None))
+"""
+
+class TestNodeClasses(unittest.TestCase):
+
+  def test_round_trip(self):
+    pseudo = src2pseudo(SOURCE, { 'bubblesort': { 'return': 'int[]', 'arguments': [('a', 'int[]')] } })
+    module = n.from_json(pseudo)
+    self.assertIsInstance(module, n.Module)
+    self.assertIsInstance(module.procedures[0], n.Procedure)
+    self.assertTrue(module.procedures[0].array)
+    self.assertEqual(module.to_json(), pseudo)
+
+  def test_form(self):
+    module = src2pseudo(SOURCE, id_strategy='sequential', form='nodes')
+    self.assertEqual(module.to_json(), src2pseudo(SOURCE, id_strategy='sequential'))
+    variable = module.procedures[0].parameters[0]
+    self.assertFalse(hasattr(variable, '__dict__'))
+    self.assertIs(variable.uuid, n.from_json(variable.to_json()).uuid)
+
+  def test_call_graph(self):
+    module = src2pseudo(SOURCE, id_strategy='sequential', form='nodes', call_graph=True)
+    pseudo = src2pseudo(SOURCE, id_strategy='sequential', call_graph=True)
+    self.assertEqual(module.call_graph, pseudo['call_graph'])
+    self.assertEqual(module.to_json(), pseudo)
+    self.assertIsNone(src2pseudo(SOURCE, form='nodes').call_graph)
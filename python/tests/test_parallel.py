@@ -0,0 +1,161 @@
+import os
+import sys
+import tempfile
+import unittest
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from pseudocodejson import src2pseudo, SignatureCatalog, ParseUnsupportedError
+from pseudocodejson.parallel import src2pseudo_parallel, ParallelParseState
+from pseudocodejson.parse_module import parse_into_state
+from pseudocodejson.json_stream import dumps
+from benchmarks.generate import generate_program
+import ast
+
+SOURCE = """
+def first(n):
+  s = 0
+  for i in range(n):
+    s += second(i, 2.5)
+  return s
+
+def second(a, b):
+  return a * b
+
+def third(x):
+  return first(x) + second(x, 1.0)
+
+def outer(n):
+  def inner(k):
+    return k + 1
+  return inner(n)
+
+count = 0
+
+def bump(n):
+  count = n
+  return count
+
+def twice(a):
+  return a + a
+
+def twice(a):
+  return a * 2
+
+def fact(n):
+  if n < 2:
+    return 1
+  return n * fact(n - 1)
+
+print(third(3))
+print(twice(outer(fact(4))))
+"""
+
+def canonical_uuids(node, names=None):
+  # Uuid ids are random, they are renamed in the order of appearance.
+  names = {} if names is None else names
+  if type(node) is list:
+    return [canonical_uuids(n, names) for n in node]
+  if type(node) is dict:
+    return {
+      k: names.setdefault(v, str(len(names))) if k in ('uuid', 'variable', 'procedure') and type(v) is str
+        and not v.startswith('builtin:') else canonical_uuids(v, names)
+      for k, v in node.items()
+    }
+  return node
+
+class TestParallel(unittest.TestCase):
+
+  @classmethod
+  def setUpClass(cls):
+    cls.executor = ThreadPoolExecutor(3)
+
+  @classmethod
+  def tearDownClass(cls):
+    cls.executor.shutdown()
+
+  def convert(self, src, typed_signatures=None, exclude_others=False, id_strategy='sequential',
+      emission='finalize', call_graph=False, hash_cons=False):
+    return src2pseudo_parallel(src, typed_signatures, exclude_others, id_strategy, emission, call_graph,
+      hash_cons, 3, self.executor, 1)
+
+  def check(self, src, typed_signatures=None, exclude_others=False, **options):
+    expected = src2pseudo(src, typed_signatures, exclude_others, **options)
+    self.assertEqual(self.convert(src, typed_signatures, exclude_others, **options), expected)
+
+  def test_options(self):
+    for id_strategy in ('sequential', 'hash'):
+      for emission in ('finalize', 'direct'):
+        for hash_cons in (False, True):
+          self.check(SOURCE, id_strategy=id_strategy, emission=emission, call_graph=True, hash_cons=hash_cons)
+
+  def test_generated(self):
+    src = generate_program(60, 4, depth=2)
+    self.check(src, id_strategy='sequential', emission='direct')
+    self.check(src, id_strategy='hash')
+
+  def test_signatures(self):
+    signatures = {
+      'fact': { 'return': 'int', 'arguments': [('n', 'int')] },
+      'twice': { 'return': 'unknown', 'arguments': [(None, 'int')] },
+    }
+    self.check(SOURCE, signatures, id_strategy='hash')
+    self.check(SOURCE, SignatureCatalog(signatures), id_strategy='sequential')
+    self.check(SOURCE, { 'third': { 'return': 'unknown', 'arguments': [] } }, True, id_strategy='sequential')
+
+  def test_uuid(self):
+    self.assertEqual(
+      canonical_uuids(self.convert(SOURCE, id_strategy='uuid')),
+      canonical_uuids(src2pseudo(SOURCE, id_strategy='uuid')),
+    )
+
+  def test_speculation_taken(self):
+    state = ParallelParseState(SOURCE, self.executor, 3, id_strategy='sequential', min_procedures=1)
+    parse_into_state(state, ast.parse(SOURCE))
+    self.assertGreater(state.taken, 0)
+    # Nested procedures and assignments outside the body are converted by the parent.
+    self.assertLess(state.taken, 8)
+
+  def test_module_blocks(self):
+    # Functions of module level blocks convert during the module pass, before the round speculated on.
+    src = 'def a():\n  return 1\nif True:\n  def b():\n    return 2\n  x = b()\ndef c():\n  return 3.5\n'
+    for id_strategy in ('sequential', 'hash'):
+      self.check(src, id_strategy=id_strategy, emission='direct')
+    src += 'for i in range(2):\n  def d(k):\n    return k.pop()\n'
+    with self.assertRaises(ParseUnsupportedError):
+      self.convert(src)
+
+  def test_error(self):
+    src = SOURCE + 'def broken(a):\n  return a.pop()\n'
+    with self.assertRaises(ParseUnsupportedError) as expected:
+      src2pseudo(src)
+    with self.assertRaises(ParseUnsupportedError) as error:
+      self.convert(src)
+    self.assertEqual(str(error.exception), str(expected.exception))
+
+  def test_processes(self):
+    src = generate_program(40, 4)
+    with ProcessPoolExecutor(2) as executor:
+      pseudo = src2pseudo_parallel(src, None, False, 'sequential', 'direct', False, False, 2, executor)
+    self.assertEqual(pseudo, src2pseudo(src, id_strategy='sequential', emission='direct'))
+
+  def test_deep_body(self):
+    # A body too deep to pickle back from its worker is converted by the parent.
+    src = ''.join('def f{:d}(a):\n  return a + {:d}\n'.format(i, i) for i in range(20))
+    src += 'def deep(x):\n  return ' + ' + '.join(['x'] * 2400) + '\n'
+    with ProcessPoolExecutor(2) as executor:
+      pseudo = src2pseudo_parallel(src, None, False, 'sequential', 'direct', False, False, 2, executor, 1)
+    self.assertEqual(dumps(pseudo), dumps(src2pseudo(src, id_strategy='sequential', emission='direct')))
+
+  def test_cli(self):
+    with tempfile.TemporaryDirectory() as tmp:
+      source = os.path.join(tmp, 'source.py')
+      with open(source, 'w') as f:
+        f.write(SOURCE)
+      env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+      outputs = [
+        subprocess.run([sys.executable, '-m', 'pseudocodejson', source, '--ids', 'sequential'] + options,
+          env=env, capture_output=True, text=True, check=True).stdout
+        for options in (['--compact'], ['--compact', '-j', '2'], [], ['-j', '2'])
+      ]
+    self.assertEqual(outputs[1], outputs[0])
+    self.assertEqual(outputs[3], outputs[2])
@@ -0,0 +1,92 @@
+import unittest
+from pseudocodejson import src2pseudo, prescreen, UnsupportedConstructsError, ParseUnsupportedError
+from pseudocodejson.json_stream import dumps
+from benchmarks.generate import generate_program
+
+SOURCE = """
+import math
+class A:
+  pass
+
+def f(a, b):
+  x = [i for i in a]
+  y = a[1:2]
+  a.append(3)
+  while b:
+    b -= 1
+  else:
+    pass
+  for k in a:
+    print(k)
+  s = max(a) ** 2
+  if a is None:
+    return sorted(a)
+  b + 1
+  return -1
+
+def sorted(a):
+  return a
+
+print(__name__)
+"""
+
+class TestPrescreen(unittest.TestCase):
+
+  def test_all_reported(self):
+    self.assertEqual(prescreen(SOURCE), [
+      { 'line': 3, 'feature': "'ClassDef'" },
+      { 'line': 7, 'feature': "'ListComp'" },
+      { 'line': 8, 'feature': 'creation of a slice from an iterable' },
+      { 'line': 9, 'feature': "method call 'a.append'" },
+      { 'line': 10, 'feature': "'Else' in 'While'" },
+      { 'line': 14, 'feature': "for iterable 'Name' (only 'range' is supported)" },
+      { 'line': 16, 'feature': "builtin function 'max'" },
+      { 'line': 16, 'feature': "operation 'Pow'" },
+      { 'line': 17, 'feature': "operation 'Is'" },
+      { 'line': 19, 'feature': "expression 'BinOp' as statement" },
+      { 'line': 25, 'feature': "builtin value '__name__'" },
+    ])
+
+  def test_supported(self):
+    for src in (generate_program(20, 5), "for i in range(3):\n  print(abs(-i), len(None))\n"):
+      self.assertEqual(prescreen(src), [])
+      self.assertEqual(src2pseudo(src, id_strategy='sequential', screen=True), src2pseudo(src, id_strategy='sequential'))
+
+  def test_first_stage(self):
+    with self.assertRaises(UnsupportedConstructsError) as cm:
+      src2pseudo(SOURCE, screen=True)
+    self.assertIsInstance(cm.exception, ParseUnsupportedError)
+    self.assertEqual(len(cm.exception.issues), 11)
+    self.assertTrue(str(cm.exception).startswith("Unsupported 'ClassDef' at line 3; "))
+
+  def test_exclude_others(self):
+    src = "def f():\n  return 1\nx = [1]\n"
+    self.assertEqual(len(prescreen(src)), 1)
+    self.assertEqual(prescreen(src, True), [])
+
+  def test_exclude_unreachable(self):
+    src = "def a():\n  return [x for x in y]\ndef b():\n  return 1\ndef c():\n  return a()\n"
+    signatures = { 'b': { 'return': 'int', 'arguments': [] } }
+    self.assertEqual(prescreen(src, True, signatures), [])
+    self.assertEqual(
+      src2pseudo(src, signatures, True, id_strategy='sequential', screen=True),
+      src2pseudo(src, signatures, True, id_strategy='sequential')
+    )
+    # Functions called from the roots are converted and so screened.
+    signatures = { 'c': { 'return': 'unknown', 'arguments': [] } }
+    self.assertEqual(prescreen(src, True, signatures), [{ 'line': 2, 'feature': "'ListComp'" }])
+    self.assertEqual(prescreen("def f():\n  def g():\n    return [1]\n  return 1\n", True, { 'f': None }), [])
+
+  def test_deep_chains(self):
+    terms = ['x'] * 2400
+    src = 'x = 1\ny = ' + ' + '.join(terms) + '\nz = ' + '-' * 2400 + 'x\n'
+    self.assertEqual(prescreen(src), [])
+    self.assertEqual(
+      dumps(src2pseudo(src, id_strategy='sequential', screen=True)),
+      dumps(src2pseudo(src, id_strategy='sequential'))
+    )
+    terms[1200] = 'x ** 2'
+    self.assertEqual(prescreen('x = 1\ny = ' + ' + '.join(terms) + '\n'), [{ 'line': 2, 'feature': "operation 'Pow'" }])
+
+if __name__ == '__main__':
+  unittest.main()
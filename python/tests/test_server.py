@@ -0,0 +1,128 @@
+import os
+import sys
+import json
+import asyncio
+import tempfile
+import unittest
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pseudocodejson import src2pseudo, server
+
+SOURCE = "def f(a):\n  return a + 1\nx = f(2)\n"
+BROKEN = "class A:\n  pass\n"
+
+def request(id, method, **params):
+  return json.dumps({ 'jsonrpc': '2.0', 'id': id, 'method': method, 'params': params })
+
+class StreamWriter:
+
+  def __init__(self):
+    self.data = b''
+
+  def write(self, data):
+    self.data += data
+
+  async def drain(self):
+    pass
+
+  def close(self):
+    pass
+
+class TestServer(unittest.TestCase):
+
+  def exchange(self, lines, **options):
+    async def main():
+      with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'socket')
+        with server.Server(workers=2, **options) as s:
+          unix = await asyncio.start_unix_server(s.handle, path)
+          reader, writer = await asyncio.open_unix_connection(path)
+          writer.write(''.join(line + '\n' for line in lines).encode())
+          await writer.drain()
+          responses = [json.loads(await reader.readline()) for _ in lines]
+          writer.close()
+          unix.close()
+          await unix.wait_closed()
+          return { r['id']: r for r in responses }, s.stats_dict()
+    return asyncio.run(main())
+
+  def test_convert(self):
+    responses, stats = self.exchange([
+      request(1, 'convert', source=SOURCE, id_strategy='sequential'),
+      request(2, 'convert', source=BROKEN),
+      request(3, 'convert_batch', sources=[SOURCE, BROKEN], id_strategy='sequential'),
+    ])
+    expected = src2pseudo(SOURCE, id_strategy='sequential')
+    self.assertEqual(responses[1]['result'], expected)
+    self.assertEqual(responses[2]['error']['code'], server.CONVERSION_ERROR)
+    self.assertIn('ParseUnsupportedError', responses[2]['error']['message'])
+    self.assertEqual(responses[3]['result'][0], { 'result': expected })
+    self.assertIn('ParseUnsupportedError', responses[3]['result'][1]['error'])
+    self.assertEqual(stats['conversions'], 4)
+    self.assertEqual(stats['conversion_errors'], 2)
+    self.assertEqual(stats['methods']['convert']['latency']['count'], 2)
+
+  def test_errors(self):
+    responses, stats = self.exchange([
+      'not json',
+      request(1, 'missing'),
+      request(2, 'convert', source=1),
+      request(3, 'convert', source=SOURCE, id_strategy='random'),
+      request(4, 'convert_batch', sources=['a = 1\n'] * 3),
+    ], max_batch=2)
+    self.assertEqual(responses[None]['error']['code'], server.PARSE_ERROR)
+    self.assertEqual(responses[1]['error']['code'], server.METHOD_NOT_FOUND)
+    for id in (2, 3, 4):
+      self.assertEqual(responses[id]['error']['code'], server.INVALID_PARAMS)
+    self.assertEqual(stats['requests'], 5)
+    self.assertEqual(stats['errors'], 5)
+
+  def test_backpressure(self):
+    responses, stats = self.exchange(
+      [request(i, 'convert', source=SOURCE) for i in range(10)] + [request(10, 'stats')],
+      max_pending=2
+    )
+    self.assertEqual(len(responses), 11)
+    self.assertLessEqual(stats['peak_in_flight'], 2)
+    self.assertLessEqual(responses[10]['result']['in_flight'], 2)
+
+  def test_broken_pool(self):
+    async def main():
+      with server.Server(workers=1) as s:
+        # A worker dying breaks the pool for every conversion after it.
+        with self.assertRaises(server.BrokenProcessPool):
+          s.executor.submit(os._exit, 1).result()
+        reader, writer = asyncio.StreamReader(), StreamWriter()
+        reader.feed_data((request(1, 'convert', source=SOURCE) + '\n').encode())
+        reader.feed_data((request(2, 'convert_batch', sources=[SOURCE]) + '\n').encode())
+        reader.feed_eof()
+        await s.handle(reader, writer)
+        return [json.loads(line) for line in writer.data.decode().splitlines()], s.stats_dict()
+    responses, stats = asyncio.run(main())
+    responses = { r['id']: r for r in responses }
+    self.assertEqual(responses[1]['error']['code'], server.CONVERSION_ERROR)
+    self.assertIn('BrokenProcessPool', responses[1]['error']['message'])
+    self.assertEqual(responses[2]['result'][0]['result']['format'], 'pseudocodejson')
+    self.assertEqual(stats['conversion_errors'], 1)
+
+  def test_failing_executor(self):
+    executor = ThreadPoolExecutor(1)
+    executor.shutdown()
+    responses, stats = self.exchange([request(1, 'convert', source=SOURCE)], executor=executor)
+    self.assertEqual(responses[1]['error']['code'], server.INTERNAL_ERROR)
+    self.assertIn('RuntimeError', responses[1]['error']['message'])
+    self.assertEqual(stats['errors'], 1)
+
+  def test_stdio(self):
+    lines = [request(1, 'convert', source=SOURCE, id_strategy='sequential'), request(2, 'stats')]
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(server.__file__))))
+    out = subprocess.run(
+      [sys.executable, '-m', 'pseudocodejson', 'serve', '-j', '1'],
+      input=''.join(line + '\n' for line in lines), capture_output=True, text=True, env=env, timeout=60
+    )
+    responses = { r['id']: r for r in map(json.loads, out.stdout.splitlines()) }
+    self.assertEqual(responses[1]['result'], src2pseudo(SOURCE, id_strategy='sequential'))
+    self.assertEqual(responses[2]['result']['connections'], 1)
+
+if __name__ == '__main__':
+  unittest.main()
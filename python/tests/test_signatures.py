@@ -0,0 +1,125 @@
+import os
+import sys
+import json
+import pickle
+import tempfile
+import unittest
+import subprocess
+from pseudocodejson import src2pseudo, SignatureCatalog, ResultCache
+from pseudocodejson import signatures as s
+from pseudocodejson.binary import BinaryFormatError
+
+SIGNATURES = {
+  'bubblesort': { 'return': 'int[]', 'arguments': [('a', 'int[]')] },
+  'area': { 'return': 'double', 'arguments': [(None, 'double'), ('h', 'double')] },
+  'noop': { 'return': 'void', 'arguments': [] },
+}
+
+SOURCE = """
+def bubblesort(a):
+  for i in range(len(a)):
+    for j in range(len(a) - i - 1):
+      if a[j] > a[j + 1]:
+        t = a[j]
+        a[j] = a[j + 1]
+        a[j + 1] = t
+  return a
+
+def helper(x):
+  return x * 2
+
+def area(w, h):
+  return helper(w) * h
+"""
+
+def convert(signatures):
+  return src2pseudo(SOURCE, signatures, True, id_strategy='sequential')
+
+class TestSignatures(unittest.TestCase):
+
+  def test_catalog_mapping(self):
+    catalog = SignatureCatalog(SIGNATURES)
+    self.assertEqual(len(catalog), 3)
+    self.assertIn('area', catalog)
+    self.assertEqual(catalog['bubblesort'], SIGNATURES['bubblesort'])
+    self.assertEqual(dict(catalog), SIGNATURES)
+    with self.assertRaises(AttributeError):
+      catalog.entries = {}
+    with self.assertRaises(TypeError):
+      catalog['x'] = {}
+
+  def test_invalid_signature(self):
+    with self.assertRaises(ValueError):
+      SignatureCatalog({ 'f': { 'return': 'int' } })
+    with self.assertRaises(ValueError):
+      SignatureCatalog({ 'f': { 'return': 3, 'arguments': [] } })
+
+  def test_conversion_does_not_write(self):
+    signatures = { k: dict(v) for k, v in SIGNATURES.items() }
+    first = convert(signatures)
+    self.assertEqual(signatures, SIGNATURES)
+    self.assertEqual(convert(signatures), first)
+    self.assertEqual(convert(SignatureCatalog(SIGNATURES)), first)
+
+  def test_overlay(self):
+    overlay = s.SignatureOverlay(SignatureCatalog(SIGNATURES))
+    overlay['helper'] = { 'return': 'unknown', 'arguments': [] }
+    self.assertIn('helper', overlay)
+    self.assertEqual(len(overlay), 4)
+    self.assertEqual(list(overlay)[-1], 'helper')
+    self.assertEqual(overlay['area']['return'], 'double')
+
+  def test_binary_and_json(self):
+    catalog = SignatureCatalog(SIGNATURES)
+    data = s.dumps(catalog)
+    self.assertTrue(data.startswith(s.MAGIC))
+    self.assertEqual(dict(s.loads(data)), SIGNATURES)
+    self.assertEqual(s.loads(data).digest(), catalog.digest())
+    self.assertEqual(catalog.digest(), s.signatures_digest(SIGNATURES))
+    self.assertEqual(dict(s.loads('{"f": {"return": "int", "arguments": [["a", "int"]]}}')), {
+      'f': { 'return': 'int', 'arguments': [('a', 'int')] },
+    })
+    self.assertEqual(len(s.loads(s.dumps({}))), 0)
+    with self.assertRaises(BinaryFormatError):
+      s.loads(data[:-1])
+    with tempfile.TemporaryDirectory() as directory:
+      for name in ('catalog.bin', 'catalog.json'):
+        path = os.path.join(directory, name)
+        if name.endswith('.bin'):
+          s.dump(catalog, path)
+        else:
+          with open(path, 'w') as f:
+            f.write('{"noop": {"return": "void", "arguments": []}}')
+        self.assertIn('noop', s.load(path))
+
+  def test_pickle_shares(self):
+    catalog = SignatureCatalog(SIGNATURES)
+    self.assertIs(pickle.loads(pickle.dumps(catalog)), catalog)
+    data = pickle.dumps(catalog)
+    token = catalog.token
+    del catalog
+    copy = pickle.loads(data)
+    self.assertEqual(copy.token, token)
+    self.assertEqual(dict(copy), SIGNATURES)
+
+  def test_cache_key_matches_dict(self):
+    cache = ResultCache()
+    convert_cached = lambda signatures: src2pseudo(SOURCE, signatures, True, cache, 'sequential')
+    first = convert_cached(SIGNATURES)
+    self.assertEqual(convert_cached(SignatureCatalog(SIGNATURES)), first)
+    self.assertEqual(cache.hits, 1)
+
+  def test_cli_procedure_keeps_catalog_type(self):
+    with tempfile.TemporaryDirectory() as tmp:
+      source = os.path.join(tmp, 'source.py')
+      with open(source, 'w') as f:
+        f.write(SOURCE)
+      catalog = os.path.join(tmp, 'signatures.bin')
+      s.dump(SIGNATURES, catalog)
+      env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(s.__file__))))
+      out = subprocess.run(
+        [sys.executable, '-m', 'pseudocodejson', 'batch', source, '--signatures', catalog, '--procedure', 'area',
+          '--ids', 'sequential', '-j', '1'],
+        env=env, capture_output=True, text=True, check=True
+      ).stdout
+    self.assertEqual(json.loads(out)['result'], src2pseudo(SOURCE, SIGNATURES, True, id_strategy='sequential'))
@@ -0,0 +1,63 @@
+import unittest
+from pseudocodejson import src2pseudo
+from pseudocodejson.similarity import SimilarityIndex, document_features, jaccard
+from benchmarks.generate import generate_program
+
+SOURCE = """
+def total(values, n):
+  s = 0
+  for i in range(n):
+    if values[i] > 0:
+      s += values[i]
+  return s
+
+print(total(None, 3))
+"""
+
+RENAMED = """
+def summa(arr, count):
+  acc = 0
+  for j in range(count):
+    if arr[j] > 0:
+      acc += arr[j]
+  return acc
+
+print(summa(None, 3))
+"""
+
+class TestSimilarity(unittest.TestCase):
+
+  def test_renaming_ignored(self):
+    a = document_features(src2pseudo(SOURCE))
+    b = document_features(src2pseudo(RENAMED))
+    self.assertEqual(a, b)
+    c = document_features(src2pseudo(SOURCE.replace('> 0', '> 1')))
+    self.assertLess(jaccard(a, c), 1.0)
+    self.assertGreater(jaccard(a, c), 0.5)
+
+  def test_query(self):
+    index = SimilarityIndex()
+    for i in range(20):
+      index.add('gen{:d}'.format(i), src2pseudo(generate_program(3, 4, seed=i)))
+    index.add('source', src2pseudo(SOURCE))
+    self.assertEqual(len(index), 21)
+    self.assertIn('source', index)
+    top = index.query(src2pseudo(RENAMED), k=3)
+    self.assertEqual(top[0], ('source', 1.0))
+    self.assertTrue(all(s < 1.0 for _, s in top[1:]))
+    self.assertEqual(index.query(src2pseudo(RENAMED), k=3, min_similarity=0.9), [('source', 1.0)])
+
+  def test_signatures(self):
+    index = SimilarityIndex(num_perm=64, bands=16)
+    document = src2pseudo(SOURCE)
+    signature = index.signature(document)
+    self.assertEqual(len(signature), 64)
+    index.add_signature('a', list(signature))
+    self.assertEqual(index.query_signature(signature), [('a', 1.0)])
+    with self.assertRaises(ValueError):
+      index.add('a', document)
+    with self.assertRaises(ValueError):
+      SimilarityIndex(num_perm=64, bands=10)
+
+if __name__ == '__main__':
+  unittest.main()